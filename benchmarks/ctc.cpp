@@ -103,6 +103,31 @@ void timeCtc(Device device = Device::CPU) {
   TIME_DEVICE(ctcGrad, device);
 }
 
+void timeCtcLargeAlphabet() {
+  // The setting of `bindings/python/benchmarks/ctc.py`
+  const int T = 150; // input frames
+  const int U = 35; // output tokens
+  const int M = 10001; // size of alphabet
+
+  auto target = randTarget(U, M);
+  Graph emissions = linearGraph(T, M);
+  emissions.setWeights(randVec(T * M).data());
+
+  auto ctcLargeAlphabet = [&target, &emissions]() {
+    emissions.zeroGrad();
+    backward(ctcLoss(emissions, target, 0));
+  };
+  TIME(ctcLargeAlphabet);
+
+  // The same loss with the composition of the CTC graph
+  auto ctc = ctcGraph(target);
+  auto ctcGraphLargeAlphabet = [&ctc, &emissions]() {
+    emissions.zeroGrad();
+    backward(negate(forwardScore(intersect(ctc, emissions))));
+  };
+  TIME(ctcGraphLargeAlphabet);
+}
+
 void timeNgramCtc() {
   const int T = 200; // input frames
   const int U = 10; // output tokens
@@ -164,6 +189,161 @@ void timeBatchedCtc(const int B) {
   };
 
   TIME(ctcBatched);
+
+  // The padded arrays of the batch without any graphs
+  std::vector<float> logProbs;
+  std::vector<int> paddedTargets;
+  for (int64_t b = 0; b < B; ++b) {
+    logProbs.insert(
+        logProbs.end(), emissionsScores[b].begin(), emissionsScores[b].end());
+    paddedTargets.insert(
+        paddedTargets.end(), targets[b].begin(), targets[b].end());
+  }
+  std::vector<int> inputLengths(B, T);
+  std::vector<int> targetLengths(B, U);
+  std::vector<float> losses(B);
+  std::vector<float> grads(B * T * M);
+  auto ctcLossBatched = [&]() {
+    ctcLossBatch(
+        logProbs.data(),
+        paddedTargets.data(),
+        inputLengths.data(),
+        targetLengths.data(),
+        B,
+        T,
+        M,
+        U,
+        0,
+        losses.data(),
+        grads.data());
+  };
+  TIME(ctcLossBatched);
+}
+
+void timeAsg() {
+  // ASG with dense transitions between `M` labels
+  const int T = 150; // input frames
+  const int U = 40; // output tokens
+  const int M = 60; // alphabet size
+  const int B = 8; // batch size
+
+  Graph transitions;
+  transitions.addNode(true);
+  for (int i = 1; i <= M; i++) {
+    transitions.addNode(false, true);
+    transitions.addArc(0, i, i - 1, i - 1, randScore()); // p(i | <s>)
+  }
+  for (int i = 0; i < M; i++) {
+    for (int j = 0; j < M; j++) {
+      transitions.addArc(j + 1, i + 1, i, i, randScore()); // p(i | j)
+    }
+  }
+  transitions.arcSort();
+
+  std::vector<Graph> emissions;
+  std::vector<std::vector<int>> targets;
+  for (int b = 0; b < B; b++) {
+    auto g = linearGraph(T, M);
+    g.setWeights(randVec(T * M).data());
+    emissions.push_back(g);
+    targets.push_back(randTarget(U, M));
+  }
+
+  auto asgGraphs = [&]() {
+    auto lossFn = [&transitions](
+                      const Graph& emissions, const std::vector<int>& target) {
+      Graph fal;
+      fal.addNode(true);
+      int L = target.size();
+      for (int l = 1; l <= L; l++) {
+        fal.addNode(false, l == L);
+        fal.addArc(l - 1, l, target[l - 1]);
+        fal.addArc(l, l, target[l - 1]);
+      }
+      auto loss = subtract(
+          forwardScore(compose(emissions, transitions)),
+          forwardScore(compose(compose(fal, transitions), emissions)));
+      backward(loss);
+      return loss;
+    };
+    parallelMap(lossFn, emissions, targets);
+  };
+  TIME(asgGraphs);
+
+  auto asgDense = [&]() {
+    auto losses = asgLoss(emissions, transitions, targets);
+    parallelMap([](const Graph& loss) { backward(loss); }, losses);
+  };
+  TIME(asgDense);
+}
+
+void timeCrf() {
+  // Linear-chain CRF with bigram transitions between `K` labels
+  const int T = 200; // input frames
+  const int K = 50; // number of labels
+  const int B = 8; // batch size
+
+  Graph transitions;
+  for (int i = 0; i <= K; i++) {
+    transitions.addNode(i == K, true);
+  }
+  for (int i = 0; i < K; i++) {
+    transitions.addArc(K, i, i, i, randScore()); // s(<s>, i)
+    for (int j = 0; j < K; j++) {
+      transitions.addArc(i, j, j, j, randScore()); // s(i, j)
+    }
+  }
+  transitions.arcSort();
+
+  std::vector<Graph> emissions;
+  std::vector<std::vector<int>> targets;
+  for (int b = 0; b < B; b++) {
+    auto g = linearGraph(T, K);
+    g.setWeights(randVec(T * K).data());
+    emissions.push_back(g);
+    std::vector<int> target(T);
+    for (auto& label : target) {
+      label = rand() % K;
+    }
+    targets.push_back(target);
+  }
+
+  auto crfGraphs = [&]() {
+    auto lossFn = [&transitions](
+                      const Graph& emissions, const std::vector<int>& target) {
+      Graph labels;
+      labels.addNode(true);
+      int T = target.size();
+      for (int t = 1; t <= T; t++) {
+        labels.addNode(false, t == T);
+        labels.addArc(t - 1, t, target[t - 1]);
+      }
+      auto loss = subtract(
+          forwardScore(compose(emissions, transitions)),
+          forwardScore(compose(emissions, intersect(labels, transitions))));
+      backward(loss);
+      return loss;
+    };
+    parallelMap(lossFn, emissions, targets);
+  };
+  TIME(crfGraphs);
+
+  auto crfDense = [&]() {
+    auto losses = crfLoss(emissions, transitions, targets);
+    parallelMap([](const Graph& loss) { backward(loss); }, losses);
+  };
+  TIME(crfDense);
+
+  auto decodeGraphs = [&]() {
+    auto decodeFn = [&transitions](const Graph& emissions) {
+      return viterbiPath(compose(emissions, transitions));
+    };
+    parallelMap(decodeFn, emissions);
+  };
+  TIME(decodeGraphs);
+
+  auto decodeDense = [&]() { crfDecode(emissions, transitions); };
+  TIME(decodeDense);
 }
 
 int main(int argc, char** argv) {
@@ -172,7 +352,10 @@ int main(int argc, char** argv) {
    *   `./benchmark_ctc <batch_size (default 8)>`
    */
   timeCtc();
+  timeCtcLargeAlphabet();
   timeNgramCtc();
+  timeAsg();
+  timeCrf();
   int B = 8; // batch size
   if (argc > 1) {
     B = std::stoi(argv[1]);
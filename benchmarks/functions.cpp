@@ -25,6 +25,9 @@ void timeSimpleOps(Device device = Device::CPU) {
   };
   TIME_DEVICE(cloneBackward, device);
 
+  auto projectForward = [&graph]() { auto projected = projectOutput(graph); };
+  TIME_DEVICE(projectForward, device);
+
   // TODO remove when other functions are implemented in CUDA
   if (device.isCuda()) {
     return;
@@ -88,6 +91,17 @@ void timeForward(Device device = Device::CPU) {
   };
   TIME_DEVICE(forwardScoreLinearBackward, device);
 
+  auto viterbiScoreLinearForward = [&graph]() {
+    auto out = viterbiScore(graph);
+  };
+  TIME_DEVICE(viterbiScoreLinearForward, device);
+
+  auto viterbiScoreLinearBackward = [&graph, out = viterbiScore(graph)] {
+    graph.zeroGrad();
+    backward(out, true);
+  };
+  TIME_DEVICE(viterbiScoreLinearBackward, device);
+
   graph = makeRandomDAG(500, 400000).to(device);
   auto forwardScoreRandDAGForward = [&graph]() {
     auto out = forwardScore(graph);
@@ -99,6 +113,72 @@ void timeForward(Device device = Device::CPU) {
     backward(out, true);
   };
   TIME_DEVICE(forwardScoreRandDAGBackward, device);
+
+  auto viterbiScoreRandDAGForward = [&graph]() {
+    auto out = viterbiScore(graph);
+  };
+  TIME_DEVICE(viterbiScoreRandDAGForward, device);
+
+  auto viterbiScoreRandDAGBackward = [&graph, out = viterbiScore(graph)] {
+    graph.zeroGrad();
+    backward(out, true);
+  };
+  TIME_DEVICE(viterbiScoreRandDAGBackward, device);
+
+  // Many nodes with few arcs each, as in a composed CTC graph
+  weights.resize(20000 * 3);
+  std::generate(weights.begin(), weights.end(), std::rand);
+  graph = makeChain(20000, 3, weights.data()).to(device);
+  auto forwardScoreSparseForward = [&graph]() {
+    auto out = forwardScore(graph);
+  };
+  TIME_DEVICE(forwardScoreSparseForward, device);
+
+  auto viterbiScoreSparseForward = [&graph]() {
+    auto out = viterbiScore(graph);
+  };
+  TIME_DEVICE(viterbiScoreSparseForward, device);
+
+  // The same graph made by linearGraph takes the dense path
+  graph = linearGraph(20000, 3);
+  graph.setWeights(weights.data());
+  graph = graph.to(device);
+  auto forwardScoreSparseLinearForward = [&graph]() {
+    auto out = forwardScore(graph);
+  };
+  TIME_DEVICE(forwardScoreSparseLinearForward, device);
+
+  auto viterbiScoreSparseLinearForward = [&graph]() {
+    auto out = viterbiScore(graph);
+  };
+  TIME_DEVICE(viterbiScoreSparseLinearForward, device);
+
+  // A batch of small graphs, as in training
+  std::vector<Graph> batch;
+  std::vector<Graph> linearBatch;
+  for (int b = 0; b < 64; b++) {
+    std::vector<float> w(50 * 30);
+    std::generate(w.begin(), w.end(), [] { return std::rand() % 100 / 10.0f; });
+    batch.push_back(makeChain(50, 30, w.data()).to(device));
+    auto g = linearGraph(50, 30);
+    g.setWeights(w.data());
+    linearBatch.push_back(g.to(device));
+  }
+  auto forwardScoreBatch = [&batch]() {
+    for (auto& g : batch) {
+      g.zeroGrad();
+      backward(forwardScore(g));
+    }
+  };
+  TIME_DEVICE(forwardScoreBatch, device);
+
+  auto forwardScoreBatchLinear = [&linearBatch]() {
+    for (auto& g : linearBatch) {
+      g.zeroGrad();
+      backward(forwardScore(g));
+    }
+  };
+  TIME_DEVICE(forwardScoreBatchLinear, device);
 }
 
 void timeViterbiPath(Device device = Device::CPU) {
@@ -170,12 +250,260 @@ void timeCompose(Device device = Device::CPU) {
   TIME(composeForwardSorted);
 }
 
+void timeComposeScore() {
+  // A CTC style loss: emissions composed with the graph of a target sequence
+  // where each label can repeat and be preceded by optional blanks (label 0)
+  const int T = 200;
+  const int C = 30;
+  const int L = 50;
+  auto emissions = linearGraph(T, C);
+  Graph target;
+  for (int l = 0; l <= 2 * L; l++) {
+    target.addNode(l < 2, l >= 2 * L - 1);
+  }
+  for (int l = 0; l <= 2 * L; l++) {
+    auto label = (l % 2) ? 1 + (l / 2) % (C - 1) : 0;
+    target.addArc(l, l, label);
+    if (l > 0) {
+      target.addArc(l - 1, l, label);
+    }
+    if (l > 1 && (l % 2)) {
+      target.addArc(l - 2, l, label);
+    }
+  }
+
+  auto composeScoreForward = [&emissions, &target]() {
+    auto out = forwardScore(compose(emissions, target));
+  };
+  TIME(composeScoreForward);
+
+  auto composeScoreFusedForward = [&emissions, &target]() {
+    auto out = composeScore(emissions, target);
+  };
+  TIME(composeScoreFusedForward);
+
+  auto composeScoreBackward =
+      [&emissions, &target, out = forwardScore(compose(emissions, target))]() {
+        emissions.zeroGrad();
+        target.zeroGrad();
+        backward(out, true);
+      };
+  TIME(composeScoreBackward);
+
+  auto composeScoreFusedBackward =
+      [&emissions, &target, out = composeScore(emissions, target)]() {
+        emissions.zeroGrad();
+        target.zeroGrad();
+        backward(out, true);
+      };
+  TIME(composeScoreFusedBackward);
+}
+
+void timeConnect() {
+  // A linear graph with a dead end branching off of every node
+  const int N = 1000;
+  const int A = 50;
+  auto graph = linearGraph(N, A);
+  for (int n = 0; n < N; n++) {
+    auto dead = graph.addNode();
+    for (int j = 0; j < A; j++) {
+      graph.addArc(n, dead, j);
+      graph.addArc(dead, dead, j);
+    }
+  }
+
+  auto connectForward = [&graph]() { auto out = connect(graph); };
+  TIME(connectForward);
+
+  auto connectBackward = [&graph, out = connect(graph)]() {
+    graph.zeroGrad();
+    backward(out, true);
+  };
+  TIME(connectBackward);
+
+  // An acceptor for any sequence of labels
+  Graph any;
+  any.addNode(true, true);
+  for (int j = 0; j < A; j++) {
+    any.addArc(0, 0, j);
+  }
+  auto composeDead = [&graph, &any]() {
+    auto out = forwardScore(compose(graph, any));
+  };
+  TIME(composeDead);
+
+  auto composeConnected = [&graph, &any]() {
+    auto out = forwardScore(compose(connect(graph), any));
+  };
+  TIME(composeConnected);
+}
+
+void timeRemove() {
+  // A lattice where the arc of each label at each step goes to its own node
+  // followed by a shared chain of epsilons to the next step
+  const int N = 200;
+  const int A = 30;
+  const int E = 20;
+  Graph graph;
+  auto step = graph.addNode(true);
+  for (int n = 0; n < N; n++) {
+    auto chain = graph.addNode();
+    for (int j = 0; j < A; j++) {
+      auto label = graph.addNode();
+      auto weight = static_cast<float>(std::rand()) / RAND_MAX;
+      graph.addArc(step, label, j, j, weight);
+      graph.addArc(label, chain, epsilon);
+    }
+    for (int e = 0; e < E; e++) {
+      auto next = graph.addNode(false, n == N - 1 && e == E - 1);
+      graph.addArc(chain, next, epsilon);
+      chain = next;
+    }
+    step = chain;
+  }
+
+  auto removeForward = [&graph]() { auto out = remove(graph); };
+  TIME(removeForward);
+
+  auto removeBackward = [&graph, out = forwardScore(remove(graph))]() {
+    graph.zeroGrad();
+    backward(out, true);
+  };
+  TIME(removeBackward);
+}
+
+// A lexicon of words over a token set which can be repeated. Many words
+// share a prefix, so the lexicon is nondeterministic.
+Graph lexiconGraph(int numTokens, int numWords) {
+  std::vector<Graph> words;
+  for (int w = 0; w < numWords; w++) {
+    auto length = 2 + std::rand() % 5;
+    Graph word(false);
+    word.addNode(true);
+    for (int i = 0; i < length; i++) {
+      word.addNode(false, i == length - 1);
+      word.addArc(i, i + 1, std::rand() % numTokens);
+    }
+    words.push_back(word);
+  }
+  return remove(closure(union_(words)));
+}
+
+void timeDeterminize() {
+  // The lexicon composed with emissions
+  const int T = 50;
+  const int A = 26;
+  auto lexicon = lexiconGraph(A, 500);
+  auto emissions = linearGraph(T, A);
+
+  auto determinizeForward = [&lexicon]() {
+    auto out = determinize(lexicon, Semiring::TROPICAL);
+  };
+  TIME(determinizeForward);
+
+  auto deterministic = determinize(lexicon, Semiring::TROPICAL);
+  auto composeLexicon = [&emissions, &lexicon]() {
+    auto out = viterbiScore(compose(emissions, lexicon));
+  };
+  TIME(composeLexicon);
+  auto composeDeterministic = [&emissions, &deterministic]() {
+    auto out = viterbiScore(compose(emissions, deterministic));
+  };
+  TIME(composeDeterministic);
+}
+
+void timeMinimize() {
+  // The determinized lexicon composed with emissions
+  const int T = 50;
+  const int A = 26;
+  auto deterministic = determinize(lexiconGraph(A, 500), Semiring::TROPICAL);
+  auto emissions = linearGraph(T, A);
+
+  auto minimizeForward = [&deterministic]() {
+    auto out = minimize(deterministic, Semiring::TROPICAL);
+  };
+  TIME(minimizeForward);
+
+  auto minimal = minimize(deterministic, Semiring::TROPICAL);
+  auto composeDeterministic = [&emissions, &deterministic]() {
+    auto out = viterbiScore(compose(emissions, deterministic));
+  };
+  TIME(composeDeterministic);
+  auto composeMinimal = [&emissions, &minimal]() {
+    auto out = viterbiScore(compose(emissions, minimal));
+  };
+  TIME(composeMinimal);
+}
+
+void timePrune() {
+  // A lattice of the lexicon composed with random emissions
+  const int T = 50;
+  const int A = 26;
+  auto lexicon = determinize(lexiconGraph(A, 500), Semiring::TROPICAL);
+  auto emissions = linearGraph(T, A);
+  std::vector<float> weights(emissions.numArcs());
+  std::generate(weights.begin(), weights.end(), []() {
+    return 5.0 * std::rand() / RAND_MAX;
+  });
+  emissions.setWeights(weights.data());
+  auto lattice = connect(compose(emissions, lexicon));
+
+  auto pruneForward = [&lattice]() { auto out = prune(lattice, 5.0); };
+  TIME(pruneForward);
+
+  auto pruned = prune(lattice, 5.0);
+  auto forwardLattice = [&lattice]() { auto out = forwardScore(lattice); };
+  TIME(forwardLattice);
+  auto forwardPruned = [&pruned]() { auto out = forwardScore(pruned); };
+  TIME(forwardPruned);
+}
+
+void timeNbest() {
+  // The 100 best paths of random emissions and of a lattice with many paths
+  // for each label sequence
+  auto graph = linearGraph(100, 30);
+  std::vector<float> weights(graph.numArcs());
+  std::generate(weights.begin(), weights.end(), []() {
+    return static_cast<float>(std::rand()) / RAND_MAX;
+  });
+  graph.setWeights(weights.data());
+
+  auto viterbiPathLinear = [&graph]() { auto out = viterbiPath(graph); };
+  TIME(viterbiPathLinear);
+  auto nbestLinear = [&graph]() { auto out = nbest(graph, 100, false); };
+  TIME(nbestLinear);
+  auto nbestLinearUnique = [&graph]() { auto out = nbest(graph, 100); };
+  TIME(nbestLinearUnique);
+
+  const int A = 26;
+  auto emissions = linearGraph(20, A);
+  weights.resize(emissions.numArcs());
+  std::generate(weights.begin(), weights.end(), []() {
+    return 5.0 * std::rand() / RAND_MAX;
+  });
+  emissions.setWeights(weights.data());
+  auto lexicon = determinize(lexiconGraph(A, 500), Semiring::TROPICAL);
+  auto lattice = prune(
+      connect(compose(emissions, lexicon)), 10.0, -1, Semiring::TROPICAL);
+  auto nbestLattice = [&lattice]() { auto out = nbest(lattice, 100, false); };
+  TIME(nbestLattice);
+  auto nbestLatticeUnique = [&lattice]() { auto out = nbest(lattice, 100); };
+  TIME(nbestLatticeUnique);
+}
+
 int main() {
   /* Various function benchmarks. */
   timeSimpleOps();
   timeForward();
   timeViterbiPath();
   timeCompose();
+  timeComposeScore();
+  timeConnect();
+  timeRemove();
+  timeDeterminize();
+  timeMinimize();
+  timePrune();
+  timeNbest();
   if (cuda::isAvailable()) {
     timeSimpleOps(Device::CUDA);
     timeForward(Device::CUDA);
@@ -24,6 +24,88 @@ void timeConstructDestruct(Device device = Device::CPU) {
   TIME_DEVICE(linearDestruction, device);
 }
 
+void timePooledConstructDestruct() {
+  memory::setPoolEnabled(true);
+  std::vector<Graph> graphs;
+  auto pooledLinearConstruction = [&graphs]() {
+    graphs.push_back(linearGraph(1000, 1000));
+  };
+  TIME(pooledLinearConstruction);
+
+  auto pooledLinearDestruction = [&graphs]() { graphs.pop_back(); };
+  TIME(pooledLinearDestruction);
+
+  auto pooledConstructDestruct = []() { linearGraph(1000, 1000); };
+  TIME(pooledConstructDestruct);
+  memory::setPoolEnabled(false);
+
+  auto linearConstructDestruct = []() { linearGraph(1000, 1000); };
+  TIME(linearConstructDestruct);
+}
+
+void timeBulkConstruct() {
+  // A random graph with 10k nodes and 1M arcs
+  const int numNodes = 10000;
+  const int numArcs = 1000000;
+  std::vector<int> srcNodes(numArcs);
+  std::vector<int> dstNodes(numArcs);
+  std::vector<int> labels(numArcs);
+  std::vector<float> weights(numArcs);
+  for (int i = 0; i < numArcs; ++i) {
+    srcNodes[i] = rand() % numNodes;
+    dstNodes[i] = rand() % numNodes;
+    labels[i] = rand() % 100;
+    weights[i] = static_cast<float>(rand()) / RAND_MAX;
+  }
+
+  auto addArcConstruction = [&]() {
+    Graph g;
+    g.addNode(true);
+    for (int n = 1; n < numNodes; ++n) {
+      g.addNode(false, n == numNodes - 1);
+    }
+    for (int i = 0; i < numArcs; ++i) {
+      g.addArc(srcNodes[i], dstNodes[i], labels[i], labels[i], weights[i]);
+    }
+    g.numOut(0);
+  };
+  TIME(addArcConstruction);
+
+  auto fromArraysConstruction = [&]() {
+    auto g = Graph::fromArrays(
+        numNodes,
+        {0},
+        {numNodes - 1},
+        srcNodes,
+        dstNodes,
+        labels,
+        labels,
+        weights);
+  };
+  TIME(fromArraysConstruction);
+}
+
+void timeInterleavedConstruct() {
+  // Query the graph after each new arc, the total time should grow linearly
+  // with the number of arcs
+  auto interleaved = [](int numArcs) {
+    const int numNodes = numArcs / 10;
+    Graph g;
+    for (int n = 0; n < numNodes; ++n) {
+      g.addNode(n == 0, n == numNodes - 1);
+    }
+    for (int i = 0; i < numArcs; ++i) {
+      auto src = rand() % numNodes;
+      g.addArc(src, rand() % numNodes, i % 100);
+      g.numOut(src);
+    }
+  };
+  auto interleaved10k = [&interleaved]() { interleaved(10000); };
+  TIME(interleaved10k);
+  auto interleaved100k = [&interleaved]() { interleaved(100000); };
+  TIME(interleaved100k);
+}
+
 void timeCopy(Device device = Device::CPU) {
   auto graph = linearGraph(1000, 1000, device);
   auto copy = [&graph]() { auto copied = Graph::deepCopy(graph); };
@@ -78,6 +160,9 @@ void timeTraversal() {
 int main() {
   /* Various function benchmarks. */
   timeConstructDestruct();
+  timePooledConstructDestruct();
+  timeBulkConstruct();
+  timeInterleavedConstruct();
   timeCopy();
   timeTraversal();
   if (cuda::isAvailable()) {
@@ -74,3 +74,32 @@ Graph makeRandomDAG(int num_nodes, int num_arcs) {
   }
   return graph;
 }
+
+// A chain of `M + 1` nodes with `N` arcs between consecutive nodes, like
+// `linearGraph(M, N)` but built with `Graph::addArcs` so it is not marked as
+// linear and takes the general code paths.
+Graph makeChain(int M, int N, const float* weights = nullptr) {
+  Graph graph;
+  graph.addNode(true, M == 0);
+  for (int m = 1; m <= M; m++) {
+    graph.addNode(false, m == M);
+  }
+  std::vector<int> srcNodes;
+  std::vector<int> dstNodes;
+  std::vector<int> labels;
+  for (int m = 0; m < M; m++) {
+    for (int n = 0; n < N; n++) {
+      srcNodes.push_back(m);
+      dstNodes.push_back(m + 1);
+      labels.push_back(n);
+    }
+  }
+  graph.addArcs(
+      labels.size(),
+      srcNodes.data(),
+      dstNodes.data(),
+      labels.data(),
+      nullptr,
+      weights);
+  return graph;
+}
@@ -20,7 +20,9 @@ parser.add_argument("-N", "--num_iters", type=int, required=False, default=25)
 args = parser.parse_args()
 
 T, L, C, B = args.num_time_steps, args.target_size, args.num_alphabets, args.batch_size
-input = torch.randn(T, B, C).log_softmax(2).detach().requires_grad_().cuda()
+iscuda = torch.cuda.is_available()
+device = "cuda" if iscuda else "cpu"
+input = torch.randn(T, B, C).log_softmax(2).detach().requires_grad_().to(device)
 target = torch.randint(low=1, high=C, size=(B, L), dtype=torch.long)
 input_lengths = torch.full(size=(B,), fill_value=T, dtype=torch.long)
 target_lengths = torch.full(size=(B,), fill_value=L, dtype=torch.long)
@@ -38,12 +40,13 @@ def pytorch_ctc_func():
     loss.backward()
 
 
-time_func(pytorch_ctc_func, N, "PyTorch CTC ", iscuda=True)
+time_func(pytorch_ctc_func, N, "PyTorch CTC ", iscuda=iscuda)
 
 ############  GTN BENCHMARK  ############
 
 # Since forward score is not implemented on cuda, we currently run the
-# GTN code on CPU by moving the data between CPU <--> GPU
+# GTN code on CPU by moving the data between CPU <--> GPU. The emissions are
+# made with `linear_graph`, so `ctc_loss` uses its dedicated implementation.
 
 print("Running gtn ctc benchmark ...")
 
@@ -52,20 +55,36 @@ def process(b):
     # create emission graph; moves data from GPU -> CPU
     g_emissions = gtn.linear_graph(T, C, gtn.Device(gtn.CPU), True)
     cpu_data = input[:, b, :].cpu().contiguous()
-    g_emissions.set_weights(cpu_data.data_ptr())
+    g_emissions.bind_weights(cpu_data.data_ptr(), cpu_data)
+
+    # the gradient is written directly to a tensor
+    grad = torch.empty(T, C)
+    g_emissions.set_grad_buffer(grad.data_ptr(), grad)
 
     tgt_length = target_lengths[b]
     g_loss = gtn.criterion.ctc_loss(g_emissions, target[b, :tgt_length].tolist(), 0)
 
     gtn.backward(g_loss)
 
-    # access the gradient ; moves data from CPU -> GPU
-    grad_list = g_emissions.grad().weights_to_list()
-    grad_tensor = torch.tensor(grad_list).cuda()
+    # moves the gradient from CPU -> GPU
+    grad_tensor = grad.to(device)
 
 
 def gtn_ctc_func():
     gtn.parallel_for(process, range(B))
 
 
-time_func(gtn_ctc_func, N, "GTN CTC ", iscuda=True)
+time_func(gtn_ctc_func, N, "GTN CTC ", iscuda=iscuda)
+
+
+def gtn_ctc_batch_func():
+    # the whole batch in one call; moves data from GPU -> CPU -> GPU
+    log_probs = input.detach().transpose(0, 1).cpu().contiguous()
+    losses, grads = gtn.criterion.ctc_loss_batch(
+        log_probs.numpy(), target.int().numpy(), input_lengths.int().numpy(),
+        target_lengths.int().numpy(), 0
+    )
+    grad_tensor = torch.from_numpy(grads).to(device)
+
+
+time_func(gtn_ctc_batch_func, N, "GTN CTC batch ", iscuda=iscuda)
@@ -10,18 +10,23 @@ import gtn
 
 def make_ngram_graph(n, num_tokens):
     ngram_counter = gtn.linear_graph(n, num_tokens)
-    for i in range(num_tokens):
-        ngram_counter.add_arc(0, 0, i, gtn.epsilon)
-        ngram_counter.add_arc(n, n, i, gtn.epsilon)
+    tokens = list(range(num_tokens))
+    epsilons = [gtn.epsilon] * num_tokens
+    for node in [0, n]:
+        loops = [node] * num_tokens
+        ngram_counter.add_arcs(loops, loops, tokens, epsilons)
     return ngram_counter
 
 
 def make_chain_graph(input_tokens):
     chain = gtn.Graph(False)
-    chain.add_node(True)
-    for i, token in enumerate(input_tokens):
-        chain.add_node(False, i == len(input_tokens) - 1)
-        chain.add_arc(i, i + 1, token)
+    num_tokens = len(input_tokens)
+    chain.add_nodes(
+        num_tokens + 1,
+        start=[i == 0 for i in range(num_tokens + 1)],
+        accept=[0 < i == num_tokens for i in range(num_tokens + 1)])
+    chain.add_arcs(
+        list(range(num_tokens)), list(range(1, num_tokens + 1)), input_tokens)
     return chain
 
 
@@ -13,13 +13,18 @@ import numpy as np
 def gen_transitions(num_classes, calc_grad=False):
     """Make a bigram transition graph."""
     g = gtn.Graph(calc_grad)
-    for i in range(num_classes):
-        g.add_node(False, True)
-    g.add_node(True, True)
-    for i in range(num_classes):
-        g.add_arc(num_classes, i, i)  # s(<s>, i)
-        for j in range(num_classes):
-            g.add_arc(i, j, j)  # s(i, j)
+    start = np.zeros(num_classes + 1, dtype=bool)
+    start[num_classes] = True
+    g.add_nodes(num_classes + 1, start=start, accept=np.ones_like(start))
+    # For each i add s(<s>, i) followed by s(i, j) for every j:
+    classes = np.arange(num_classes)
+    src = np.empty((num_classes, num_classes + 1), dtype=np.int32)
+    src[:, 0] = num_classes
+    src[:, 1:] = classes[:, None]
+    dst = np.empty_like(src)
+    dst[:, 0] = classes
+    dst[:, 1:] = classes[None, :]
+    g.add_arcs(src.ravel(), dst.ravel(), dst.ravel())
     return g
 
 
@@ -27,9 +32,14 @@ def gen_potentials(num_features, num_classes, calc_grad=False):
     """Make the unary potential graph"""
     g = gtn.Graph(calc_grad)
     g.add_node(True, True)
-    for i in range(num_features):
-        for c in range(num_classes):
-            g.add_arc(0, 0, i, c)  # f(i, c)
+    # f(i, c) for every feature i and class c:
+    num_arcs = num_features * num_classes
+    self_loops = np.zeros(num_arcs, dtype=np.int32)
+    g.add_arcs(
+        self_loops,
+        self_loops,
+        np.repeat(np.arange(num_features), num_classes),
+        np.tile(np.arange(num_classes), num_features))
     return g
 
 
@@ -50,9 +60,12 @@ def make_chain_graph(seq, calc_grad=False):
     """Make a simple chain graph from an iterable of integers."""
     g = gtn.Graph(calc_grad)
     g.add_node(True)
-    for e, s in enumerate(seq):
-        g.add_node(False, e + 1 == len(seq))
-        g.add_arc(e, e + 1, s)
+    if len(seq) > 0:
+        accept = np.zeros(len(seq), dtype=bool)
+        accept[-1] = True
+        g.add_nodes(len(seq), accept=accept)
+        nodes = np.arange(len(seq))
+        g.add_arcs(nodes, nodes + 1, seq)
     return g
 
 
@@ -57,7 +57,7 @@ class GTNLossFunction(torch.autograd.Function):
         def forward_single(b):
             emissions = gtn.linear_graph(T, C, inputs.requires_grad)
             data = inputs[b].contiguous()
-            emissions.set_weights(data.data_ptr())
+            emissions.bind_weights(data.data_ptr(), data)
 
             target = GTNLossFunction.make_target_graph(targets[b])
 
@@ -89,12 +89,11 @@ class GTNLossFunction(torch.autograd.Function):
         B, T, C = in_shape
         input_grad = torch.empty((B, T, C))
 
-        # Compute the gradients for each example:
+        # Compute the gradients for each example directly into input_grad:
         def backward_single(b):
-            gtn.backward(losses[b])
             emissions = emissions_graphs[b]
-            grad = emissions.grad().weights_to_numpy()
-            input_grad[b] = torch.from_numpy(grad).view(1, T, C)
+            emissions.set_grad_buffer(input_grad[b].data_ptr(), input_grad)
+            gtn.backward(losses[b])
 
         # Compute gradients in parallel over the batch:
         gtn.parallel_for(backward_single, range(B))
@@ -18,6 +18,7 @@ from .creations import *
 from .utils import *
 from .rand import *
 from .parallel import *
+from .memory import *
 from . import cuda
 
 def draw(graph, file_name, isymbols={}, osymbols={}):
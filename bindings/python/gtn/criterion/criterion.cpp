@@ -5,9 +5,11 @@
  * LICENSE file in the root directory of this source tree.
  */
 
+#include <pybind11/numpy.h>
 #include <pybind11/pybind11.h>
 #include <pybind11/stl.h>
 
+#include "bindings/python/gtn/memory_state.h"
 #include "gtn/gtn.h"
 
 using namespace gtn;
@@ -16,7 +18,12 @@ using namespace gtn::criterion;
 namespace py = pybind11;
 using namespace py::literals;
 
+using IntArray = py::array_t<int, py::array::c_style | py::array::forcecast>;
+using FloatArray =
+    py::array_t<float, py::array::c_style | py::array::forcecast>;
+
 PYBIND11_MODULE(criterion, m) {
+  shareMemoryState();
   m.def(
       "ctc_loss",
       [](const Graph& logProbs, const std::vector<int>& target, int blankIdx) {
@@ -26,4 +33,115 @@ PYBIND11_MODULE(criterion, m) {
       "log_probs"_a,
       "target"_a,
       "blank_idx"_a);
+  m.def(
+      "ctc_loss_batch",
+      [](const FloatArray& logProbs,
+         const IntArray& targets,
+         const IntArray& inputLengths,
+         const IntArray& targetLengths,
+         int blankIdx,
+         bool calcGrad) {
+        if (logProbs.ndim() != 3 || targets.ndim() != 2) {
+          throw std::invalid_argument(
+              "[criterion.ctc_loss_batch] log_probs must have shape [B, T, C] "
+              "and targets must have shape [B, L]");
+        }
+        auto B = logProbs.shape(0);
+        auto T = logProbs.shape(1);
+        auto C = logProbs.shape(2);
+        auto L = targets.shape(1);
+        if (targets.shape(0) != B || inputLengths.size() != B ||
+            targetLengths.size() != B) {
+          throw std::invalid_argument(
+              "[criterion.ctc_loss_batch] Batch sizes must match");
+        }
+        py::array_t<float> losses(B);
+        auto grads = calcGrad ? py::array_t<float>({B, T, C})
+                              : py::array_t<float>();
+        auto lossesPtr = losses.mutable_data();
+        auto gradsPtr = calcGrad ? grads.mutable_data() : nullptr;
+        {
+          py::gil_scoped_release release;
+          ctcLossBatch(
+              logProbs.data(),
+              targets.data(),
+              inputLengths.data(),
+              targetLengths.data(),
+              B,
+              T,
+              C,
+              L,
+              blankIdx,
+              lossesPtr,
+              gradsPtr);
+        }
+        return py::make_tuple(
+            losses, calcGrad ? py::object(grads) : py::object(py::none()));
+      },
+      "log_probs"_a,
+      "targets"_a,
+      "input_lengths"_a,
+      "target_lengths"_a,
+      "blank_idx"_a,
+      "calc_grad"_a = true);
+  m.def(
+      "asg_loss",
+      [](const Graph& emissions,
+         const Graph& transitions,
+         const std::vector<int>& target) {
+        py::gil_scoped_release release;
+        return asgLoss(emissions, transitions, target);
+      },
+      "emissions"_a,
+      "transitions"_a,
+      "target"_a);
+  m.def(
+      "asg_loss",
+      [](const std::vector<Graph>& emissions,
+         const Graph& transitions,
+         const std::vector<std::vector<int>>& targets) {
+        py::gil_scoped_release release;
+        return asgLoss(emissions, transitions, targets);
+      },
+      "emissions"_a,
+      "transitions"_a,
+      "targets"_a);
+  m.def(
+      "crf_loss",
+      [](const Graph& emissions,
+         const Graph& transitions,
+         const std::vector<int>& target) {
+        py::gil_scoped_release release;
+        return crfLoss(emissions, transitions, target);
+      },
+      "emissions"_a,
+      "transitions"_a,
+      "target"_a);
+  m.def(
+      "crf_loss",
+      [](const std::vector<Graph>& emissions,
+         const Graph& transitions,
+         const std::vector<std::vector<int>>& targets) {
+        py::gil_scoped_release release;
+        return crfLoss(emissions, transitions, targets);
+      },
+      "emissions"_a,
+      "transitions"_a,
+      "targets"_a);
+  m.def(
+      "crf_decode",
+      [](const Graph& emissions, const Graph& transitions) {
+        py::gil_scoped_release release;
+        return crfDecode(emissions, transitions);
+      },
+      "emissions"_a,
+      "transitions"_a);
+  m.def(
+      "crf_decode",
+      [](const std::vector<Graph>& emissions, const Graph& transitions) {
+        py::gil_scoped_release release;
+        return crfDecode(emissions, transitions);
+      },
+      "emissions"_a,
+      "transitions"_a);
 }
@@ -8,6 +8,7 @@
 #include <pybind11/pybind11.h>
 #include <pybind11/stl.h>
 
+#include "bindings/python/gtn/memory_state.h"
 #include "gtn/gtn.h"
 
 using namespace gtn;
@@ -16,6 +17,7 @@ namespace py = pybind11;
 using namespace py::literals;
 
 PYBIND11_MODULE(cuda, m) {
+  shareMemoryState();
   m.def("is_available", &gtn::cuda::isAvailable);
   m.def("synchronize", py::overload_cast<> (&gtn::cuda::synchronize));
   m.def("synchronize", py::overload_cast<int> (&gtn::cuda::synchronize), "device"_a);
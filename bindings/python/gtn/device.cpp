@@ -2,6 +2,7 @@
 #include <pybind11/pybind11.h>
 #include <pybind11/operators.h>
 
+#include "bindings/python/gtn/memory_state.h"
 #include "gtn/gtn.h"
 
 using namespace gtn;
@@ -10,6 +11,7 @@ namespace py = pybind11;
 using namespace py::literals;
 
 PYBIND11_MODULE(device, m) {
+  shareMemoryState();
   py::enum_<DeviceType>(m, "DeviceType")
     .value("CPU", DeviceType::CPU)
     .value("CUDA", DeviceType::CUDA);
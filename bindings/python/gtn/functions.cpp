@@ -8,6 +8,7 @@
 #include <pybind11/pybind11.h>
 #include <pybind11/stl.h>
 
+#include "bindings/python/gtn/memory_state.h"
 #include "gtn/gtn.h"
 
 using namespace gtn;
@@ -16,6 +17,10 @@ namespace py = pybind11;
 using namespace py::literals;
 
 PYBIND11_MODULE(functions, m) {
+  shareMemoryState();
+  py::enum_<Semiring>(m, "Semiring")
+      .value("LOG", Semiring::LOG)
+      .value("TROPICAL", Semiring::TROPICAL);
   m.def(
       "add",
       [](const Graph& g1, const Graph& g2) {
@@ -105,6 +110,27 @@ PYBIND11_MODULE(functions, m) {
       },
       "graphs1"_a,
       "graphs2"_a);
+  m.def(
+      "compose_score",
+      [](const Graph& g1, const Graph& g2, Semiring semiring) {
+        py::gil_scoped_release release;
+        return composeScore(g1, g2, semiring);
+      },
+      "g1"_a,
+      "g2"_a,
+      "semiring"_a = Semiring::LOG);
+  m.def(
+      "compose_score",
+      [](const std::vector<Graph>& graphs1,
+         const std::vector<Graph>& graphs2,
+         Semiring semiring) {
+        py::gil_scoped_release release;
+        std::vector<Semiring> semirings{semiring};
+        return parallelMap(composeScore, graphs1, graphs2, semirings);
+      },
+      "graphs1"_a,
+      "graphs2"_a,
+      "semiring"_a = Semiring::LOG);
   m.def(
       "closure",
       [](const Graph& g) {
@@ -119,6 +145,47 @@ PYBIND11_MODULE(functions, m) {
         return parallelMap(closure, graphs);
       },
       "graphs"_a);
+  m.def(
+      "connect",
+      [](const Graph& g) {
+        py::gil_scoped_release release;
+        return connect(g);
+      },
+      "g"_a);
+  m.def(
+      "connect",
+      [](const std::vector<Graph>& graphs) {
+        py::gil_scoped_release release;
+        return parallelMap(connect, graphs);
+      },
+      "graphs"_a);
+  m.def(
+      "determinize",
+      [](const Graph& g, Semiring semiring, int maxStates, int maxArcs) {
+        py::gil_scoped_release release;
+        return determinize(g, semiring, maxStates, maxArcs);
+      },
+      "g"_a,
+      "semiring"_a = Semiring::LOG,
+      "max_states"_a = -1,
+      "max_arcs"_a = -1);
+  m.def(
+      "determinize",
+      [](const std::vector<Graph>& graphs,
+         Semiring semiring,
+         int maxStates,
+         int maxArcs) {
+        py::gil_scoped_release release;
+        std::vector<Semiring> semirings{semiring};
+        std::vector<int> maxStatesVec{maxStates};
+        std::vector<int> maxArcsVec{maxArcs};
+        return parallelMap(
+            determinize, graphs, semirings, maxStatesVec, maxArcsVec);
+      },
+      "graphs"_a,
+      "semiring"_a = Semiring::LOG,
+      "max_states"_a = -1,
+      "max_arcs"_a = -1);
   m.def(
       "forward_score",
       [](const Graph& g) {
@@ -133,6 +200,43 @@ PYBIND11_MODULE(functions, m) {
         return parallelMap(forwardScore, graphs);
       },
       "graphs"_a);
+  m.def(
+      "minimize",
+      [](const Graph& g, Semiring semiring) {
+        py::gil_scoped_release release;
+        return minimize(g, semiring);
+      },
+      "g"_a,
+      "semiring"_a = Semiring::LOG);
+  m.def(
+      "minimize",
+      [](const std::vector<Graph>& graphs, Semiring semiring) {
+        py::gil_scoped_release release;
+        std::vector<Semiring> semirings{semiring};
+        return parallelMap(minimize, graphs, semirings);
+      },
+      "graphs"_a,
+      "semiring"_a = Semiring::LOG);
+  m.def(
+      "nbest",
+      [](const Graph& g, int k, bool unique) {
+        py::gil_scoped_release release;
+        return nbest(g, k, unique);
+      },
+      "g"_a,
+      "k"_a,
+      "unique"_a = true);
+  m.def(
+      "nbest",
+      [](const std::vector<Graph>& graphs, int k, bool unique) {
+        py::gil_scoped_release release;
+        std::vector<int> ks{k};
+        std::vector<bool> uniques{unique};
+        return parallelMap(nbest, graphs, ks, uniques);
+      },
+      "graphs"_a,
+      "k"_a,
+      "unique"_a = true);
   m.def(
       "negate",
       [](const Graph& g) {
@@ -175,32 +279,67 @@ PYBIND11_MODULE(functions, m) {
         return parallelMap(projectOutput, graphs);
       },
       "graphs"_a);
+  m.def(
+      "prune",
+      [](const Graph& g, float beam, int maxArcs, Semiring semiring) {
+        py::gil_scoped_release release;
+        return prune(g, beam, maxArcs, semiring);
+      },
+      "g"_a,
+      "beam"_a,
+      "max_arcs"_a = -1,
+      "semiring"_a = Semiring::LOG);
+  m.def(
+      "prune",
+      [](const std::vector<Graph>& graphs,
+         float beam,
+         int maxArcs,
+         Semiring semiring) {
+        py::gil_scoped_release release;
+        std::vector<float> beams{beam};
+        std::vector<int> maxArcsVec{maxArcs};
+        std::vector<Semiring> semirings{semiring};
+        return parallelMap(prune, graphs, beams, maxArcsVec, semirings);
+      },
+      "graphs"_a,
+      "beam"_a,
+      "max_arcs"_a = -1,
+      "semiring"_a = Semiring::LOG);
   m.def(
       "remove",
-      [](const Graph& g, int label) {
+      [](const Graph& g, int label, Semiring semiring) {
         py::gil_scoped_release release;
-        return remove(g, label);
+        return remove(g, label, semiring);
       },
       "g"_a,
-      "label"_a = epsilon);
+      "label"_a = epsilon,
+      "semiring"_a = Semiring::LOG);
   m.def(
       "remove",
-      [](const Graph& g, int ilabel, int olabel) {
+      [](const Graph& g, int ilabel, int olabel, Semiring semiring) {
         py::gil_scoped_release release;
-        return remove(g, ilabel, olabel);
+        return remove(g, ilabel, olabel, semiring);
       },
       "g"_a,
       "ilabel"_a,
-      "olabel"_a);
+      "olabel"_a,
+      "semiring"_a = Semiring::LOG);
   m.def(
       "remove",
-      [](const std::vector<Graph>& graphs, const std::vector<int>& labels) {
+      [](const std::vector<Graph>& graphs,
+         const std::vector<int>& labels,
+         Semiring semiring) {
         py::gil_scoped_release release;
+        std::vector<Semiring> semirings{semiring};
         return parallelMap(
-            static_cast<Graph (*)(const Graph&, int)>(&remove), graphs, labels);
+            static_cast<Graph (*)(const Graph&, int, Semiring)>(&remove),
+            graphs,
+            labels,
+            semirings);
       },
       "graphs"_a,
-      "labels"_a = std::vector<int>{ epsilon });
+      "labels"_a = std::vector<int>{ epsilon },
+      "semiring"_a = Semiring::LOG);
   m.def(
       "subtract",
       [](const Graph& g1, const Graph& g2) {
@@ -12,6 +12,7 @@
 #include <pybind11/pybind11.h>
 #include <pybind11/stl.h>
 
+#include "bindings/python/gtn/memory_state.h"
 #include "gtn/gtn.h"
 
 using namespace gtn;
@@ -19,7 +20,25 @@ using namespace gtn;
 namespace py = pybind11;
 using namespace py::literals;
 
+namespace {
+
+using IntArray = py::array_t<int, py::array::c_style | py::array::forcecast>;
+using FloatArray =
+    py::array_t<float, py::array::c_style | py::array::forcecast>;
+using BoolArray = py::array_t<bool, py::array::c_style | py::array::forcecast>;
+
+// Keeps a Python object alive from C++, e.g. the owner of bound weights.
+std::shared_ptr<void> keepAlive(py::object obj) {
+  return std::shared_ptr<void>(new py::object(std::move(obj)), [](void* o) {
+    py::gil_scoped_acquire gil;
+    delete static_cast<py::object*>(o);
+  });
+}
+
+} // namespace
+
 PYBIND11_MODULE(graph, m) {
+  shareMemoryState();
   py::class_<Graph>(m, "Graph")
       .def(py::init<bool>(), "calc_grad"_a = true)
       .def(
@@ -41,6 +60,132 @@ PYBIND11_MODULE(graph, m) {
           "ilabel"_a,
           "olabel"_a,
           "weight"_a = 0.0)
+      .def(
+          "add_nodes",
+          [](Graph& g,
+             size_t numNodes,
+             const py::object& start,
+             const py::object& accept) {
+            bool hasStart = !start.is_none();
+            bool hasAccept = !accept.is_none();
+            auto startArr = hasStart ? start.cast<BoolArray>() : BoolArray();
+            auto acceptArr =
+                hasAccept ? accept.cast<BoolArray>() : BoolArray();
+            if ((hasStart && startArr.size() != numNodes) ||
+                (hasAccept && acceptArr.size() != numNodes)) {
+              throw std::invalid_argument(
+                  "[Graph.add_nodes] Start and accept arrays must have "
+                  "num_nodes elements.");
+            }
+            py::gil_scoped_release release;
+            return g.addNodes(
+                numNodes,
+                hasStart ? startArr.data() : nullptr,
+                hasAccept ? acceptArr.data() : nullptr);
+          },
+          "num_nodes"_a,
+          "start"_a = py::none(),
+          "accept"_a = py::none())
+      .def(
+          "add_arcs",
+          [](Graph& g,
+             const IntArray& src,
+             const IntArray& dst,
+             const IntArray& ilabel,
+             const py::object& olabel,
+             const py::object& weights) {
+            size_t numArcs = src.size();
+            bool hasOlabel = !olabel.is_none();
+            bool hasWeights = !weights.is_none();
+            auto olabelArr = hasOlabel ? olabel.cast<IntArray>() : ilabel;
+            auto weightsArr =
+                hasWeights ? weights.cast<FloatArray>() : FloatArray();
+            if (dst.size() != numArcs || ilabel.size() != numArcs ||
+                olabelArr.size() != numArcs ||
+                (hasWeights && weightsArr.size() != numArcs)) {
+              throw std::invalid_argument(
+                  "[Graph.add_arcs] Arc arrays must have the same size.");
+            }
+            py::gil_scoped_release release;
+            return g.addArcs(
+                numArcs,
+                src.data(),
+                dst.data(),
+                ilabel.data(),
+                olabelArr.data(),
+                hasWeights ? weightsArr.data() : nullptr);
+          },
+          "src"_a,
+          "dst"_a,
+          "ilabel"_a,
+          "olabel"_a = py::none(),
+          "weights"_a = py::none())
+      .def_static(
+          "from_numpy",
+          [](size_t numNodes,
+             const IntArray& start,
+             const IntArray& accept,
+             const IntArray& src,
+             const IntArray& dst,
+             const IntArray& ilabel,
+             const py::object& olabel,
+             const py::object& weights,
+             bool calcGrad) {
+            size_t numArcs = src.size();
+            bool hasOlabel = !olabel.is_none();
+            bool hasWeights = !weights.is_none();
+            auto olabelArr = hasOlabel ? olabel.cast<IntArray>() : ilabel;
+            auto weightsArr =
+                hasWeights ? weights.cast<FloatArray>() : FloatArray();
+            if (dst.size() != numArcs || ilabel.size() != numArcs ||
+                olabelArr.size() != numArcs ||
+                (hasWeights && weightsArr.size() != numArcs)) {
+              throw std::invalid_argument(
+                  "[Graph.from_numpy] Arc arrays must have the same size.");
+            }
+            py::gil_scoped_release release;
+            return Graph::fromArrays(
+                numNodes,
+                start.size(),
+                start.data(),
+                accept.size(),
+                accept.data(),
+                numArcs,
+                src.data(),
+                dst.data(),
+                ilabel.data(),
+                olabelArr.data(),
+                hasWeights ? weightsArr.data() : nullptr,
+                calcGrad);
+          },
+          "num_nodes"_a,
+          "start"_a,
+          "accept"_a,
+          "src"_a,
+          "dst"_a,
+          "ilabel"_a,
+          "olabel"_a = py::none(),
+          "weights"_a = py::none(),
+          "calc_grad"_a = true)
+      .def("reserve", &Graph::reserve, "num_nodes"_a, "num_arcs"_a)
+      .def(
+          "memory_usage",
+          [](const Graph& g) {
+            auto usage = g.memoryUsage();
+            return py::dict(
+                "topology"_a = usage.topology,
+                "arc_lists"_a = usage.arcLists,
+                "weights"_a = usage.weights,
+                "grad"_a = usage.grad,
+                "saved"_a = usage.saved,
+                "total"_a = usage.total());
+          })
+      .def(
+          "__sizeof__",
+          [](const Graph& g) {
+            return sizeof(Graph) + g.memoryUsage().total();
+          })
+      .def("shrink_to_fit", &Graph::shrinkToFit)
       .def("grad", (Graph & (Graph::*)()) & Graph::grad)
       .def("num_arcs", &Graph::numArcs)
       .def("num_nodes", &Graph::numNodes)
@@ -60,8 +205,46 @@ PYBIND11_MODULE(graph, m) {
           },
           "olabel"_a = false)
       .def("mark_arc_sorted", &Graph::markArcSorted, "olabel"_a = false)
+      .def(
+          "freeze",
+          [](Graph& g) {
+            py::gil_scoped_release release;
+            g.freeze();
+          })
+      .def("is_frozen", &Graph::isFrozen)
+      .def("topological_order", &Graph::topologicalOrder)
+      .def("is_acyclic", &Graph::isAcyclic)
       .def_property("calc_grad", &Graph::calcGrad, &Graph::setCalcGrad)
+      .def_property("compact", &Graph::isCompact, &Graph::setCompact)
       .def("zero_grad", &Graph::zeroGrad)
+      .def(
+          "set_grad_buffer",
+          [](Graph& g, const std::uintptr_t b, const py::object& owner) {
+            g.setGradBuffer(reinterpret_cast<float*>(b), keepAlive(owner));
+          },
+          "grad"_a,
+          "owner"_a = py::none())
+      .def(
+          "set_grad_buffer",
+          [](Graph& g, const py::object& grad) {
+            if (grad.is_none()) {
+              g.setGradBuffer(nullptr);
+              return;
+            }
+            // The gradient is written in place so the array can't be
+            // converted.
+            if (!py::isinstance<FloatArray>(grad) ||
+                !grad.cast<py::array>().writeable() ||
+                grad.cast<py::array>().size() != g.numArcs()) {
+              throw std::invalid_argument(
+                  "[Graph.set_grad_buffer] Gradient buffer must be a "
+                  "writeable, contiguous float32 array with num_arcs "
+                  "elements.");
+            }
+            auto arr = py::reinterpret_borrow<FloatArray>(grad);
+            g.setGradBuffer(arr.mutable_data(), keepAlive(arr));
+          },
+          "grad"_a)
       .def(
           "weights",
           [](Graph& g) {
@@ -104,6 +287,28 @@ PYBIND11_MODULE(graph, m) {
           [](Graph& g, const py::array_t<float> weights) {
             g.setWeights(reinterpret_cast<float*>(weights.request().ptr));
           })
+      .def(
+          "bind_weights",
+          [](Graph& g, const std::uintptr_t b, const py::object& owner) {
+            g.bindWeights(reinterpret_cast<float*>(b), keepAlive(owner));
+          },
+          "weights"_a,
+          "owner"_a = py::none())
+      .def(
+          "bind_weights",
+          [](Graph& g, FloatArray arr) {
+            // Contiguous float32 arrays are used in place. Any other array
+            // is converted with a single copy when the argument is cast.
+            if (!arr.writeable()) {
+              arr = FloatArray(arr.size(), arr.data());
+            }
+            if (arr.size() != g.numArcs()) {
+              throw std::invalid_argument(
+                  "[Graph.bind_weights] Weights must have num_arcs elements.");
+            }
+            g.bindWeights(arr.mutable_data(), keepAlive(arr));
+          },
+          "weights"_a)
       .def("labels_to_list", &Graph::labelsToVector, "ilabel"_a = true)
       .def("__repr__", [](const Graph& a) {
         std::ostringstream ss;
@@ -0,0 +1,35 @@
+/*
+ * Copyright (c) Facebook, Inc. and its affiliates.
+ *
+ * This source code is licensed under the MIT license found in the
+ * LICENSE file in the root directory of this source tree.
+ */
+
+#include <pybind11/pybind11.h>
+
+#include "gtn/gtn.h"
+
+using namespace gtn;
+
+namespace py = pybind11;
+using namespace py::literals;
+
+PYBIND11_MODULE(memory, m) {
+  // Shared with the other extension modules, see memory_state.h
+  m.attr("_state") = py::capsule(memory::detail::getState());
+  m.def("memory_stats", []() {
+    auto stats = memory::stats();
+    return py::dict(
+        "live_bytes"_a = stats.liveBytes,
+        "peak_bytes"_a = stats.peakBytes,
+        "device_live_bytes"_a = stats.deviceLiveBytes,
+        "device_peak_bytes"_a = stats.devicePeakBytes,
+        "pooled_bytes"_a = stats.pooledBytes);
+  });
+  m.def("reset_peak_memory_stats", &memory::resetPeakStats);
+  m.def("set_pool_enabled", &memory::setPoolEnabled, "enabled"_a);
+  m.def("is_pool_enabled", &memory::isPoolEnabled);
+  m.def("set_pool_limit", &memory::setPoolLimit, "bytes"_a);
+  m.def("pool_limit", &memory::poolLimit);
+  m.def("trim_pool", &memory::trimPool);
+}
@@ -0,0 +1,22 @@
+/*
+ * Copyright (c) Facebook, Inc. and its affiliates.
+ *
+ * This source code is licensed under the MIT license found in the
+ * LICENSE file in the root directory of this source tree.
+ */
+
+#pragma once
+
+#include <pybind11/pybind11.h>
+
+#include "gtn/memory.h"
+
+/**
+ * Each extension module links its own copy of the gtn library. Call this
+ * when initializing a module so that all of them use the memory pool and
+ * counters of the `gtn.memory` module.
+ */
+inline void shareMemoryState() {
+  auto state = pybind11::module::import("gtn.memory").attr("_state");
+  gtn::memory::detail::setState(state.cast<pybind11::capsule>());
+}
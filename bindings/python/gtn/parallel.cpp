@@ -9,6 +9,7 @@
 #include <pybind11/pybind11.h>
 #include <pybind11/stl.h>
 
+#include "bindings/python/gtn/memory_state.h"
 #include "gtn/gtn.h"
 
 using namespace gtn;
@@ -17,6 +18,7 @@ namespace py = pybind11;
 using namespace py::literals;
 
 PYBIND11_MODULE(parallel, m) {
+  shareMemoryState();
   m.def(
       "parallel_for",
       [](const std::function<void(int)>& function,
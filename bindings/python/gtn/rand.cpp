@@ -8,6 +8,7 @@
 #include <pybind11/pybind11.h>
 #include <pybind11/stl.h>
 
+#include "bindings/python/gtn/memory_state.h"
 #include "gtn/gtn.h"
 
 using namespace gtn;
@@ -16,6 +17,7 @@ namespace py = pybind11;
 using namespace py::literals;
 
 PYBIND11_MODULE(rand, m) {
+  shareMemoryState();
   m.def(
       "sample",
       [](const Graph& graph, size_t maxLength) {
@@ -8,6 +8,7 @@
 #include <pybind11/pybind11.h>
 #include <pybind11/stl.h>
 
+#include "bindings/python/gtn/memory_state.h"
 #include "gtn/gtn.h"
 
 using namespace gtn;
@@ -16,6 +17,7 @@ namespace py = pybind11;
 using namespace py::literals;
 
 PYBIND11_MODULE(utils, m) {
+  shareMemoryState();
   m.def("equal", equal, "g1"_a, "g2"_a);
   m.def("isomorphic", isomorphic, "g1"_a, "g2"_a);
   m.def(
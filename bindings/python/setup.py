@@ -125,6 +125,7 @@ setup(
         CMakeExtension("gtn.criterion.criterion"),
         CMakeExtension("gtn.functions"),
         CMakeExtension("gtn.parallel"),
+        CMakeExtension("gtn.memory"),
     ],
     cmdclass={"build_ext": CMakeBuild},
     zip_safe=False,
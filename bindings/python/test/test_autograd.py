@@ -6,6 +6,7 @@ LICENSE file in the root directory of this source tree.
 """
 
 import math
+import numpy as np
 import unittest
 import gtn
 
@@ -182,6 +183,37 @@ class AutogradTestCase(unittest.TestCase):
         gtn.backward(gtn.forward_score(g))
         self.assertTrue(g.is_grad_available())
 
+    def test_grad_buffer(self):
+        g = gtn.Graph()
+        g.add_node(True)
+        g.add_node(False, True)
+        g.add_arc(0, 1, 0, 0, 1)
+        g.add_arc(0, 1, 1, 1, 1)
+        buffer = np.full(2, 5.0, dtype=np.float32)
+        g.set_grad_buffer(buffer)
+
+        # the gradient is written to the buffer
+        gtn.backward(gtn.forward_score(g))
+        self.assertEqual(buffer.tolist(), [0.5, 0.5])
+        self.assertEqual(g.grad().weights(), buffer.__array_interface__["data"][0])
+
+        # and accumulated into it
+        gtn.backward(gtn.forward_score(g))
+        self.assertEqual(buffer.tolist(), [1.0, 1.0])
+
+        g.zero_grad()
+        g.set_grad_buffer(None)
+        gtn.backward(gtn.forward_score(g))
+        self.assertEqual(buffer.tolist(), [1.0, 1.0])
+
+        # buffers must be writeable float32 arrays of the right size
+        with self.assertRaises(ValueError):
+            g.set_grad_buffer(np.zeros(2, dtype=np.float64))
+        with self.assertRaises(ValueError):
+            g.set_grad_buffer(np.zeros(3, dtype=np.float32))
+        with self.assertRaises(ValueError):
+            g.set_grad_buffer(np.zeros(4, dtype=np.float32)[::2])
+
     def test_forward_score_grad(self):
         g = gtn.Graph()
         g.add_node(True)
@@ -98,6 +98,40 @@ class GraphTestCase(unittest.TestCase):
         self.assertTrue(list_almost_equal(weights_new, weights_new_arr.tolist(), 1e-4))
         self.g.set_weights(weights_original)
 
+    def test_graph_weights_bind(self):
+        # contiguous float32 arrays are used in place
+        weights = np.array([1.1, -3.4, 0, 0.5, 0], dtype=np.float32)
+        self.g.bind_weights(weights)
+        weights[1] = 2.0
+        self.assertTrue(
+            list_almost_equal(self.g.weights_to_list(), weights.tolist(), 1e-4)
+        )
+        self.assertEqual(
+            self.g.weights(), weights.__array_interface__["data"][0])
+
+        # the graph keeps the array alive
+        self.g.bind_weights(np.arange(5, dtype=np.float32))
+        self.assertEqual(self.g.weights_to_list(), [0, 1, 2, 3, 4])
+
+        # strided views and other dtypes are copied
+        weights = np.arange(10, dtype=np.float32).reshape(5, 2)[:, 1]
+        self.g.bind_weights(weights)
+        self.assertEqual(self.g.weights_to_list(), [1, 3, 5, 7, 9])
+        self.g.bind_weights(np.arange(5, dtype=np.float64))
+        self.assertEqual(self.g.weights_to_list(), [0, 1, 2, 3, 4])
+
+        # any buffer protocol object works
+        self.g.bind_weights(memoryview(np.ones(5, dtype=np.float32)))
+        self.assertEqual(self.g.weights_to_list(), [1, 1, 1, 1, 1])
+
+        # pointers with an owner
+        weights = np.full(5, 2.0, dtype=np.float32)
+        self.g.bind_weights(weights.__array_interface__["data"][0], weights)
+        self.assertEqual(self.g.weights_to_list(), [2, 2, 2, 2, 2])
+
+        with self.assertRaises(ValueError):
+            self.g.bind_weights(np.ones(3, dtype=np.float32))
+
     def test_comparisons(self):
         g1 = gtn.Graph()
         g1.add_node(True)
@@ -120,6 +154,111 @@ class GraphTestCase(unittest.TestCase):
         self.assertFalse(gtn.equal(g1, g2))
         self.assertTrue(gtn.isomorphic(g1, g2))
 
+    def test_graph_add_nodes_arcs(self):
+        g = gtn.Graph(False)
+        self.assertEqual(g.add_nodes(1, start=np.array([True])), 0)
+        self.assertEqual(g.add_nodes(3), 1)
+        self.assertEqual(g.add_nodes(1, accept=[True]), 4)
+        self.assertEqual(
+            g.add_arcs(np.array([0, 0, 1]), np.array([1, 2, 2]), np.array([0, 1, 0])),
+            0,
+        )
+        self.assertEqual(
+            g.add_arcs([1, 2], [1, 3], [1, 2], olabel=[2, 2], weights=[2.1, 0.0]),
+            3,
+        )
+        self.assertEqual(g.num_nodes(), 5)
+        self.assertEqual(g.num_start(), 1)
+        self.assertEqual(g.num_accept(), 1)
+        self.assertTrue(gtn.equal(g, self.g))
+
+        # Mismatched or invalid arrays
+        with self.assertRaises(ValueError):
+            g.add_nodes(2, start=[True])
+        with self.assertRaises(ValueError):
+            g.add_arcs([0, 1], [1], [0, 0])
+        with self.assertRaises(ValueError):
+            g.add_arcs([0], [5], [0])
+        self.assertTrue(gtn.equal(g, self.g))
+
+    def test_graph_reserve(self):
+        g = gtn.Graph(False)
+        g.reserve(5, 5)
+        g.add_nodes(4, start=[True, False, False, False])
+        g.add_nodes(1, accept=[True])
+        g.add_arcs([0, 0, 1, 1, 2], [1, 2, 2, 1, 3], [0, 1, 0, 1, 2],
+                   olabel=[0, 1, 0, 2, 2], weights=[0, 0, 0, 2.1, 0])
+        g.shrink_to_fit()
+        self.assertTrue(gtn.equal(g, self.g))
+
+    def test_graph_compact(self):
+        g = gtn.Graph(False)
+        g.add_node(True)
+        g.add_node(False, True)
+        g.add_arc(0, 1, 0, 65534)
+        g.add_arc(0, 1, gtn.epsilon, 1, 1.5)
+        expected = gtn.clone(g)
+        self.assertFalse(g.compact)
+        g.compact = True
+        self.assertTrue(g.compact)
+        self.assertTrue(gtn.equal(g, expected))
+        self.assertEqual(g.labels_to_list(False), [65534, 1])
+        g.add_arc(1, 0, 65535)
+        self.assertFalse(g.compact)
+        with self.assertRaises(ValueError):
+            g.compact = True
+
+    def test_graph_freeze(self):
+        self.assertFalse(self.g.is_frozen())
+        self.g.freeze()
+        self.assertTrue(self.g.is_frozen())
+        with self.assertRaises(RuntimeError):
+            self.g.add_arc(0, 1, 0)
+        with self.assertRaises(RuntimeError):
+            self.g.add_node()
+        self.assertEqual(self.g.num_arcs(), 5)
+
+    def test_graph_topological_order(self):
+        # The graph has a self-loop on node 1
+        self.assertFalse(self.g.is_acyclic())
+        with self.assertRaises(ValueError):
+            self.g.topological_order()
+        g = gtn.Graph(False)
+        g.add_node(True)
+        g.add_node()
+        g.add_node(False, True)
+        g.add_arc(1, 2, 0)
+        g.add_arc(0, 1, 0)
+        self.assertTrue(g.is_acyclic())
+        self.assertEqual(g.topological_order(), [0, 1, 2])
+
+    def test_graph_from_numpy(self):
+        g = gtn.Graph.from_numpy(
+            5,
+            np.array([0]),
+            np.array([4]),
+            np.array([0, 0, 1, 1, 2]),
+            np.array([1, 2, 2, 1, 3]),
+            np.array([0, 1, 0, 1, 2]),
+            np.array([0, 1, 0, 2, 2]),
+            np.array([0, 0, 0, 2.1, 0]),
+            calc_grad=False,
+        )
+        self.assertTrue(gtn.equal(g, self.g))
+        self.assertFalse(g.calc_grad)
+
+        # Acceptor with default weights from buffer-protocol objects
+        g = gtn.Graph.from_numpy(2, [0], [1], [0, 0], [1, 1], [3, 4])
+        self.assertEqual(g.labels_to_list(False), [3, 4])
+        self.assertEqual(g.weights_to_list(), [0, 0])
+        self.assertTrue(g.calc_grad)
+
+        # Mismatched or invalid arrays
+        with self.assertRaises(ValueError):
+            gtn.Graph.from_numpy(2, [0], [1], [0, 0], [1], [3, 4])
+        with self.assertRaises(ValueError):
+            gtn.Graph.from_numpy(2, [0], [1], [0], [2], [3])
+
     def test_save_load(self):
         with tempfile.NamedTemporaryFile(mode="r") as fid:
             gtn.savetxt(fid.name, self.g)
@@ -139,6 +278,50 @@ class GraphTestCase(unittest.TestCase):
         self.assertEqual(g.num_nodes(), 2)
         self.assertEqual(g.labels_to_list(), [gtn.epsilon])
 
+    def test_memory_usage(self):
+        usage = self.g.memory_usage()
+        self.assertGreaterEqual(usage["weights"], 4 * self.g.num_arcs())
+        self.assertEqual(usage["grad"], 0)
+        self.assertEqual(usage["saved"], 0)
+        self.assertEqual(
+            usage["total"],
+            sum(usage[k] for k in ["topology", "arc_lists", "weights", "grad", "saved"]),
+        )
+        self.assertGreater(self.g.__sizeof__(), usage["total"])
+
+        g = gtn.Graph()
+        g.add_node(True, True)
+        g.add_arc(0, 0, 0)
+        out = gtn.negate(g)
+        self.assertEqual(out.memory_usage()["saved"], g.memory_usage()["total"])
+
+
+class MemoryTestCase(unittest.TestCase):
+    def test_memory_stats(self):
+        gtn.reset_peak_memory_stats()
+        start = gtn.memory_stats()
+        self.assertEqual(start["peak_bytes"], start["live_bytes"])
+
+        # Counters are shared by all of the extension modules
+        g = gtn.linear_graph(100, 100)
+        stats = gtn.memory_stats()
+        self.assertGreaterEqual(
+            stats["live_bytes"] - start["live_bytes"], 4 * 100 * 100)
+        del g
+        stats = gtn.memory_stats()
+        self.assertEqual(stats["live_bytes"], start["live_bytes"])
+        self.assertGreater(stats["peak_bytes"], start["live_bytes"])
+
+    def test_pool(self):
+        self.assertFalse(gtn.is_pool_enabled())
+        gtn.set_pool_enabled(True)
+        g = gtn.linear_graph(100, 100)
+        del g
+        self.assertGreater(gtn.memory_stats()["pooled_bytes"], 0)
+        gtn.trim_pool()
+        self.assertEqual(gtn.memory_stats()["pooled_bytes"], 0)
+        gtn.set_pool_enabled(False)
+
 
 class FunctionsTestCase(unittest.TestCase):
     def test_scalar_ops(self):
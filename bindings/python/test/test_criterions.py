@@ -7,6 +7,7 @@ LICENSE file in the root directory of this source tree.
 
 import math
 import unittest
+import numpy as np
 import gtn
 import gtn.criterion
 
@@ -162,6 +163,43 @@ class CriterionsTestCase(unittest.TestCase):
                 all_close = all_close and (abs(expected_grad[off + j] - g) < 1e-5)
         self.assertTrue(all_close)
 
+    def test_ctc_loss_batch(self):
+        B, T, C, L = 3, 5, 4, 2
+        rng = np.random.RandomState(0)
+        log_probs = rng.randn(B, T, C).astype(np.float32)
+        targets = np.array([[1, 2], [3, 0], [2, 2]], dtype=np.int32)
+        input_lengths = [5, 3, 4]
+        target_lengths = [2, 1, 2]
+
+        losses, grads = gtn.criterion.ctc_loss_batch(
+            log_probs, targets, input_lengths, target_lengths, 0
+        )
+        self.assertEqual(losses.shape, (B,))
+        self.assertEqual(grads.shape, (B, T, C))
+        for b in range(B):
+            emissions = gtn.linear_graph(input_lengths[b], C)
+            emissions.set_weights(log_probs[b, : input_lengths[b]].flatten())
+            target = targets[b, : target_lengths[b]].tolist()
+            loss = gtn.criterion.ctc_loss(emissions, target, 0)
+            gtn.backward(loss)
+            self.assertAlmostEqual(losses[b], loss.item(), places=4)
+            expected = np.zeros((T, C), dtype=np.float32)
+            expected[: input_lengths[b]] = emissions.grad().weights_to_numpy().reshape(
+                -1, C
+            )
+            self.assertTrue(np.allclose(grads[b], expected, atol=1e-5))
+
+        losses_only, no_grads = gtn.criterion.ctc_loss_batch(
+            log_probs, targets, input_lengths, target_lengths, 0, calc_grad=False
+        )
+        self.assertIsNone(no_grads)
+        self.assertTrue(np.allclose(losses_only, losses))
+
+        with self.assertRaises(ValueError):
+            gtn.criterion.ctc_loss_batch(
+                log_probs, targets, [5, 3], target_lengths, 0
+            )
+
     def test_asg_criterion(self):
         # This test cases is taken from wav2letter: https://fburl.com/msom2e4v
         T = 5
@@ -288,6 +326,68 @@ class CriterionsTestCase(unittest.TestCase):
             all_close = all_close and (abs(trans_grad[i] - g) < 1e-4)
         self.assertTrue(all_close)
 
+    def test_asg_loss(self):
+        T, N = 5, 4
+        rng = np.random.RandomState(0)
+        transitions = gtn.Graph()
+        transitions.add_node(True)
+        for i in range(1, N + 1):
+            transitions.add_node(False, True)
+            transitions.add_arc(0, i, i - 1)  # p(i | <s>)
+        for i in range(N):
+            for j in range(N):
+                transitions.add_arc(j + 1, i + 1, i)  # p(i | j)
+        transitions.set_weights(
+            rng.randn(transitions.num_arcs()).astype(np.float32)
+        )
+        emissions_vec = rng.randn(T * N).astype(np.float32)
+
+        targets = [[2, 1, 3], [3, 2, 2, 1], [0]]
+        expected_trans_grad = np.zeros(transitions.num_arcs(), dtype=np.float32)
+        for target in targets:
+            emissions = emissions_graph(emissions_vec, T, N, True)
+            fal = gtn.Graph()
+            fal.add_node(True)
+            for l in range(1, len(target) + 1):
+                fal.add_node(False, l == len(target))
+                fal.add_arc(l - 1, l, target[l - 1])
+                fal.add_arc(l, l, target[l - 1])
+            expected = gtn.subtract(
+                gtn.forward_score(gtn.compose(emissions, transitions)),
+                gtn.forward_score(
+                    gtn.compose(gtn.compose(fal, transitions), emissions)
+                ),
+            )
+            gtn.backward(expected)
+            expected_grad = emissions.grad().weights_to_numpy()
+            expected_trans_grad += transitions.grad().weights_to_numpy()
+            transitions.zero_grad()
+            emissions.zero_grad()
+
+            loss = gtn.criterion.asg_loss(emissions, transitions, target)
+            self.assertAlmostEqual(loss.item(), expected.item(), places=4)
+            gtn.backward(loss)
+            self.assertTrue(
+                np.allclose(
+                    emissions.grad().weights_to_numpy(), expected_grad, atol=1e-5
+                )
+            )
+            transitions.zero_grad()
+
+        # The batch accumulates the gradients of the shared transitions
+        batch = [emissions_graph(emissions_vec, T, N, True) for _ in targets]
+        losses = gtn.criterion.asg_loss(batch, transitions, targets)
+        self.assertEqual(len(losses), len(targets))
+        for loss in losses:
+            gtn.backward(loss)
+        self.assertTrue(
+            np.allclose(
+                transitions.grad().weights_to_numpy(),
+                expected_trans_grad,
+                atol=1e-4,
+            )
+        )
+
     def test_asg_viterbi_path(self):
         # Test adapted from wav2letter https://tinyurl.com/yc6nxex9
         T = 4
@@ -324,6 +424,71 @@ class CriterionsTestCase(unittest.TestCase):
 
         self.assertEqual(path.labels_to_list(), expectedPath)
 
+    def test_crf_loss(self):
+        T, K = 4, 3
+        rng = np.random.RandomState(0)
+        # Bigram transitions with the start node last
+        transitions = gtn.Graph()
+        for i in range(K + 1):
+            transitions.add_node(i == K, True)
+        for i in range(K):
+            transitions.add_arc(K, i, i)  # s(<s>, i)
+            for j in range(K):
+                transitions.add_arc(i, j, j)  # s(i, j)
+        transitions.set_weights(
+            rng.randn(transitions.num_arcs()).astype(np.float32)
+        )
+        emissions_vec = rng.randn(T * K).astype(np.float32)
+
+        targets = [[0, 1, 2, 1], [2, 2, 2, 2]]
+        for target in targets:
+            emissions = emissions_graph(emissions_vec, T, K, True)
+            labels = gtn.Graph()
+            labels.add_node(True)
+            for t in range(1, T + 1):
+                labels.add_node(False, t == T)
+                labels.add_arc(t - 1, t, target[t - 1])
+            expected = gtn.subtract(
+                gtn.forward_score(gtn.compose(emissions, transitions)),
+                gtn.forward_score(
+                    gtn.compose(emissions, gtn.intersect(labels, transitions))
+                ),
+            )
+            gtn.backward(expected)
+            expected_grad = emissions.grad().weights_to_numpy()
+            expected_trans_grad = transitions.grad().weights_to_numpy()
+            transitions.zero_grad()
+            emissions.zero_grad()
+
+            loss = gtn.criterion.crf_loss(emissions, transitions, target)
+            self.assertAlmostEqual(loss.item(), expected.item(), places=4)
+            gtn.backward(loss)
+            self.assertTrue(
+                np.allclose(
+                    emissions.grad().weights_to_numpy(), expected_grad, atol=1e-5
+                )
+            )
+            self.assertTrue(
+                np.allclose(
+                    transitions.grad().weights_to_numpy(),
+                    expected_trans_grad,
+                    atol=1e-5,
+                )
+            )
+            transitions.zero_grad()
+
+        emissions = emissions_graph(emissions_vec, T, K, True)
+        path = gtn.viterbi_path(gtn.compose(emissions, transitions))
+        decoded = gtn.criterion.crf_decode(emissions, transitions)
+        self.assertEqual(decoded, path.labels_to_list(False))
+
+        batch = [emissions_graph(emissions_vec, T, K, True) for _ in targets]
+        losses = gtn.criterion.crf_loss(batch, transitions, targets)
+        self.assertEqual(len(losses), len(targets))
+        self.assertEqual(
+            gtn.criterion.crf_decode(batch, transitions), [decoded] * len(batch)
+        )
+
 
 if __name__ == "__main__":
     unittest.main()
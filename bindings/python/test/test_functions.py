@@ -791,6 +791,66 @@ class FunctionsTestCase(unittest.TestCase):
         expected.add_arc(2, 2, 2)
         self.assertTrue(gtn.isomorphic(gtn.union([g1, g2, g3]), expected))
 
+    def test_connect(self):
+        g = gtn.Graph()
+        g.add_node(True)
+        g.add_node()
+        g.add_node()
+        g.add_node()
+        g.add_node(False, True)
+        g.add_arc(0, 1, 0, 0, 1.0)
+        g.add_arc(1, 4, 1, 2, 2.0)
+        g.add_arc(1, 2, 2, 2, 3.0)
+        g.add_arc(3, 4, 4, 4, 5.0)
+
+        expected = gtn.Graph()
+        expected.add_node(True)
+        expected.add_node()
+        expected.add_node(False, True)
+        expected.add_arc(0, 1, 0, 0, 1.0)
+        expected.add_arc(1, 2, 1, 2, 2.0)
+        self.assertTrue(gtn.equal(gtn.connect(g), expected))
+
+        gtn.backward(gtn.forward_score(gtn.connect(g)))
+        self.assertEqual(g.grad().weights_to_list(), [1.0, 1.0, 0.0, 0.0])
+
+    def test_compose_score(self):
+        emissions = gtn.linear_graph(4, 3)
+        emissions.set_weights([0.1 * i for i in range(12)])
+        target = gtn.Graph()
+        target.add_node(True)
+        target.add_node(False, True)
+        target.add_arc(0, 0, 0)
+        target.add_arc(0, 1, 1, 1, 0.5)
+        target.add_arc(1, 1, 1)
+        target.add_arc(1, 1, 2)
+
+        for semiring, score_fn in [
+            (gtn.Semiring.LOG, gtn.forward_score),
+            (gtn.Semiring.TROPICAL, gtn.viterbi_score),
+        ]:
+            emissions.zero_grad()
+            target.zero_grad()
+            fused = gtn.compose_score(emissions, target, semiring)
+            gtn.backward(fused)
+            grad1 = emissions.grad().weights_to_list()
+            grad2 = target.grad().weights_to_list()
+
+            emissions.zero_grad()
+            target.zero_grad()
+            expected = score_fn(gtn.compose(emissions, target))
+            gtn.backward(expected)
+            self.assertAlmostEqual(fused.item(), expected.item(), places=5)
+            for a, b in zip(grad1, emissions.grad().weights_to_list()):
+                self.assertAlmostEqual(a, b, places=5)
+            for a, b in zip(grad2, target.grad().weights_to_list()):
+                self.assertAlmostEqual(a, b, places=5)
+
+        scores = gtn.compose_score([emissions, emissions], [target])
+        self.assertAlmostEqual(
+            scores[1].item(), gtn.compose_score(emissions, target).item(), places=5
+        )
+
     def test_remove(self):
         g = gtn.Graph(False)
         g.add_node(True)
@@ -916,6 +976,156 @@ class FunctionsTestCase(unittest.TestCase):
         expected.add_arc(1, 2, 0)
         self.assertTrue(gtn.equal(gtn.remove(g), expected))
 
+    def test_remove_weighted(self):
+        g = gtn.Graph()
+        g.add_node(True)
+        g.add_node()
+        g.add_node()
+        g.add_node(False, True)
+        g.add_arc(0, 1, 0, 0, 0.5)
+        g.add_arc(1, 2, gtn.epsilon, gtn.epsilon, 0.2)
+        g.add_arc(1, 2, gtn.epsilon, gtn.epsilon, -0.4)
+        g.add_arc(2, 3, 1, 1, 0.6)
+        g.add_arc(1, 3, gtn.epsilon, gtn.epsilon, 0.3)
+
+        removed = gtn.remove(g)
+        self.assertNotIn(gtn.epsilon, removed.labels_to_list())
+        self.assertAlmostEqual(
+            gtn.forward_score(removed).item(), gtn.forward_score(g).item(), places=5
+        )
+        gtn.backward(gtn.forward_score(removed))
+        removed_grad = g.grad().weights_to_list()
+        g.zero_grad()
+        gtn.backward(gtn.forward_score(g))
+        for a, b in zip(removed_grad, g.grad().weights_to_list()):
+            self.assertAlmostEqual(a, b, places=5)
+
+        removed = gtn.remove(g, gtn.epsilon, gtn.Semiring.TROPICAL)
+        self.assertAlmostEqual(
+            gtn.viterbi_score(removed).item(), gtn.viterbi_score(g).item(), places=5
+        )
+
+    def test_determinize(self):
+        g = gtn.Graph()
+        g.add_node(True)
+        g.add_node()
+        g.add_node()
+        g.add_node(False, True)
+        g.add_arc(0, 1, 0, 0, 0.5)
+        g.add_arc(0, 2, 0, 0, -0.3)
+        g.add_arc(1, 3, 1, 1, 0.2)
+        g.add_arc(2, 3, 1, 1, 0.6)
+        g.add_arc(2, 3, 2, 2, 0.1)
+
+        det = gtn.determinize(g)
+        self.assertEqual(det.num_arcs(), 3)
+        self.assertAlmostEqual(
+            gtn.forward_score(det).item(), gtn.forward_score(g).item(), places=5
+        )
+        gtn.backward(gtn.forward_score(det))
+        det_grad = g.grad().weights_to_list()
+        g.zero_grad()
+        gtn.backward(gtn.forward_score(g))
+        for a, b in zip(det_grad, g.grad().weights_to_list()):
+            self.assertAlmostEqual(a, b, places=5)
+
+        dets = gtn.determinize([g, g], gtn.Semiring.TROPICAL)
+        for det in dets:
+            self.assertAlmostEqual(
+                gtn.viterbi_score(det).item(), gtn.viterbi_score(g).item(), places=5
+            )
+
+        # A graph without a finite deterministic equivalent
+        g.add_arc(1, 1, 3, 3, 0.1)
+        g.add_arc(2, 2, 3, 3, 0.2)
+        with self.assertRaises(ValueError):
+            gtn.determinize(g, gtn.Semiring.TROPICAL, max_states=50)
+
+        # The empty path accepted from several start nodes
+        g = gtn.Graph()
+        g.add_node(True, True)
+        g.add_node(True, True)
+        with self.assertRaises(ValueError):
+            gtn.determinize(g)
+        self.assertEqual(gtn.determinize(g, gtn.Semiring.TROPICAL).num_nodes(), 1)
+
+    def test_minimize(self):
+        # The paths after the first arc are the same once weights are pushed
+        g = gtn.Graph()
+        g.add_node(True)
+        g.add_node()
+        g.add_node()
+        g.add_node(False, True)
+        g.add_node(False, True)
+        g.add_arc(0, 1, 0, 0, 0.5)
+        g.add_arc(0, 2, 1, 1, -0.2)
+        g.add_arc(1, 3, 2, 2, 0.3)
+        g.add_arc(2, 4, 2, 2, 0.8)
+
+        minimized = gtn.minimize(gtn.determinize(g))
+        self.assertEqual(minimized.num_nodes(), 3)
+        self.assertEqual(minimized.num_arcs(), 3)
+        self.assertAlmostEqual(
+            gtn.forward_score(minimized).item(),
+            gtn.forward_score(g).item(),
+            places=5,
+        )
+
+        for minimized in gtn.minimize([g, g], gtn.Semiring.TROPICAL):
+            self.assertEqual(minimized.num_nodes(), 3)
+            self.assertAlmostEqual(
+                gtn.viterbi_score(minimized).item(),
+                gtn.viterbi_score(g).item(),
+                places=5,
+            )
+
+    def test_prune(self):
+        g = gtn.Graph()
+        g.add_node(True)
+        g.add_node()
+        g.add_node(False, True)
+        g.add_arc(0, 1, 0, 0, 0.5)
+        g.add_arc(0, 1, 1, 1, -5.0)
+        g.add_arc(1, 2, 0, 0, 0.2)
+        g.add_arc(1, 2, 1, 1, -0.1)
+
+        pruned = gtn.prune(g, 3.0)
+        self.assertEqual(pruned.labels_to_list(), [0, 0, 1])
+        gtn.backward(gtn.forward_score(pruned))
+        self.assertEqual(g.grad().weights_to_list()[1], 0.0)
+
+        pruned = gtn.prune([g, g], 10.0, max_arcs=2, semiring=gtn.Semiring.TROPICAL)
+        for pruned in pruned:
+            self.assertEqual(pruned.labels_to_list(), [0, 0])
+
+        g.add_arc(2, 0, 0)
+        with self.assertRaises(ValueError):
+            gtn.prune(g, 1.0)
+
+    def test_nbest(self):
+        g = gtn.Graph()
+        g.add_node(True)
+        g.add_node()
+        g.add_node(False, True)
+        g.add_arc(0, 1, 0, 0, 1.0)
+        g.add_arc(0, 1, 0, 0, 0.5)
+        g.add_arc(0, 1, 1, 1, 0.2)
+        g.add_arc(1, 2, 2, 2, 0.0)
+
+        paths = gtn.nbest(g, 3)
+        self.assertEqual([p.labels_to_list() for p in paths], [[0, 2], [1, 2]])
+        paths = gtn.nbest(g, 3, unique=False)
+        self.assertEqual(len(paths), 3)
+        scores = [gtn.viterbi_score(p).item() for p in paths]
+        for a, b in zip(scores, [1.0, 0.5, 0.2]):
+            self.assertAlmostEqual(a, b, places=5)
+
+        gtn.backward(gtn.viterbi_score(paths[1]))
+        self.assertEqual(g.grad().weights_to_list(), [0.0, 1.0, 0.0, 1.0])
+
+        for paths in gtn.nbest([g, g], 2, unique=False):
+            self.assertEqual([p.labels_to_list() for p in paths], [[0, 2], [0, 2]])
+
 
 if __name__ == "__main__":
     unittest.main()
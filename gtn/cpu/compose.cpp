@@ -6,9 +6,13 @@
  */
 
 #include <algorithm>
+#include <cmath>
+#include <limits>
+#include <numeric>
 #include <queue>
 
 #include "gtn/cpu/compose.h"
+#include "gtn/cpu/shortest.h"
 
 namespace gtn {
 namespace cpu {
@@ -403,6 +407,18 @@ std::pair<int, int> DoublySortedMatcher::next() {
   }
 }
 
+std::shared_ptr<ArcMatcher> makeMatcher(const Graph& g1, const Graph& g2) {
+  bool g1Sorted = g1.olabelSorted();
+  bool g2Sorted = g2.ilabelSorted();
+  if (g1Sorted && g2Sorted) {
+    return std::make_shared<DoublySortedMatcher>(g1, g2);
+  } else if (g1Sorted || g2Sorted) {
+    return std::make_shared<SinglySortedMatcher>(g1, g2, g1Sorted);
+  } else {
+    return std::make_shared<UnsortedMatcher>(g1, g2);
+  }
+}
+
 // Composes two graphs and returns a new graph
 Graph compose(
     const Graph& first,
@@ -537,5 +553,294 @@ Graph compose(
   return ngraph;
 }
 
+namespace {
+
+constexpr float kInf = std::numeric_limits<float>::infinity();
+constexpr float kNegInf = -std::numeric_limits<float>::infinity();
+
+bool hasEpsilon(const Graph& g, bool olabel) {
+  for (auto a = 0; a < g.numArcs(); ++a) {
+    if ((olabel ? g.olabel(a) : g.ilabel(a)) == epsilon) {
+      return true;
+    }
+  }
+  return false;
+}
+
+/*
+ * The states of the composition of two graphs, i.e. the node pairs
+ * `(n1, n2)` of the two graphs. As in `compose`, if there are epsilons to
+ * match each pair has three states: one which is not following an epsilon and
+ * one for following an epsilon in each of the graphs.
+ *
+ * The states are visited in an order where every arc of the composed graph
+ * goes from a state to one later in the order. If one graph is acyclic, the
+ * pairs in the topological order of that graph work, as long as the other
+ * graph can't take an arc on its own (matched with an epsilon) or is acyclic
+ * too, in which case its topological order is used to order its own arcs.
+ */
+class ProductStates {
+ public:
+  ProductStates(const Graph& first, const Graph& second)
+      : first_(first),
+        second_(second),
+        matcher_(makeMatcher(first, second)) {
+    bool eps1 = hasEpsilon(first, true);
+    bool eps2 = hasEpsilon(second, false);
+    numFlags_ = (eps1 || eps2) ? 3 : 1;
+    if (first.isAcyclic() && (!eps2 || second.isAcyclic())) {
+      firstOuter_ = true;
+      outer_ = first.topologicalOrder();
+      if (second.isAcyclic()) {
+        inner_ = second.topologicalOrder();
+      } else {
+        inner_.resize(second.numNodes());
+        std::iota(inner_.begin(), inner_.end(), 0);
+      }
+    } else if (second.isAcyclic() && !eps1) {
+      firstOuter_ = false;
+      outer_ = second.topologicalOrder();
+      inner_.resize(first.numNodes());
+      std::iota(inner_.begin(), inner_.end(), 0);
+    } else {
+      ordered_ = false;
+    }
+  }
+
+  /* Whether there is a known order for the states. */
+  bool ordered() const {
+    return ordered_;
+  }
+
+  size_t size() const {
+    return numFlags_ * first_.numNodes() * second_.numNodes();
+  }
+
+  int numFlags() const {
+    return numFlags_;
+  }
+
+  size_t index(int n1, int n2, int flag = 0) const {
+    return flag + numFlags_ * (n1 + first_.numNodes() * size_t(n2));
+  }
+
+  /* Calls `fn(n1, n2, flag)` for every state, in order or in reverse. */
+  template <typename Fn>
+  void forEach(bool reverse, Fn&& fn) const {
+    for (size_t i = 0; i < outer_.size(); ++i) {
+      auto a = outer_[reverse ? outer_.size() - 1 - i : i];
+      for (size_t j = 0; j < inner_.size(); ++j) {
+        auto b = inner_[reverse ? inner_.size() - 1 - j : j];
+        for (int f = 0; f < numFlags_; ++f) {
+          auto flag = reverse ? numFlags_ - 1 - f : f;
+          if (firstOuter_) {
+            fn(a, b, flag);
+          } else {
+            fn(b, a, flag);
+          }
+        }
+      }
+    }
+  }
+
+  /*
+   * Calls `fn(src, weight, i, j)` for every arc of the composed graph entering
+   * state `(n1, n2, flag)`, where `src` is the index of the source state and
+   * `i` and `j` are the arcs of the first and second graph the arc is made
+   * from (or -1 when only one graph takes an arc).
+   */
+  template <typename Fn>
+  void forEachIn(int n1, int n2, int flag, Fn&& fn) {
+    if (flag == 0) {
+      matcher_->match(n1, n2, true);
+      int i, j;
+      while (matcher_->hasNext()) {
+        std::tie(i, j) = matcher_->next();
+        auto src = index(first_.srcNode(i), second_.srcNode(j));
+        auto weight = first_.weight(i) + second_.weight(j);
+        // Epsilon matches can't be taken while following an epsilon in
+        // either graph.
+        int numSrcFlags = first_.olabel(i) == epsilon ? 1 : numFlags_;
+        for (int f = 0; f < numSrcFlags; ++f) {
+          fn(src + f, weight, i, j);
+        }
+      }
+      return;
+    }
+    bool secondOrFirst = flag == 2;
+    auto edges = secondOrFirst ? second_.in(n2) : first_.in(n1);
+    auto isSorted =
+        secondOrFirst ? second_.ilabelSorted() : first_.olabelSorted();
+    for (auto a : edges) {
+      auto label = secondOrFirst ? second_.ilabel(a) : first_.olabel(a);
+      if (label != epsilon) {
+        if (isSorted) {
+          break;
+        } else {
+          continue;
+        }
+      }
+      auto src = secondOrFirst ? index(n1, second_.srcNode(a))
+                               : index(first_.srcNode(a), n2);
+      auto weight = secondOrFirst ? second_.weight(a) : first_.weight(a);
+      auto i = secondOrFirst ? -1 : a;
+      auto j = secondOrFirst ? a : -1;
+      // From states which are not following an epsilon or already following
+      // one in the same graph
+      fn(src, weight, i, j);
+      fn(src + flag, weight, i, j);
+    }
+  }
+
+  /* Calls `fn(idx)` for every accepting state. */
+  template <typename Fn>
+  void forEachAccept(Fn&& fn) const {
+    for (auto a2 : second_.accept()) {
+      for (auto a1 : first_.accept()) {
+        for (int f = 0; f < numFlags_; ++f) {
+          fn(index(a1, a2, f));
+        }
+      }
+    }
+  }
+
+ private:
+  const Graph& first_;
+  const Graph& second_;
+  std::shared_ptr<ArcMatcher> matcher_;
+  int numFlags_;
+  bool ordered_{true};
+  bool firstOuter_;
+  std::vector<int> outer_;
+  std::vector<int> inner_;
+};
+
+// The log-sum-exp (or max) of some scores
+float reduce(const std::vector<float>& scores, bool tropical) {
+  float maxScore = kNegInf;
+  for (auto s : scores) {
+    maxScore = std::max(maxScore, s);
+  }
+  if (tropical || maxScore == kInf || maxScore == kNegInf) {
+    return maxScore;
+  }
+  float sum = 0.0;
+  for (auto s : scores) {
+    sum += std::exp(s - maxScore);
+  }
+  return maxScore + std::log(sum);
+}
+
+} // namespace
+
+Graph composeShortestDistance(
+    const Graph& first,
+    const Graph& second,
+    bool tropical /* = false */) {
+  ProductStates states(first, second);
+  if (!states.ordered()) {
+    return shortestDistance(
+        compose(first, second, makeMatcher(first, second)), tropical);
+  }
+
+  // Only the score of each state is kept for the backward pass. This is much
+  // less than the composed graph, which also needs the `reachable` and
+  // `newNodes` tables of the same size as well as all of its arcs.
+  std::vector<float> scores(states.size());
+  std::vector<float> inScores;
+  states.forEach(false, [&](int n1, int n2, int flag) {
+    inScores.clear();
+    if (flag == 0 && first.isStart(n1) && second.isStart(n2)) {
+      inScores.push_back(0.0);
+    }
+    states.forEachIn(n1, n2, flag, [&](size_t src, float w, int, int) {
+      inScores.push_back(scores[src] + w);
+    });
+    scores[states.index(n1, n2, flag)] = reduce(inScores, tropical);
+  });
+
+  // In the tropical semiring, the gradient only goes to the best accepting
+  // state (the first in case of ties)
+  int bestAccept = -1;
+  inScores.clear();
+  states.forEachAccept([&](size_t idx) {
+    if (bestAccept < 0 || scores[idx] > scores[bestAccept]) {
+      bestAccept = idx;
+    }
+    inScores.push_back(scores[idx]);
+  });
+  auto score = reduce(inScores, tropical);
+
+  auto gradFunc = [scores = std::move(scores),
+                   output = score,
+                   bestAccept,
+                   tropical](std::vector<Graph>& inputs, Graph deltas) {
+    auto& first = inputs[0];
+    auto& second = inputs[1];
+    bool calcGrad1 = first.calcGrad();
+    bool calcGrad2 = second.calcGrad();
+    auto grad1 = calcGrad1 ? std::vector<float>(first.numArcs(), 0.0)
+                           : std::vector<float>{};
+    auto grad2 = calcGrad2 ? std::vector<float>(second.numArcs(), 0.0)
+                           : std::vector<float>{};
+    // No path has a score so nothing contributes to the output
+    if (output != kNegInf) {
+      ProductStates states(first, second);
+      // The gradient of the output with respect to the score of each state
+      std::vector<float> stateGrads(states.size(), 0.0);
+      auto delta = deltas.item();
+      if (tropical) {
+        stateGrads[bestAccept] = delta;
+      } else {
+        states.forEachAccept([&](size_t idx) {
+          stateGrads[idx] += std::exp(scores[idx] - output) * delta;
+        });
+      }
+      auto addGrad = [&](float grad, int i, int j) {
+        if (calcGrad1 && i >= 0) {
+          grad1[i] += grad;
+        }
+        if (calcGrad2 && j >= 0) {
+          grad2[j] += grad;
+        }
+      };
+      states.forEach(true, [&](int n1, int n2, int flag) {
+        auto idx = states.index(n1, n2, flag);
+        auto stateGrad = stateGrads[idx];
+        if (stateGrad == 0.0) {
+          return;
+        }
+        auto stateScore = scores[idx];
+        // In the tropical semiring follow the first arc with the best score,
+        // if any, as the start score of zero only wins if it is better.
+        bool found = false;
+        states.forEachIn(
+            n1, n2, flag, [&](size_t src, float w, int i, int j) {
+              if (tropical) {
+                if (!found && scores[src] + w == stateScore) {
+                  found = true;
+                  stateGrads[src] += stateGrad;
+                  addGrad(stateGrad, i, j);
+                }
+              } else if (scores[src] != kNegInf) {
+                auto grad =
+                    stateGrad * std::exp(scores[src] + w - stateScore);
+                stateGrads[src] += grad;
+                addGrad(grad, i, j);
+              }
+            });
+      });
+    }
+    first.addGrad(std::move(grad1));
+    second.addGrad(std::move(grad2));
+  };
+
+  Graph result(gradFunc, {first, second});
+  result.addNode(true);
+  result.addNode(false, true);
+  result.addArc(0, 1, 0, 0, score);
+  return result;
+}
+
 } // namespace cpu
 } // namespace gtn
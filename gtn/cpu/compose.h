@@ -7,6 +7,7 @@
 
 #pragma once
 
+#include <memory>
 #include <utility>
 #include <vector>
 
@@ -85,11 +86,23 @@ class DoublySortedMatcher : public ArcMatcher {
   const int* queryIt_;
 };
 
+/* Picks the matcher for composing `g1` with `g2` based on which of their
+ * arcs are sorted. */
+std::shared_ptr<ArcMatcher> makeMatcher(const Graph& g1, const Graph& g2);
+
 /* Composes two transducers. */
 Graph compose(
     const Graph& g1,
     const Graph& g2,
     std::shared_ptr<ArcMatcher> matcher);
 
+/* The shortest distance of the composition of two transducers in the log (or
+ * tropical if `tropical = true`) semiring, computed without building the
+ * composed graph where possible. */
+Graph composeShortestDistance(
+    const Graph& g1,
+    const Graph& g2,
+    bool tropical = false);
+
 } // namespace cpu
 } // namespace gtn
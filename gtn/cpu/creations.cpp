@@ -60,6 +60,7 @@ Graph linearGraph(int M, int N, bool calcGrad) {
   gData.inArcOffset.back() = numArcs;
   gData.outArcOffset.back() = numArcs;
   gData.compiled = true;
+  gData.linear = true;
   g.getWeights().resize(numArcs, 0);
 
   g.markArcSorted();
@@ -6,8 +6,16 @@
  */
 
 #include <algorithm>
+#include <cmath>
+#include <cstdint>
+#include <cstring>
+#include <limits>
+#include <memory>
 #include <queue>
-#include <set>
+#include <stdexcept>
+#include <string>
+#include <tuple>
+#include <unordered_map>
 
 #include "gtn/functions.h"
 #include "gtn/cpu/functions.h"
@@ -43,6 +51,16 @@ Graph concat(const std::vector<Graph>& graphs) {
     out.addNode(true, true);
     return out;
   }
+  size_t numNodes = 0;
+  size_t numArcs = 0;
+  for (size_t i = 0; i < graphs.size(); ++i) {
+    numNodes += graphs[i].numNodes();
+    numArcs += graphs[i].numArcs();
+    if (i > 0) {
+      numArcs += graphs[i - 1].numAccept() * graphs[i].numStart();
+    }
+  }
+  out.reserve(numNodes, numArcs);
   size_t nodeOffset = 0;
   for (size_t i = 0; i < graphs.size(); ++i) {
     auto& graph = graphs[i];
@@ -84,6 +102,8 @@ Graph closure(const Graph& g) {
   };
 
   Graph closed(gradFunc, {g.withoutWeights()});
+  closed.reserve(
+      g.numNodes() + 1, g.numArcs() + g.numStart() + g.numAccept());
   closed.addNode(true, true);
   for (auto n = 0; n < g.numNodes(); ++n) {
     closed.addNode();
@@ -124,6 +144,13 @@ Graph union_(const std::vector<Graph>& graphs) {
     inputs.push_back(g.withoutWeights());
   }
   Graph out(gradFunc, std::move(inputs));
+  size_t numNodes = 0;
+  size_t numArcs = 0;
+  for (auto& graph : graphs) {
+    numNodes += graph.numNodes();
+    numArcs += graph.numArcs();
+  }
+  out.reserve(numNodes, numArcs);
 
   // Add all the nodes in a predictable order
   size_t nodeOffset = 0;
@@ -146,17 +173,7 @@ Graph union_(const std::vector<Graph>& graphs) {
 }
 
 Graph compose(const Graph& g1, const Graph& g2) {
-  std::shared_ptr<cpu::ArcMatcher> matcher;
-  bool g1Sorted = g1.olabelSorted();
-  bool g2Sorted = g2.ilabelSorted();
-  if (g1Sorted && g2Sorted) {
-    matcher = std::make_shared<cpu::DoublySortedMatcher>(g1, g2);
-  } else if (g1Sorted || g2Sorted) {
-    matcher = std::make_shared<cpu::SinglySortedMatcher>(g1, g2, g1Sorted);
-  } else {
-    matcher = std::make_shared<cpu::UnsortedMatcher>(g1, g2);
-  }
-  return cpu::compose(g1, g2, matcher);
+  return cpu::compose(g1, g2, cpu::makeMatcher(g1, g2));
 }
 
 Graph intersect(const Graph& g1, const Graph& g2) {
@@ -173,70 +190,1321 @@ Graph intersect(const Graph& g1, const Graph& g2) {
   return cpu::compose(g1, g2, matcher);
 }
 
-Graph remove(const Graph& g, int ilabel, int olabel) {
-  /* TODO we may want to make this function work appropriately with weights.
-   * In order to do so for DAGs, we can modify the routine to accumulate scores
-   * of epsilon transitions appropriately. Every time we add a node to the
-   * reachable, we logadd the score of the arc + the up node's score into that
-   * reachable nodes current score. Then when we explore a node we extract its
-   * current score. The current score should be added to all outgoing arc
-   * weights.
-   * Some complexities arise from:
-   * a) do we handle cycles here?
-   * b) is there a faster algorithm (all-pairs shortest path) for computing the
-   * scores?
-   * c) gradient computation may be more complex
-   */
-  auto gradFunc = [](std::vector<Graph>& inputs, Graph& deltas) {
-    throw std::logic_error("[gtn::remove] gradient compuation not implemented");
+namespace {
+
+// Keep the nodes and arcs of the graph on a path from a start node to an
+// accept node which only uses the arcs in `kept`
+Graph connectArcs(const Graph& g, const std::vector<bool>& kept) {
+  // Find the accessible nodes
+  std::vector<bool> accessible(g.numNodes(), false);
+  std::queue<int> toExplore;
+  for (auto n : g.start()) {
+    accessible[n] = true;
+    toExplore.push(n);
+  }
+  while (!toExplore.empty()) {
+    auto curr = toExplore.front();
+    toExplore.pop();
+    for (auto a : g.out(curr)) {
+      auto dn = g.dstNode(a);
+      if (kept[a] && !accessible[dn]) {
+        accessible[dn] = true;
+        toExplore.push(dn);
+      }
+    }
+  }
+
+  // Find the coaccessible nodes
+  std::vector<bool> coaccessible(g.numNodes(), false);
+  for (auto n : g.accept()) {
+    coaccessible[n] = true;
+    toExplore.push(n);
+  }
+  while (!toExplore.empty()) {
+    auto curr = toExplore.front();
+    toExplore.pop();
+    for (auto a : g.in(curr)) {
+      auto sn = g.srcNode(a);
+      if (kept[a] && !coaccessible[sn]) {
+        coaccessible[sn] = true;
+        toExplore.push(sn);
+      }
+    }
+  }
+
+  // Keep the nodes and arcs in their original order
+  std::vector<int> nodes(g.numNodes(), -1);
+  size_t numNodes = 0;
+  for (auto n = 0; n < g.numNodes(); ++n) {
+    if (accessible[n] && coaccessible[n]) {
+      nodes[n] = numNodes++;
+    }
+  }
+  std::vector<int> arcs;
+  for (auto a = 0; a < g.numArcs(); ++a) {
+    if (kept[a] && nodes[g.srcNode(a)] >= 0 && nodes[g.dstNode(a)] >= 0) {
+      arcs.push_back(a);
+    }
+  }
+
+  Graph out(nullptr, {g.withoutWeights()});
+  out.reserve(numNodes, arcs.size());
+  for (auto n = 0; n < g.numNodes(); ++n) {
+    if (nodes[n] >= 0) {
+      out.addNode(g.isStart(n), g.isAccept(n));
+    }
+  }
+  for (auto a : arcs) {
+    out.addArc(
+        nodes[g.srcNode(a)],
+        nodes[g.dstNode(a)],
+        g.ilabel(a),
+        g.olabel(a),
+        g.weight(a));
+  }
+
+  // The i-th arc of the output is the `arcs[i]`-th arc of the input
+  auto gradFunc = [arcs = std::move(arcs)](
+                      std::vector<Graph>& inputs, Graph& deltas) {
+    std::vector<float> grad(inputs[0].numArcs(), 0.0);
+    for (auto i = 0; i < arcs.size(); ++i) {
+      grad[arcs[i]] = deltas.weight(i);
+    }
+    inputs[0].addGrad(std::move(grad));
   };
+  out.setGradFunc(std::move(gradFunc));
+  return out;
+}
+
+} // namespace
+
+Graph connect(const Graph& g) {
+  return connectArcs(g, std::vector<bool>(g.numArcs(), true));
+}
+
+namespace {
+
+constexpr float kNegInf = -std::numeric_limits<float>::infinity();
+
+inline float semiringPlus(float a, float b, bool tropical) {
+  if (tropical || a == kNegInf || b == kNegInf) {
+    return std::max(a, b);
+  }
+  return std::max(a, b) + std::log1p(std::exp(-std::abs(a - b)));
+}
+
+/*
+ * The weighted closure of each node over the removed arcs of a graph: every
+ * node reachable from it by a path of removed arcs, with the (semiring) sum
+ * of the scores of those paths. The closure of a node is computed once from
+ * the closures of the destinations of its removed arcs, visiting the nodes in
+ * reverse topological order. If the removed arcs form a cycle the closure of
+ * each node is found by a search instead, and each reachable node has a score
+ * of 0 without a gradient for the removed arcs.
+ */
+class EpsilonClosure {
+ public:
+  EpsilonClosure(
+      const Graph& g,
+      const std::vector<bool>& removed,
+      bool tropical)
+      : tropical_(tropical), begin_(g.numNodes()), end_(g.numNodes()) {
+    order_ = removedOrder(g, removed);
+    if (order_.size() != g.numNodes()) {
+      reachable(g, removed);
+      return;
+    }
+    std::vector<int> pos(g.numNodes(), -1);
+    auto weights = g.weights();
+    auto add = [&](int node, float score, int arc, int source) {
+      auto& p = pos[node];
+      if (p < 0) {
+        p = nodes_.size();
+        nodes_.push_back(node);
+        scores_.push_back(score);
+      } else {
+        scores_[p] = semiringPlus(scores_[p], score, tropical_);
+      }
+      contribs_.push_back({p, arc, source, score});
+    };
+    for (auto it = order_.rbegin(); it != order_.rend(); ++it) {
+      auto n = *it;
+      begin_[n] = nodes_.size();
+      for (auto a : g.out(n)) {
+        if (!removed[a]) {
+          continue;
+        }
+        auto dn = g.dstNode(a);
+        add(dn, weights[a], a, -1);
+        for (auto k = begin_[dn]; k < end_[dn]; ++k) {
+          add(nodes_[k], weights[a] + scores_[k], a, k);
+        }
+      }
+      end_[n] = nodes_.size();
+      for (auto k = begin_[n]; k < end_[n]; ++k) {
+        pos[nodes_[k]] = -1;
+      }
+      contribEnds_.push_back(contribs_.size());
+    }
+  }
+
+  // The closure entries of node `n` are in `[begin(n), end(n))`
+  int begin(int n) const {
+    return begin_[n];
+  }
+
+  int end(int n) const {
+    return end_[n];
+  }
+
+  // The node of a closure entry
+  int node(int k) const {
+    return nodes_[k];
+  }
+
+  // The score of the paths to the node of a closure entry
+  float score(int k) const {
+    return scores_[k];
+  }
+
+  size_t numEntries() const {
+    return nodes_.size();
+  }
+
+  /*
+   * Backpropagate the gradients of the closure entries in `entryGrad` to the
+   * removed arcs in `grad`. The entry gradients are also accumulated through
+   * the closures they were computed from.
+   */
+  void backward(std::vector<float>& entryGrad, std::vector<float>& grad) const {
+    // The tropical semiring only passes the gradient of an entry to the
+    // first path with the maximum score
+    std::vector<bool> claimed(tropical_ ? nodes_.size() : 0, false);
+    // A node is visited before the nodes in its closure
+    for (auto c = contribEnds_.size(); c > 0; --c) {
+      auto contribBegin = c > 1 ? contribEnds_[c - 2] : 0;
+      for (auto j = contribBegin; j < contribEnds_[c - 1]; ++j) {
+        auto& contrib = contribs_[j];
+        auto delta = entryGrad[contrib.target];
+        if (delta == 0) {
+          continue;
+        }
+        float share;
+        if (tropical_) {
+          share = !claimed[contrib.target] &&
+              contrib.score == scores_[contrib.target];
+          if (share > 0) {
+            claimed[contrib.target] = true;
+          }
+        } else {
+          share = std::exp(contrib.score - scores_[contrib.target]);
+        }
+        grad[contrib.arc] += share * delta;
+        if (contrib.source >= 0) {
+          entryGrad[contrib.source] += share * delta;
+        }
+      }
+    }
+  }
+
+ private:
+  // The nodes in a topological order of the removed arcs
+  static std::vector<int> removedOrder(
+      const Graph& g,
+      const std::vector<bool>& removed) {
+    std::vector<int> inDegree(g.numNodes(), 0);
+    for (auto a = 0; a < g.numArcs(); ++a) {
+      if (removed[a]) {
+        inDegree[g.dstNode(a)]++;
+      }
+    }
+    std::vector<int> order;
+    order.reserve(g.numNodes());
+    for (auto n = 0; n < g.numNodes(); ++n) {
+      if (inDegree[n] == 0) {
+        order.push_back(n);
+      }
+    }
+    for (size_t i = 0; i < order.size(); ++i) {
+      for (auto a : g.out(order[i])) {
+        if (removed[a] && --inDegree[g.dstNode(a)] == 0) {
+          order.push_back(g.dstNode(a));
+        }
+      }
+    }
+    return order;
+  }
+
+  // The nodes reachable from each node by a search over the removed arcs
+  void reachable(const Graph& g, const std::vector<bool>& removed) {
+    std::vector<bool> visited(g.numNodes(), false);
+    std::queue<int> toExplore;
+    for (auto n = 0; n < g.numNodes(); ++n) {
+      begin_[n] = nodes_.size();
+      visited[n] = true;
+      toExplore.push(n);
+      while (!toExplore.empty()) {
+        auto curr = toExplore.front();
+        toExplore.pop();
+        for (auto a : g.out(curr)) {
+          auto dn = g.dstNode(a);
+          if (removed[a] && !visited[dn]) {
+            visited[dn] = true;
+            toExplore.push(dn);
+            nodes_.push_back(dn);
+            scores_.push_back(0.0);
+          }
+        }
+      }
+      end_[n] = nodes_.size();
+      visited[n] = false;
+      for (auto k = begin_[n]; k < end_[n]; ++k) {
+        visited[nodes_[k]] = false;
+      }
+    }
+  }
 
-  auto label_match = [&g, ilabel, olabel](auto a) {
-    return g.ilabel(a) == ilabel && g.olabel(a) == olabel;
+  struct Contribution {
+    // The closure entry the score is added to
+    int target;
+    // The removed arc which starts the paths
+    int arc;
+    // The closure entry of the destination of `arc` which the paths
+    // continue with, or -1 for `arc` alone
+    int source;
+    float score;
   };
 
+  bool tropical_;
+  std::vector<int> order_;
+  std::vector<int> begin_;
+  std::vector<int> end_;
+  std::vector<int> nodes_;
+  std::vector<float> scores_;
+  std::vector<Contribution> contribs_;
+  // One past the last contribution of each node in the order they are
+  // computed
+  std::vector<size_t> contribEnds_;
+};
+
+} // namespace
+
+Graph remove(const Graph& g, int ilabel, int olabel, Semiring semiring) {
+  auto tropical = semiring == Semiring::TROPICAL;
+  std::vector<bool> removed(g.numArcs());
+  for (auto a = 0; a < g.numArcs(); ++a) {
+    removed[a] = g.ilabel(a) == ilabel && g.olabel(a) == olabel;
+  }
+  auto closure = std::make_shared<EpsilonClosure>(g, removed, tropical);
+
+  // Nodes only entered by removed arcs are not needed
   std::vector<int> nodes(g.numNodes(), -1);
-  Graph graph(gradFunc, {g});
+  int numNodes = 0;
   for (auto n = 0; n < g.numNodes(); ++n) {
     auto arcs = g.in(n);
-    if (g.isStart(n) ||
-        !std::all_of(arcs.begin(), arcs.end(), label_match)) {
-      nodes[n] = graph.addNode(g.isStart(n));
+    if (g.isStart(n) || !std::all_of(arcs.begin(), arcs.end(), [&](int a) {
+          return removed[a];
+        })) {
+      nodes[n] = numNodes++;
     }
   }
 
-  std::queue<int> toExplore; // Keep track of where we need to go
-  std::set<int> reachable; // Keep track of where we've been
+  // A node which reaches accept nodes through removed arcs ends paths with
+  // the score of those arcs. If no path continues from the node the final
+  // score is added to the arcs entering it, and a node of a graph without
+  // gradients with a final score of 0 is an accept node. Otherwise those arcs
+  // are copied to a new accept node with the final score.
+  std::vector<float> finalScores(g.numNodes(), kNegInf);
+  std::vector<bool> hasFinal(g.numNodes(), false);
+  std::vector<bool> finalInPlace(g.numNodes(), false);
   for (auto n = 0; n < g.numNodes(); ++n) {
-    auto curr = nodes[n];
-    if (curr >= 0) {
-      toExplore.push(n);
-      reachable.insert(n);
+    if (nodes[n] < 0) {
+      continue;
     }
-    while (!toExplore.empty()) {
-      auto next = toExplore.front();
-      toExplore.pop();
-      if (g.isAccept(next)) {
-        graph.makeAccept(curr);
+    auto numOut = 0;
+    auto countOut = [&](int node) {
+      for (auto a : g.out(node)) {
+        numOut += !removed[a];
       }
-      for (auto a : g.out(next)) {
-        auto dn = g.dstNode(a);
-        if (label_match(a)) {
-          if (!reachable.count(dn)) {
-            toExplore.push(dn);
-            reachable.insert(dn);
+    };
+    countOut(n);
+    float score = g.isAccept(n) ? 0.0 : kNegInf;
+    for (auto k = closure->begin(n); k < closure->end(n); ++k) {
+      countOut(closure->node(k));
+      if (g.isAccept(closure->node(k))) {
+        score = semiringPlus(score, closure->score(k), tropical);
+        hasFinal[n] = true;
+      }
+    }
+    finalScores[n] = score;
+    // A final score of 0 only needs an arc for its gradient
+    finalInPlace[n] = hasFinal[n] &&
+        ((numOut == 0 && !g.isStart(n)) || (score == 0 && !g.calcGrad()));
+  }
+
+  Graph graph(nullptr, {g.withoutWeights()});
+  for (auto n = 0; n < g.numNodes(); ++n) {
+    if (nodes[n] >= 0) {
+      graph.addNode(
+          g.isStart(n), (g.isAccept(n) && !hasFinal[n]) || finalInPlace[n]);
+    }
+  }
+
+  // The scores of each arc of the new graph are from an arc of `g`, a
+  // closure entry and the final score of a node (or -1 for none of them)
+  std::vector<int> arcs;
+  std::vector<int> entries;
+  std::vector<int> finals;
+  auto weights = g.weights();
+  auto addArcs = [&](int n, int node, int entry, float score) {
+    for (auto a : g.out(node)) {
+      if (removed[a]) {
+        continue;
+      }
+      auto dn = g.dstNode(a);
+      auto weight = score + weights[a];
+      auto finalNode = -1;
+      if (finalInPlace[dn]) {
+        weight += finalScores[dn];
+        finalNode = dn;
+      }
+      graph.addArc(nodes[n], nodes[dn], g.ilabel(a), g.olabel(a), weight);
+      arcs.push_back(a);
+      entries.push_back(entry);
+      finals.push_back(finalNode);
+    }
+  };
+  for (auto n = 0; n < g.numNodes(); ++n) {
+    if (nodes[n] < 0) {
+      continue;
+    }
+    addArcs(n, n, -1, 0.0);
+    for (auto k = closure->begin(n); k < closure->end(n); ++k) {
+      addArcs(n, closure->node(k), k, closure->score(k));
+    }
+  }
+
+  std::vector<int> finalNodes(g.numNodes(), -1);
+  for (auto n = 0; n < g.numNodes(); ++n) {
+    if (hasFinal[n] && !finalInPlace[n]) {
+      finalNodes[n] = graph.addNode(false, true);
+      if (g.isStart(n)) {
+        // The empty path keeps an arc with the removed labels. Paths which
+        // reach the start node already end on a copy of their last arc, so
+        // the arc leaves a new start node in that case.
+        auto src = nodes[n];
+        if (graph.numIn(src) > 0) {
+          src = graph.addNode(true);
+        }
+        graph.addArc(src, finalNodes[n], ilabel, olabel, finalScores[n]);
+        arcs.push_back(-1);
+        entries.push_back(-1);
+        finals.push_back(n);
+      }
+    }
+  }
+  for (size_t i = 0, numArcs = arcs.size(); i < numArcs; ++i) {
+    if (arcs[i] < 0) {
+      continue;
+    }
+    auto dn = g.dstNode(arcs[i]);
+    if (finalNodes[dn] >= 0) {
+      graph.addArc(
+          graph.srcNode(i),
+          finalNodes[dn],
+          graph.ilabel(i),
+          graph.olabel(i),
+          graph.weight(i) + finalScores[dn]);
+      arcs.push_back(arcs[i]);
+      entries.push_back(entries[i]);
+      finals.push_back(dn);
+    }
+  }
+
+  auto gradFunc = [closure = std::move(closure),
+                   arcs = std::move(arcs),
+                   entries = std::move(entries),
+                   finals = std::move(finals),
+                   finalScores = std::move(finalScores),
+                   tropical](std::vector<Graph>& inputs, Graph& deltas) {
+    auto& g = inputs[0];
+    std::vector<float> grad(g.numArcs(), 0.0);
+    std::vector<float> entryGrad(closure->numEntries(), 0.0);
+    std::vector<float> finalGrad(g.numNodes(), 0.0);
+    auto delta = deltas.weights();
+    for (size_t i = 0; i < arcs.size(); ++i) {
+      if (arcs[i] >= 0) {
+        grad[arcs[i]] += delta[i];
+      }
+      if (entries[i] >= 0) {
+        entryGrad[entries[i]] += delta[i];
+      }
+      if (finals[i] >= 0) {
+        finalGrad[finals[i]] += delta[i];
+      }
+    }
+    // Pass the gradient of the final scores to the closure entries of the
+    // accept nodes
+    for (auto n = 0; n < g.numNodes(); ++n) {
+      if (finalGrad[n] == 0) {
+        continue;
+      }
+      // With the tropical semiring an accepting node keeps the gradient
+      auto claimed = tropical && g.isAccept(n) && finalScores[n] == 0;
+      for (auto k = closure->begin(n); k < closure->end(n); ++k) {
+        if (!g.isAccept(closure->node(k))) {
+          continue;
+        }
+        if (tropical) {
+          if (!claimed && closure->score(k) == finalScores[n]) {
+            entryGrad[k] += finalGrad[n];
+            claimed = true;
           }
         } else {
-          // Add the arc
-          graph.addArc(curr, nodes[dn], g.ilabel(a), g.olabel(a));
+          entryGrad[k] +=
+              std::exp(closure->score(k) - finalScores[n]) * finalGrad[n];
+        }
+      }
+    }
+    closure->backward(entryGrad, grad);
+    g.addGrad(std::move(grad));
+  };
+  graph.setGradFunc(std::move(gradFunc));
+  return graph;
+}
+
+namespace {
+
+/*
+ * The subsets of the weighted subset construction of `determinize` and how
+ * the scores of the determinized graph are computed from the input graph,
+ * which is kept for the gradient. Each node of the determinized graph is a
+ * subset of the nodes of the input graph with a residual score (and the
+ * output labels not yet on an arc) for each node. The score of an arc
+ * leaving a subset with an input label is computed from the sums of the
+ * scores entering each entry of the destination subset. The sum for an entry
+ * is over the contributions of the arcs with the label from the entries of
+ * the subset, each with the residual score of its source entry.
+ */
+struct Subsets {
+  // The entries of subset `s` and their residuals are in `[begin[s],
+  // begin[s + 1])`
+  std::vector<int> begin{0};
+  std::vector<int> nodes;
+  std::vector<float> residuals;
+
+  // For each arc: its score, its destination subset, if it is the arc which
+  // added the destination subset (and so computed its residuals), the offset
+  // of the sums for the destination subset and of its contributions
+  std::vector<float> arcScores;
+  std::vector<int> arcDst;
+  std::vector<bool> arcAdds;
+  std::vector<int> arcSums;
+  std::vector<int> arcContribs{0};
+  std::vector<float> sums;
+
+  // Each contribution is an arc of the input graph and its score from an
+  // entry of the source subset to an entry of the destination subset
+  std::vector<int> contribArc;
+  std::vector<int> contribSrc;
+  std::vector<int> contribDst;
+  std::vector<float> contribScore;
+
+  // Each final arc ends the paths of the accept entries in
+  // `[finalBegin[f], finalBegin[f + 1])` of `finalEntries` which have the
+  // same output labels left, with the sum of their residuals as its score
+  std::vector<int> finalArcs;
+  std::vector<float> finalScores;
+  std::vector<int> finalBegin{0};
+  std::vector<int> finalEntries;
+
+  int size(int s) const {
+    return begin[s + 1] - begin[s];
+  }
+};
+
+struct KeyHash {
+  size_t operator()(const std::vector<int64_t>& key) const {
+    size_t hash = key.size();
+    for (auto k : key) {
+      hash ^= std::hash<int64_t>{}(k) + 0x9e3779b9 + (hash << 6) + (hash >> 2);
+    }
+    return hash;
+  }
+};
+
+// The exact value of a weight, with 0 and -0 equal
+inline int64_t weightKey(float weight) {
+  uint32_t bits;
+  weight += 0.0f;
+  std::memcpy(&bits, &weight, sizeof(bits));
+  return bits;
+}
+
+/*
+ * The weighted subset construction of `determinize`. The arcs leaving a
+ * subset are only added when it is expanded, so a search (e.g. in `nbest`)
+ * can build the subsets it needs and leave the others without arcs.
+ */
+class Determinizer {
+ public:
+  Determinizer(const Graph& g, bool tropical, int maxStates, int maxArcs)
+      : g_(g),
+        tropical_(tropical),
+        maxStates_(maxStates),
+        maxArcs_(maxArcs),
+        subsets_(std::make_shared<Subsets>()),
+        graph_(nullptr, {g.withoutWeights()}) {
+    auto starts = g.start();
+    if (starts.empty()) {
+      return;
+    }
+    std::sort(starts.begin(), starts.end());
+    auto numAccept = 0;
+    key_.clear();
+    for (auto n : starts) {
+      subsets_->nodes.push_back(n);
+      subsets_->residuals.push_back(0.0);
+      outBegin_.push_back(0);
+      numAccept += g.isAccept(n);
+      key_.push_back(n);
+      key_.push_back(weightKey(0.0));
+      key_.push_back(0);
+    }
+    if (!tropical && numAccept > 1) {
+      throw std::invalid_argument(
+          "[gtn::determinize] The empty path must not be accepted from more "
+          "than one start node with the log semiring");
+    }
+    addSubset(true, numAccept > 0);
+  }
+
+  // The subsets are the nodes of the determinized graph until `finish`
+  int numSubsets() const {
+    return expanded_.size();
+  }
+
+  const Subsets& subsets() const {
+    return *subsets_;
+  }
+
+  const Graph& graph() const {
+    return graph_;
+  }
+
+  // Add the arcs leaving subset `s` (and the subsets they go to) once
+  void expand(int s) {
+    if (expanded_[s]) {
+      return;
+    }
+    expanded_[s] = true;
+    auto weights = g_.weights();
+    arcs_.clear();
+    for (auto k = subsets_->begin[s]; k < subsets_->begin[s + 1]; ++k) {
+      for (auto a : g_.out(subsets_->nodes[k])) {
+        if (weights[a] != kNegInf) {
+          arcs_.emplace_back(g_.ilabel(a), g_.dstNode(a), k, a);
+        }
+      }
+    }
+    std::sort(arcs_.begin(), arcs_.end());
+
+    // The output labels of each path are those left in its entry followed by
+    // the output label of its arc
+    candBegin_.assign(1, 0);
+    candLabels_.clear();
+    for (auto& arc : arcs_) {
+      auto k = std::get<2>(arc);
+      auto a = std::get<3>(arc);
+      candLabels_.insert(
+          candLabels_.end(),
+          outLabels_.begin() + outBegin_[k],
+          outLabels_.begin() + outBegin_[k + 1]);
+      if (g_.olabel(a) != epsilon) {
+        candLabels_.push_back(g_.olabel(a));
+      }
+      candBegin_.push_back(candLabels_.size());
+    }
+
+    auto candLess = [this](int c1, int c2) {
+      return this->candLess(c1, c2);
+    };
+    for (size_t i = 0; i < arcs_.size();) {
+      auto ilabel = std::get<0>(arcs_[i]);
+      cands_.clear();
+      for (; i < arcs_.size() && std::get<0>(arcs_[i]) == ilabel; ++i) {
+        cands_.push_back(i);
+      }
+      std::sort(cands_.begin(), cands_.end(), candLess);
+
+      // Paths to the same node with the same output labels left go to the
+      // same entry
+      auto sumsBegin = subsets_->sums.size();
+      dsts_.clear();
+      dstCands_.clear();
+      auto accept = false;
+      for (auto c : cands_) {
+        auto dn = std::get<1>(arcs_[c]);
+        auto k = std::get<2>(arcs_[c]);
+        auto a = std::get<3>(arcs_[c]);
+        auto score = subsets_->residuals[k] + weights[a];
+        if (dsts_.empty() || candLess(dstCands_.back(), c)) {
+          dsts_.push_back(dn);
+          dstCands_.push_back(c);
+          subsets_->sums.push_back(kNegInf);
+          accept |= g_.isAccept(dn);
+        }
+        auto& sum = subsets_->sums.back();
+        sum = semiringPlus(sum, score, tropical_);
+        subsets_->contribArc.push_back(a);
+        subsets_->contribSrc.push_back(k);
+        subsets_->contribDst.push_back(dsts_.size() - 1);
+        subsets_->contribScore.push_back(score);
+      }
+
+      // The arc has the first output label of all the entries, if any
+      auto first = dstCands_[0];
+      auto common = candBegin_[first + 1] > candBegin_[first];
+      for (auto c : dstCands_) {
+        common &= candBegin_[c + 1] > candBegin_[c] &&
+            candLabels_[candBegin_[c]] == candLabels_[candBegin_[first]];
+      }
+      auto olabel = common ? candLabels_[candBegin_[first]] : epsilon;
+      auto skip = common ? 1 : 0;
+
+      // The arc score normalizes the sums of the accept nodes (or all of
+      // them) so that paths end in the subset with a score of zero
+      auto arcScore = kNegInf;
+      for (size_t j = 0; j < dsts_.size(); ++j) {
+        if (!accept || g_.isAccept(dsts_[j])) {
+          arcScore =
+              semiringPlus(arcScore, subsets_->sums[sumsBegin + j], tropical_);
+        }
+      }
+      // Paths end in the subset itself if they have no output labels left
+      auto acceptInPlace = accept;
+      key_.clear();
+      for (size_t j = 0; j < dsts_.size(); ++j) {
+        auto c = dstCands_[j];
+        auto size = candBegin_[c + 1] - candBegin_[c] - skip;
+        if (g_.isAccept(dsts_[j]) && size > 0) {
+          acceptInPlace = false;
+        }
+        key_.push_back(dsts_[j]);
+        key_.push_back(weightKey(subsets_->sums[sumsBegin + j] - arcScore));
+        key_.push_back(size);
+        key_.insert(
+            key_.end(),
+            candLabels_.begin() + candBegin_[c] + skip,
+            candLabels_.begin() + candBegin_[c + 1]);
+      }
+      auto it = subsetIds_.find(key_);
+      auto adds = it == subsetIds_.end();
+      int dst;
+      if (adds) {
+        for (size_t j = 0; j < dsts_.size(); ++j) {
+          auto c = dstCands_[j];
+          subsets_->nodes.push_back(dsts_[j]);
+          subsets_->residuals.push_back(
+              subsets_->sums[sumsBegin + j] - arcScore);
+          outLabels_.insert(
+              outLabels_.end(),
+              candLabels_.begin() + candBegin_[c] + skip,
+              candLabels_.begin() + candBegin_[c + 1]);
+          outBegin_.push_back(outLabels_.size());
         }
+        dst = addSubset(false, acceptInPlace);
+      } else {
+        dst = it->second;
+      }
+
+      checkArcs();
+      graph_.addArc(s, dst, ilabel, olabel, arcScore);
+      subsets_->arcScores.push_back(arcScore);
+      subsets_->arcDst.push_back(dst);
+      subsets_->arcAdds.push_back(adds);
+      subsets_->arcSums.push_back(sumsBegin);
+      subsets_->arcContribs.push_back(subsets_->contribArc.size());
+    }
+  }
+
+  /*
+   * The scores of the paths ending in subset `s`: 0 if it is an accept node,
+   * otherwise the score of each final arc which `finish` adds to it.
+   */
+  std::vector<float> finalScores(int s) {
+    if (graph_.isAccept(s)) {
+      return {0.0};
+    }
+    std::vector<float> scores;
+    acceptEntries(s);
+    for (size_t i = 0; i < entries_.size();) {
+      auto k = entries_[i];
+      auto score = kNegInf;
+      for (; i < entries_.size() && !outLess(k, entries_[i]); ++i) {
+        score =
+            semiringPlus(score, subsets_->residuals[entries_[i]], tropical_);
+      }
+      scores.push_back(score);
+    }
+    return scores;
+  }
+
+  // Add the final arcs and the gradient function, the subsets which are not
+  // expanded are left without arcs
+  Graph finish() {
+    // The output labels left in the accept entries of a subset are on a
+    // chain of arcs with epsilon input labels to a new accept node, one chain
+    // for each different sequence of labels
+    auto finalNode = -1;
+    for (int s = 0; s < numSubsets(); ++s) {
+      if (graph_.isAccept(s)) {
+        continue;
+      }
+      acceptEntries(s);
+      for (size_t i = 0; i < entries_.size();) {
+        auto k = entries_[i];
+        auto score = kNegInf;
+        for (; i < entries_.size() && !outLess(k, entries_[i]); ++i) {
+          score =
+              semiringPlus(score, subsets_->residuals[entries_[i]], tropical_);
+          subsets_->finalEntries.push_back(entries_[i]);
+        }
+        subsets_->finalBegin.push_back(subsets_->finalEntries.size());
+        subsets_->finalArcs.push_back(graph_.numArcs());
+        subsets_->finalScores.push_back(score);
+
+        if (finalNode < 0) {
+          checkStates();
+          finalNode = graph_.addNode(false, true);
+        }
+        auto src = s;
+        auto size = outBegin_[k + 1] - outBegin_[k];
+        for (auto j = 0; j < std::max(size, 1); ++j) {
+          auto dst = finalNode;
+          if (j + 1 < size) {
+            checkStates();
+            dst = graph_.addNode();
+          }
+          checkArcs();
+          graph_.addArc(
+              src,
+              dst,
+              epsilon,
+              size > 0 ? outLabels_[outBegin_[k] + j] : epsilon,
+              j == 0 ? score : 0.0);
+          src = dst;
+        }
+      }
+    }
+    graph_.setGradFunc(gradFunc(std::move(subsets_), tropical_));
+    return graph_;
+  }
+
+ private:
+  static Graph::GradFunc gradFunc(
+      std::shared_ptr<Subsets> subsets,
+      bool tropical) {
+    return [subsets = std::move(subsets), tropical](
+               std::vector<Graph>& inputs, Graph& deltas) {
+      auto& g = inputs[0];
+      std::vector<float> grad(g.numArcs(), 0.0);
+      std::vector<float> residualGrad(subsets->residuals.size(), 0.0);
+      std::vector<float> sumGrad;
+      std::vector<bool> claimed;
+      auto delta = deltas.weights();
+      // The final arcs only use the residuals of their entries
+      for (size_t f = 0; f < subsets->finalArcs.size(); ++f) {
+        auto finalGrad = delta[subsets->finalArcs[f]];
+        auto score = subsets->finalScores[f];
+        auto finalClaimed = false;
+        for (auto i = subsets->finalBegin[f]; i < subsets->finalBegin[f + 1];
+             ++i) {
+          auto k = subsets->finalEntries[i];
+          if (tropical) {
+            if (!finalClaimed && subsets->residuals[k] == score) {
+              residualGrad[k] += finalGrad;
+              finalClaimed = true;
+            }
+          } else {
+            residualGrad[k] +=
+                std::exp(subsets->residuals[k] - score) * finalGrad;
+          }
+        }
+      }
+      // An arc only uses the residuals of subsets added before its
+      // destination, so the arcs are visited in reverse order
+      for (int e = subsets->arcDst.size() - 1; e >= 0; --e) {
+        auto t = subsets->arcDst[e];
+        auto size = subsets->size(t);
+        auto sums = subsets->sums.data() + subsets->arcSums[e];
+        sumGrad.assign(size, 0.0);
+        float scoreGrad = delta[e];
+        if (subsets->arcAdds[e]) {
+          // The residual of each node is its sum minus the arc score
+          for (auto j = 0; j < size; ++j) {
+            sumGrad[j] = residualGrad[subsets->begin[t] + j];
+            scoreGrad -= sumGrad[j];
+          }
+        }
+
+        auto accept = false;
+        for (auto j = 0; j < size; ++j) {
+          accept |= g.isAccept(subsets->nodes[subsets->begin[t] + j]);
+        }
+        auto arcScore = subsets->arcScores[e];
+        auto scoreClaimed = false;
+        for (auto j = 0; j < size; ++j) {
+          if (accept && !g.isAccept(subsets->nodes[subsets->begin[t] + j])) {
+            continue;
+          }
+          if (tropical) {
+            if (!scoreClaimed && sums[j] == arcScore) {
+              sumGrad[j] += scoreGrad;
+              scoreClaimed = true;
+            }
+          } else {
+            sumGrad[j] += std::exp(sums[j] - arcScore) * scoreGrad;
+          }
+        }
+
+        claimed.assign(size, false);
+        for (auto c = subsets->arcContribs[e]; c < subsets->arcContribs[e + 1];
+             ++c) {
+          auto j = subsets->contribDst[c];
+          auto score = subsets->contribScore[c];
+          float contribGrad;
+          if (tropical) {
+            if (claimed[j] || score != sums[j]) {
+              continue;
+            }
+            claimed[j] = true;
+            contribGrad = sumGrad[j];
+          } else {
+            contribGrad = std::exp(score - sums[j]) * sumGrad[j];
+          }
+          grad[subsets->contribArc[c]] += contribGrad;
+          residualGrad[subsets->contribSrc[c]] += contribGrad;
+        }
+      }
+      g.addGrad(std::move(grad));
+    };
+  }
+
+  void checkStates() const {
+    if (maxStates_ >= 0 && graph_.numNodes() >= maxStates_) {
+      throw std::invalid_argument(
+          "[gtn::determinize] Exceeded the limit of " +
+          std::to_string(maxStates_) + " nodes");
+    }
+  }
+
+  void checkArcs() const {
+    if (maxArcs_ >= 0 && graph_.numArcs() >= maxArcs_) {
+      throw std::invalid_argument(
+          "[gtn::determinize] Exceeded the limit of " +
+          std::to_string(maxArcs_) + " arcs");
+    }
+  }
+
+  // Add the subset with the entries after the last subset and the key `key_`
+  int addSubset(bool start, bool accept) {
+    checkStates();
+    subsets_->begin.push_back(subsets_->nodes.size());
+    subsetIds_.emplace(key_, graph_.numNodes());
+    expanded_.push_back(false);
+    return graph_.addNode(start, accept);
+  }
+
+  // Compare the paths of two arcs by their destination node and then their
+  // output labels
+  bool candLess(int c1, int c2) const {
+    auto dn1 = std::get<1>(arcs_[c1]);
+    auto dn2 = std::get<1>(arcs_[c2]);
+    if (dn1 != dn2) {
+      return dn1 < dn2;
+    }
+    return std::lexicographical_compare(
+        candLabels_.begin() + candBegin_[c1],
+        candLabels_.begin() + candBegin_[c1 + 1],
+        candLabels_.begin() + candBegin_[c2],
+        candLabels_.begin() + candBegin_[c2 + 1]);
+  }
+
+  bool outLess(int k1, int k2) const {
+    return std::lexicographical_compare(
+        outLabels_.begin() + outBegin_[k1],
+        outLabels_.begin() + outBegin_[k1 + 1],
+        outLabels_.begin() + outBegin_[k2],
+        outLabels_.begin() + outBegin_[k2 + 1]);
+  }
+
+  // Set `entries_` to the accept entries of subset `s` sorted by their
+  // output labels left
+  void acceptEntries(int s) {
+    entries_.clear();
+    for (auto k = subsets_->begin[s]; k < subsets_->begin[s + 1]; ++k) {
+      if (g_.isAccept(subsets_->nodes[k])) {
+        entries_.push_back(k);
+      }
+    }
+    auto outLess = [this](int k1, int k2) {
+      return this->outLess(k1, k2);
+    };
+    std::sort(entries_.begin(), entries_.end(), outLess);
+  }
+
+  const Graph& g_;
+  bool tropical_;
+  int maxStates_;
+  int maxArcs_;
+  std::shared_ptr<Subsets> subsets_;
+  Graph graph_;
+  std::vector<bool> expanded_;
+
+  // The output labels of entry `k` which are not yet on an arc are in
+  // `[outBegin_[k], outBegin_[k + 1])` of `outLabels_`
+  std::vector<int> outBegin_{0};
+  std::vector<int> outLabels_;
+  std::unordered_map<std::vector<int64_t>, int, KeyHash> subsetIds_;
+  std::vector<int64_t> key_;
+
+  // The arcs leaving the subset as (ilabel, dst node, entry, arc)
+  std::vector<std::tuple<int, int, int, int>> arcs_;
+  // The paths of the arcs with an input label as indices into `arcs_`, with
+  // their output labels in `[candBegin_[c], candBegin_[c + 1])` of
+  // `candLabels_`
+  std::vector<int> cands_;
+  std::vector<int> candBegin_;
+  std::vector<int> candLabels_;
+  // The node and first path of each entry of the destination subset
+  std::vector<int> dsts_;
+  std::vector<int> dstCands_;
+  std::vector<int> entries_;
+};
+
+} // namespace
+
+Graph determinize(
+    const Graph& g,
+    Semiring semiring,
+    int maxStates,
+    int maxArcs) {
+  Determinizer determinizer(
+      g, semiring == Semiring::TROPICAL, maxStates, maxArcs);
+  for (int s = 0; s < determinizer.numSubsets(); ++s) {
+    determinizer.expand(s);
+  }
+  return determinizer.finish();
+}
+
+Graph minimize(const Graph& g, Semiring semiring) {
+  auto tropical = semiring == Semiring::TROPICAL;
+  auto weights = g.weights();
+
+  // Push the weights of acyclic graphs towards the start nodes with the
+  // backward score of each node, except for the start and accept nodes which
+  // have no initial or final weights to keep the score of the paths
+  std::vector<float> scores(g.numNodes(), kNegInf);
+  std::vector<bool> pushed(g.numNodes(), false);
+  auto acyclic = g.isAcyclic();
+  if (acyclic) {
+    auto& order = g.topologicalOrder();
+    for (auto it = order.rbegin(); it != order.rend(); ++it) {
+      auto n = *it;
+      float score = g.isAccept(n) ? 0.0 : kNegInf;
+      for (auto a : g.out(n)) {
+        score =
+            semiringPlus(score, weights[a] + scores[g.dstNode(a)], tropical);
+      }
+      scores[n] = score;
+      pushed[n] = !g.isStart(n) && !g.isAccept(n) && !std::isinf(score);
+    }
+  }
+  std::vector<float> arcWeights(g.numArcs());
+  for (auto a = 0; a < g.numArcs(); ++a) {
+    auto sn = g.srcNode(a);
+    auto dn = g.dstNode(a);
+    arcWeights[a] = weights[a] + (pushed[dn] ? scores[dn] : 0.0f) -
+        (pushed[sn] ? scores[sn] : 0.0f);
+  }
+
+  // Nodes are equivalent if they are both accept or not and have the same
+  // arcs to equivalent nodes. Start nodes are not merged since each one
+  // starts its own paths.
+  std::vector<int> blocks(g.numNodes());
+  std::unordered_map<std::vector<int64_t>, int, KeyHash> blockIds;
+  std::vector<int64_t> key;
+  std::vector<std::tuple<int, int, int64_t, int>> arcKeys;
+  auto addBlock = [&](int n, int block, bool withArcs) {
+    key.assign({g.isAccept(n), g.isStart(n) ? n : -1, block});
+    if (withArcs) {
+      arcKeys.clear();
+      for (auto a : g.out(n)) {
+        arcKeys.emplace_back(
+            g.ilabel(a),
+            g.olabel(a),
+            weightKey(arcWeights[a]),
+            blocks[g.dstNode(a)]);
+      }
+      std::sort(arcKeys.begin(), arcKeys.end());
+      for (auto& k : arcKeys) {
+        key.push_back(std::get<0>(k));
+        key.push_back(std::get<1>(k));
+        key.push_back(std::get<2>(k));
+        key.push_back(std::get<3>(k));
+      }
+    }
+    return blockIds.emplace(key, blockIds.size()).first->second;
+  };
+  if (acyclic) {
+    // The nodes an arc goes to are final before the nodes it leaves from
+    auto& order = g.topologicalOrder();
+    for (auto it = order.rbegin(); it != order.rend(); ++it) {
+      blocks[*it] = addBlock(*it, 0, true);
+    }
+  } else {
+    for (auto n = 0; n < g.numNodes(); ++n) {
+      blocks[n] = addBlock(n, 0, false);
+    }
+    // Split the blocks until no block is split
+    std::vector<int> newBlocks(g.numNodes());
+    for (size_t numBlocks = 0; numBlocks != blockIds.size();) {
+      numBlocks = blockIds.size();
+      blockIds.clear();
+      for (auto n = 0; n < g.numNodes(); ++n) {
+        newBlocks[n] = addBlock(n, blocks[n], true);
       }
+      std::swap(blocks, newBlocks);
+    }
+  }
+
+  // Each block keeps the first of its nodes and the arcs leaving it
+  std::vector<int> nodes(blockIds.size(), -1);
+  Graph graph(nullptr, {g.withoutWeights()});
+  for (auto n = 0; n < g.numNodes(); ++n) {
+    if (nodes[blocks[n]] < 0) {
+      nodes[blocks[n]] = graph.addNode(g.isStart(n), g.isAccept(n));
+    }
+  }
+  std::vector<int> arcs;
+  std::vector<bool> kept(blockIds.size(), false);
+  for (auto n = 0; n < g.numNodes(); ++n) {
+    if (kept[blocks[n]]) {
+      continue;
+    }
+    kept[blocks[n]] = true;
+    for (auto a : g.out(n)) {
+      graph.addArc(
+          nodes[blocks[n]],
+          nodes[blocks[g.dstNode(a)]],
+          g.ilabel(a),
+          g.olabel(a),
+          arcWeights[a]);
+      arcs.push_back(a);
     }
-    reachable.clear();
   }
+
+  // The weights are only needed for the gradient of the pushed scores
+  std::vector<float> pushedWeights;
+  if (std::any_of(pushed.begin(), pushed.end(), [](bool p) { return p; })) {
+    pushedWeights.assign(weights, weights + g.numArcs());
+  }
+  auto gradFunc = [arcs = std::move(arcs),
+                   pushed = std::move(pushed),
+                   scores = std::move(scores),
+                   weights = std::move(pushedWeights),
+                   tropical](std::vector<Graph>& inputs, Graph& deltas) {
+    auto& g = inputs[0];
+    std::vector<float> grad(g.numArcs(), 0.0);
+    auto delta = deltas.weights();
+    std::vector<float> scoreGrad(weights.empty() ? 0 : g.numNodes(), 0.0);
+    for (size_t i = 0; i < arcs.size(); ++i) {
+      auto a = arcs[i];
+      grad[a] += delta[i];
+      if (pushed[g.dstNode(a)]) {
+        scoreGrad[g.dstNode(a)] += delta[i];
+      }
+      if (pushed[g.srcNode(a)]) {
+        scoreGrad[g.srcNode(a)] -= delta[i];
+      }
+    }
+    if (!weights.empty()) {
+      // The backward score of a node is from the scores of the nodes after it
+      for (auto n : g.topologicalOrder()) {
+        if (scoreGrad[n] == 0) {
+          continue;
+        }
+        // With the tropical semiring an accepting node keeps the gradient
+        auto claimed = tropical && g.isAccept(n) && scores[n] == 0;
+        for (auto a : g.out(n)) {
+          auto dn = g.dstNode(a);
+          auto score = weights[a] + scores[dn];
+          float arcGrad;
+          if (tropical) {
+            if (claimed || score != scores[n]) {
+              continue;
+            }
+            claimed = true;
+            arcGrad = scoreGrad[n];
+          } else {
+            arcGrad = std::exp(score - scores[n]) * scoreGrad[n];
+          }
+          grad[a] += arcGrad;
+          scoreGrad[dn] += arcGrad;
+        }
+      }
+    }
+    g.addGrad(std::move(grad));
+  };
+  graph.setGradFunc(std::move(gradFunc));
   return graph;
 }
 
+Graph prune(const Graph& g, float beam, int maxArcs, Semiring semiring) {
+  if (beam < 0) {
+    throw std::invalid_argument("[gtn::prune] The beam must not be negative");
+  }
+  if (!g.isAcyclic()) {
+    throw std::invalid_argument("[gtn::prune] Graph must be acyclic");
+  }
+  auto tropical = semiring == Semiring::TROPICAL;
+  auto weights = g.weights();
+  auto& order = g.topologicalOrder();
+
+  // Sum the scores of arcs with the semiring, using one exponential per arc
+  auto accumulate = [tropical](const auto& arcs, float init, auto score) {
+    auto maxScore = init;
+    for (auto a : arcs) {
+      maxScore = std::max(maxScore, score(a));
+    }
+    if (tropical || maxScore == kNegInf) {
+      return maxScore;
+    }
+    float sum = init == kNegInf ? 0.0 : std::exp(init - maxScore);
+    for (auto a : arcs) {
+      sum += std::exp(score(a) - maxScore);
+    }
+    return maxScore + std::log(sum);
+  };
+
+  // The scores of the paths from the start nodes to each node and from each
+  // node to the accept nodes
+  std::vector<float> forward(g.numNodes());
+  for (auto n : order) {
+    forward[n] = accumulate(
+        g.in(n), g.isStart(n) ? 0.0 : kNegInf, [&](int a) {
+          return forward[g.srcNode(a)] + weights[a];
+        });
+  }
+  std::vector<float> backward(g.numNodes());
+  for (auto it = order.rbegin(); it != order.rend(); ++it) {
+    backward[*it] = accumulate(
+        g.out(*it), g.isAccept(*it) ? 0.0 : kNegInf, [&](int a) {
+          return weights[a] + backward[g.dstNode(a)];
+        });
+  }
+
+  // The score of an arc is the best path (or all the paths) through it
+  std::vector<float> scores(g.numArcs());
+  auto best = kNegInf;
+  for (auto a = 0; a < g.numArcs(); ++a) {
+    scores[a] = forward[g.srcNode(a)] + weights[a] + backward[g.dstNode(a)];
+    best = std::max(best, scores[a]);
+  }
+  std::vector<int> candidates;
+  for (auto a = 0; a < g.numArcs(); ++a) {
+    if (scores[a] != kNegInf && scores[a] >= best - beam) {
+      candidates.push_back(a);
+    }
+  }
+  if (maxArcs >= 0 && candidates.size() > static_cast<size_t>(maxArcs)) {
+    std::stable_sort(
+        candidates.begin(), candidates.end(), [&scores](int a, int b) {
+          return scores[a] > scores[b];
+        });
+    candidates.resize(maxArcs);
+  }
+  std::vector<bool> kept(g.numArcs(), false);
+  for (auto a : candidates) {
+    kept[a] = true;
+  }
+  return connectArcs(g, kept);
+}
+
+std::vector<Graph> nbest(const Graph& g, int k, bool unique) {
+  if (k < 0) {
+    throw std::invalid_argument(
+        "[gtn::nbest] The number of paths must not be negative");
+  }
+  if (!g.isAcyclic()) {
+    throw std::invalid_argument("[gtn::nbest] Graph must be acyclic");
+  }
+  if (!unique) {
+    return cpu::shortestPaths(g, k);
+  }
+
+  // Each path of a deterministic graph has a different label sequence, so
+  // the paths are those of the tropical determinization of `g`. Its subsets
+  // are only expanded when they are reached by an A* search for the `k` best
+  // paths, using the best score from each subset to the accept nodes. Each
+  // subset is visited at most `k` times.
+  auto weights = g.weights();
+  auto& order = g.topologicalOrder();
+  std::vector<float> backward(g.numNodes());
+  for (auto it = order.rbegin(); it != order.rend(); ++it) {
+    auto score = g.isAccept(*it) ? 0.0f : kNegInf;
+    for (auto a : g.out(*it)) {
+      score = std::max(score, weights[a] + backward[g.dstNode(a)]);
+    }
+    backward[*it] = score;
+  }
+  Determinizer determinizer(g, true, -1, -1);
+  auto& subsets = determinizer.subsets();
+  auto heuristic = [&](int s) {
+    auto score = kNegInf;
+    for (auto k = subsets.begin[s]; k < subsets.begin[s + 1]; ++k) {
+      score =
+          std::max(score, subsets.residuals[k] + backward[subsets.nodes[k]]);
+    }
+    return score;
+  };
+
+  // The queue has the estimated score of the best path, the score so far and
+  // the subset (or -1 at the end of a path)
+  std::priority_queue<std::tuple<float, float, int>> queue;
+  if (determinizer.numSubsets() > 0 && heuristic(0) != kNegInf) {
+    queue.emplace(heuristic(0), 0.0, 0);
+  }
+  std::vector<int> visits;
+  for (auto found = 0; found < k && !queue.empty();) {
+    auto score = std::get<1>(queue.top());
+    auto s = std::get<2>(queue.top());
+    queue.pop();
+    if (s < 0) {
+      ++found;
+      continue;
+    }
+    visits.resize(determinizer.numSubsets(), 0);
+    if (visits[s]++ >= k) {
+      continue;
+    }
+    determinizer.expand(s);
+    for (auto finalScore : determinizer.finalScores(s)) {
+      queue.emplace(score + finalScore, score + finalScore, -1);
+    }
+    auto& graph = determinizer.graph();
+    for (auto a : graph.out(s)) {
+      auto dst = graph.dstNode(a);
+      auto estimate = score + graph.weight(a) + heuristic(dst);
+      if (estimate != kNegInf) {
+        queue.emplace(estimate, score + graph.weight(a), dst);
+      }
+    }
+  }
+  return cpu::shortestPaths(determinizer.finish(), k);
+}
+
 Graph forwardScore(const Graph& g) {
   return cpu::shortestDistance(g);
 }
@@ -249,5 +1517,10 @@ Graph viterbiPath(const Graph& g) {
   return cpu::shortestPath(g);
 }
 
+Graph composeScore(const Graph& g1, const Graph& g2, Semiring semiring) {
+  return cpu::composeShortestDistance(
+      g1, g2, semiring == Semiring::TROPICAL);
+}
+
 } // namespace cpu
 } // namespace gtn
@@ -14,9 +14,19 @@ Graph closure(const Graph& g);
 
 Graph union_(const std::vector<Graph>& graphs);
 
-Graph remove(const Graph& g, int label = epsilon);
+Graph connect(const Graph& g);
 
-Graph remove(const Graph& g, int ilabel, int olabel);
+Graph remove(const Graph& g, int ilabel, int olabel, Semiring semiring);
+
+Graph determinize(
+    const Graph& g,
+    Semiring semiring,
+    int maxStates,
+    int maxArcs);
+
+Graph minimize(const Graph& g, Semiring semiring);
+
+Graph prune(const Graph& g, float beam, int maxArcs, Semiring semiring);
 
 Graph compose(const Graph& g1, const Graph& g2);
 
@@ -28,5 +38,9 @@ Graph viterbiScore(const Graph& g);
 
 Graph viterbiPath(const Graph& g);
 
+std::vector<Graph> nbest(const Graph& g, int k, bool unique);
+
+Graph composeScore(const Graph& g1, const Graph& g2, Semiring semiring);
+
 } // namespace cpu
 } // namespace gtn
@@ -8,7 +8,8 @@
 #include <algorithm>
 #include <cmath>
 #include <limits>
-#include <stack>
+#include <stdexcept>
+#include <string>
 
 #include "gtn/cpu/shortest.h"
 
@@ -30,162 +31,298 @@ inline float logadd(float a, float b) {
   return std::max(a, b) + std::log1p(std::exp(-std::abs(a - b)));
 }
 
+// Scratch space for the forward and backward passes. There is one per
+// thread and its buffers only ever grow, so scoring a batch of graphs (or
+// the same graph repeatedly) allocates them once per thread rather than
+// per call or per node.
+struct Workspace {
+  // The incoming scores of a node
+  std::vector<float> inScores;
+  // The arg max of the incoming scores in the log semiring, where it is not
+  // needed
+  int argmax;
+  std::vector<float> nodeGrads;
+  std::vector<float> arcGrads;
+};
+
+Workspace& workspace() {
+  static thread_local Workspace ws;
+  return ws;
+}
+
+// The log-sum-exp (or max) of `count` incoming scores plus a score of zero
+// for a start node. Sets `argmax` to `ids[i]` for the largest score `i` (or
+// -1 for the start score). It is written to memory, so a new maximum is a
+// predictable branch rather than a chain of conditional moves through every
+// score.
+template <bool Tropical, typename ScoreFn>
+float accumulate(
+    Workspace& ws,
+    size_t count,
+    bool start,
+    ScoreFn score,
+    const int* ids,
+    int* argmax) {
+  // In the log semiring the scores are gathered into a buffer, reused across
+  // nodes and calls, so they are only read from the graph once.
+  if (!Tropical && ws.inScores.size() < count) {
+    ws.inScores.resize(count);
+  }
+  auto inScores = ws.inScores.data();
+  float maxScore = kNegInf;
+  for (size_t i = 0; i < count; ++i) {
+    auto s = score(i);
+    if (!Tropical) {
+      inScores[i] = s;
+    }
+    if (s > maxScore) {
+      maxScore = s;
+      *argmax = ids[i];
+    }
+  }
+  if (start && 0.0f > maxScore) {
+    maxScore = 0.0;
+    *argmax = -1; // an invalid value
+  }
+  if (Tropical || maxScore == kInf || maxScore == kNegInf) {
+    return maxScore;
+  }
+  float sum = start ? std::exp(-maxScore) - 1.0f : -1.0f;
+  for (size_t i = 0; i < count; ++i) {
+    sum += std::exp(inScores[i] - maxScore);
+  }
+  return maxScore + std::log1p(sum);
+}
+
+// Computes the score of every node and returns the total score. In the
+// tropical semiring the best incoming arc of each node (or -1) and the best
+// accept node are stored in `maxArcIdx`.
+template <bool Tropical>
+float forwardScores(
+    const Graph& g,
+    const std::vector<int>& sortedNodes,
+    std::vector<float>& scores,
+    std::vector<int>& maxArcIdx) {
+  auto& ws = workspace();
+  for (auto n : sortedNodes) {
+    auto arcs = g.in(n);
+    scores[n] = accumulate<Tropical>(
+        ws,
+        arcs.size(),
+        g.isStart(n),
+        [&](size_t i) {
+          return scores[g.srcNode(arcs[i])] + g.weight(arcs[i]);
+        },
+        arcs.begin(),
+        Tropical ? maxArcIdx.data() + n : &ws.argmax);
+  }
+
+  // Accumulate scores at all the accept nodes.
+  // NOTE: Using node idx (instead of arc idx)
+  auto accept = g.accept();
+  return accumulate<Tropical>(
+      ws,
+      accept.size(),
+      false,
+      [&](size_t i) { return scores[accept[i]]; },
+      accept.data(),
+      Tropical ? maxArcIdx.data() + g.numNodes() : &ws.argmax);
+}
+
 void shortestDistanceGrad(
     Graph& g,
     float output,
     const Graph& deltas,
-    const std::vector<int>& sortedNodes,
     const std::vector<float>& nodeScores,
-    const std::vector<size_t>& maxArcIdxCache,
+    const std::vector<int>& maxArcIdx,
     bool tropical) {
+  auto& ws = workspace();
+  auto& nodeGrads = ws.nodeGrads;
+  auto& arcGrads = ws.arcGrads;
+  nodeGrads.assign(g.numNodes(), 0.0);
+  arcGrads.assign(g.numArcs(), 0.0);
 
-  std::vector<float> nodeGrads(g.numNodes(), 0.0);
-  std::vector<float> arcGrads(g.numArcs(), 0.0);
-
+  auto delta = deltas.item();
+  // The order is cached by the graph so it is not kept by the tape
+  auto& sortedNodes = g.topologicalOrder();
   for (int i = sortedNodes.size() - 1; i >= 0; --i) {
     auto n = sortedNodes[i];
+    float nodeGrad = 0.0;
     for (const auto a : g.out(n)) {
       auto dn = g.dstNode(a);
       float curScore;
       if (tropical) {
-        curScore = (a == maxArcIdxCache[dn]) ? nodeGrads[dn] : 0.0f;
+        curScore = (a == maxArcIdx[dn]) ? nodeGrads[dn] : 0.0f;
       } else if (nodeScores[dn] == kNegInf) {
         curScore = 0.0f;
       } else {
         curScore = nodeGrads[dn] *
             std::exp(nodeScores[n] + g.weight(a) - nodeScores[dn]);
       }
-      nodeGrads[n] += curScore;
+      nodeGrad += curScore;
       arcGrads[a] = curScore;
     }
     if (g.isAccept(n)) {
       if (tropical) {
-        nodeGrads[n] += (n == maxArcIdxCache.back()) ? deltas.item() : 0.0f;
-      } else if (nodeScores.back() != kNegInf) {
-        nodeGrads[n] += std::exp(nodeScores[n] - output) * deltas.item();
+        nodeGrad += (n == maxArcIdx.back()) ? delta : 0.0f;
+      } else if (output != kNegInf) {
+        nodeGrad += std::exp(nodeScores[n] - output) * delta;
       }
     }
+    nodeGrads[n] = nodeGrad;
   }
-  g.addGrad(std::move(arcGrads));
+  g.addGrad(arcGrads);
 }
 
-std::vector<int> topSort(const Graph& g) {
-  std::stack<std::pair<int, int>> nodeStack;
-  std::vector<bool> visited(g.numNodes(), false);
-  std::vector<int> sortedNodes(g.numNodes());
-
-  int numVisited = 0;
-  for (int n = 0; n < g.numNodes(); ++n) {
-    if (g.numIn(n) == 0) {
-      nodeStack.emplace(n, 0);
-      visited[n] = true;
-      numVisited++;
+// The max of `n` contiguous scores, taken in independent lanes so the
+// comparisons don't form one long dependency chain.
+float rowMax(const float* row, int n) {
+  float lanes[8];
+  std::fill(lanes, lanes + 8, kNegInf);
+  int i = 0;
+  for (; i + 8 <= n; i += 8) {
+    for (int j = 0; j < 8; ++j) {
+      lanes[j] = std::max(lanes[j], row[i + j]);
     }
   }
+  for (; i < n; ++i) {
+    lanes[0] = std::max(lanes[0], row[i]);
+  }
+  return *std::max_element(lanes, lanes + 8);
+}
 
-  int nodeIdx = g.numNodes() - 1;
-  while (!nodeStack.empty()) {
-    int n, a;
-    std::tie(n, a) = nodeStack.top();
-    nodeStack.pop();
-
-    // Stop early if all the nodes have been visited already
-    if (numVisited == g.numNodes()) {
-      sortedNodes[nodeIdx--] = n;
-      continue;
-    }
-
-    auto it = g.out(n).begin() + a;
-    for (; it < g.out(n).end(); it++) {
-      auto dst = g.dstNode(*it);
-      if (!visited[dst]) {
-        nodeStack.emplace(n, it - g.out(n).begin());
-        nodeStack.emplace(dst, 0);
-        visited[dst] = true;
-        numVisited++;
-        break;
+// Dense version of `shortestDistance` for graphs made by `linearGraph`. The
+// arcs from node `t` to node `t + 1` are the row of arcs
+// `[t * N, (t + 1) * N)`, so the score is the sum of the log-sum-exp (or max)
+// of each row and the gradient is the softmax (or one-hot arg max) of each
+// row.
+Graph linearShortestDistance(const Graph& g, bool tropical) {
+  int T = g.numNodes() - 1;
+  int N = T > 0 ? g.numArcs() / T : 0;
+  auto weights = g.weights();
+  // The log-sum-exp of each row in the log semiring, otherwise the index of
+  // the best arc of each row
+  std::vector<float> rowScores(tropical ? 0 : T);
+  std::vector<int> rowArgmax(tropical ? T : 0);
+  float score = 0.0;
+  for (int t = 0; t < T; ++t) {
+    auto row = weights + t * N;
+    auto maxScore = rowMax(row, N);
+    float rowScore;
+    if (tropical) {
+      auto best = std::find(row, row + N, maxScore);
+      rowArgmax[t] = best == row + N ? -1 : best - row;
+      rowScore = maxScore;
+    } else if (maxScore == kInf || maxScore == kNegInf) {
+      rowScore = maxScore;
+    } else {
+      float sum = -1.0;
+      for (int i = 0; i < N; ++i) {
+        sum += std::exp(row[i] - maxScore);
       }
+      rowScore = maxScore + std::log1p(sum);
     }
-    if (it == g.out(n).end()) {
-      sortedNodes[nodeIdx--] = n;
+    if (!tropical) {
+      rowScores[t] = rowScore;
     }
+    score += rowScore;
   }
-  return sortedNodes;
-}
-
-} // namespace
-
-Graph shortestDistance(const Graph& g, bool tropical /* = false */) {
-  std::vector<float> scores(g.numNodes());
-  std::vector<size_t> maxArcIdxCache(g.numNodes() + 1, -1);
-  auto sortedNodes = topSort(g);
 
-  auto getScore = [tropical](const std::vector<float>& in, float maxScore) {
-    if (in.empty()) {
-      return kNegInf;
-    }
-    if (tropical || maxScore == kInf || maxScore == kNegInf) {
-      return maxScore;
-    }
-    float score = -1.0;
-    for (auto s : in) {
-      score += std::exp(s - maxScore);
+  auto gradFunc = [rowScores = std::move(rowScores),
+                   rowArgmax = std::move(rowArgmax),
+                   output = score,
+                   tropical,
+                   T,
+                   N](std::vector<Graph>& inputs, Graph deltas) {
+    auto& g = inputs[0];
+    auto& grad = workspace().arcGrads;
+    grad.assign(g.numArcs(), 0.0);
+    // No path has a score so nothing contributes to the output
+    if (output != kNegInf) {
+      auto delta = deltas.item();
+      auto weights = g.weights();
+      for (int t = 0; t < T; ++t) {
+        if (tropical) {
+          if (rowArgmax[t] >= 0) {
+            grad[t * N + rowArgmax[t]] = delta;
+          }
+        } else {
+          for (int i = t * N; i < (t + 1) * N; ++i) {
+            grad[i] = std::exp(weights[i] - rowScores[t]) * delta;
+          }
+        }
+      }
     }
-    return maxScore + std::log1p(score);
+    g.addGrad(grad);
   };
 
-  for (auto n : sortedNodes) {
-    float maxScore = kNegInf;
-    std::vector<float> inScores(g.numIn(n) + g.isStart(n));
-    int i = 0;
-    for (auto a : g.in(n)) {
-      auto un = g.srcNode(a);
-      inScores[i] = scores[un] + g.weight(a);
-      if (inScores[i]  > maxScore) {
-        maxScore = inScores[i];
-        maxArcIdxCache[n] = a;
-      }
-      i++;
-    }
-    if (g.isStart(n)) {
-      inScores[i] = 0.0;
-      if (inScores[i] > maxScore) {
-        maxScore = inScores[i];
-        maxArcIdxCache[n] = -1; // an invalid value
-      }
-    }
-    scores[n] = getScore(inScores, maxScore);
+  Graph result(gradFunc, {g});
+  result.addNode(true);
+  result.addNode(false, true);
+  result.addArc(0, 1, 0, 0, score);
+  return result;
+}
+
+const std::vector<int>& topSort(const Graph& g, const char* fn) {
+  if (!g.isAcyclic()) {
+    throw std::invalid_argument(
+        std::string("[gtn::") + fn + "] Graph must be acyclic");
   }
+  return g.topologicalOrder();
+}
 
-  // Accumulate scores at all the accept nodes.
-  std::vector<float> inScores;
-  float maxScore = kNegInf;
-  for (auto n : g.accept()) {
-    inScores.push_back(scores[n]);
-    if (inScores.back() > maxScore) {
-      maxScore = inScores.back();
-      maxArcIdxCache.back() = n; // NOTE: Using node idx (instead of arc idx)
-    }
+// Build a chain graph of the arcs of a path in `g`. The gradient of each arc
+// of the chain goes to its arc in `g`.
+Graph pathGraph(const Graph& g, std::vector<int> arcs, bool found) {
+  Graph out(nullptr, {g});
+  if (found) {
+    out.addNode(true, arcs.size() == 0);
+  }
+  for (size_t i = 0; i < arcs.size(); ++i) {
+    out.addNode(false, i + 1 == arcs.size());
+    out.addArc(
+        i, i + 1, g.ilabel(arcs[i]), g.olabel(arcs[i]), g.weight(arcs[i]));
   }
-  auto score = getScore(inScores, maxScore);
 
-  // clear cache not required for bwd
-  if (!tropical) {
-    maxArcIdxCache.clear();
+  auto gradFunc = [arcs = std::move(arcs)](
+                      std::vector<Graph>& inputs, Graph deltas) mutable {
+    std::vector<float> grad(inputs[0].numArcs(), 0.0);
+    for (auto a = 0; a < deltas.numArcs(); ++a) {
+      grad[arcs[a]] += deltas.weight(a);
+    }
+    inputs[0].addGrad(grad);
+  };
+  out.setGradFunc(std::move(gradFunc));
+  return out;
+}
+
+} // namespace
+
+Graph shortestDistance(const Graph& g, bool tropical /* = false */) {
+  if (g.isLinear()) {
+    return linearShortestDistance(g, tropical);
   }
+  auto& sortedNodes =
+      topSort(g, tropical ? "viterbiScore" : "forwardScore");
+  // The scores and, in the tropical semiring, the best incoming arc of each
+  // node are kept for the backward pass. The last entry of `maxArcIdx` is
+  // the best accept node.
+  std::vector<float> scores(g.numNodes());
+  std::vector<int> maxArcIdx(tropical ? g.numNodes() + 1 : 0, -1);
+  auto score = tropical
+      ? forwardScores<true>(g, sortedNodes, scores, maxArcIdx)
+      : forwardScores<false>(g, sortedNodes, scores, maxArcIdx);
 
   auto gradFunc = [scores = std::move(scores),
-                   sortedNodes = std::move(sortedNodes),
-                   maxArcIdxCache = std::move(maxArcIdxCache),
+                   maxArcIdx = std::move(maxArcIdx),
                    output = score,
                    tropical](std::vector<Graph>& inputs, Graph deltas) mutable {
     shortestDistanceGrad(
         inputs[0],
         output,
         deltas,
-        sortedNodes,
         scores,
-        maxArcIdxCache,
+        maxArcIdx,
         tropical);
   };
 
@@ -200,7 +337,7 @@ Graph shortestPath(const Graph& g) {
   // List of scores and backpointers for each node
   std::vector<int> backPointers(g.numNodes());
   std::vector<float> scores(g.numNodes(), kNegInf);
-  auto sortedNodes = topSort(g);
+  auto& sortedNodes = topSort(g, "viterbiPath");
 
   for (auto n : g.start()) {
     scores[n] = 0.0;
@@ -235,31 +372,96 @@ Graph shortestPath(const Graph& g) {
     best = g.srcNode(arc);
     arcs.push_back(arc);
   }
+  std::reverse(arcs.begin(), arcs.end());
+  return pathGraph(g, std::move(arcs), best != -1);
+}
 
-  // Build the best path
-  Graph out(nullptr, {g});
-  if (best != -1) {
-    out.addNode(true, arcs.size() == 0);
+std::vector<Graph> shortestPaths(const Graph& g, int k) {
+  auto& sortedNodes = topSort(g, "nbest");
+  auto weights = g.weights();
+  size_t numPaths = k;
+
+  // The best `k` paths to each node, from the best paths to the source nodes
+  // of its arcs. Each path is its score, its last arc (or -1 for the empty
+  // path at a start node) and the rank of the path before the arc.
+  struct Path {
+    float score;
+    int arc;
+    int rank;
+  };
+  auto worse = [](const Path& p1, const Path& p2) {
+    return p1.score < p2.score ||
+        (p1.score == p2.score &&
+         (p1.arc > p2.arc || (p1.arc == p2.arc && p1.rank > p2.rank)));
+  };
+  std::vector<std::vector<Path>> paths(g.numNodes());
+  std::vector<Path> candidates;
+  auto nextPath = [&](const Path& path) {
+    auto& prev = paths[g.srcNode(path.arc)];
+    if (path.rank + 1 < static_cast<int>(prev.size())) {
+      candidates.push_back(Path{prev[path.rank + 1].score + weights[path.arc],
+                                path.arc,
+                                path.rank + 1});
+      std::push_heap(candidates.begin(), candidates.end(), worse);
+    }
+  };
+  for (auto n : sortedNodes) {
+    candidates.clear();
+    if (g.isStart(n)) {
+      candidates.push_back(Path{0.0, -1, 0});
+    }
+    for (auto a : g.in(n)) {
+      auto& prev = paths[g.srcNode(a)];
+      if (!prev.empty()) {
+        candidates.push_back(Path{prev[0].score + weights[a], a, 0});
+      }
+    }
+    std::make_heap(candidates.begin(), candidates.end(), worse);
+    auto& best = paths[n];
+    while (best.size() < numPaths && !candidates.empty()) {
+      std::pop_heap(candidates.begin(), candidates.end(), worse);
+      auto path = candidates.back();
+      candidates.pop_back();
+      if (path.score == kNegInf) {
+        break;
+      }
+      best.push_back(path);
+      if (path.arc >= 0) {
+        nextPath(path);
+      }
+    }
   }
-  for (auto i = arcs.size(); i > 0; --i) {
-    out.addNode(false, i == 1);
-    out.addArc(
-        arcs.size() - i,
-        arcs.size() - i + 1,
-        g.ilabel(arcs[i - 1]),
-        g.olabel(arcs[i - 1]),
-        g.weight(arcs[i - 1]));
+
+  // Merge the paths of the accept nodes, where the arc of a path is its
+  // accept node instead
+  candidates.clear();
+  for (auto n : g.accept()) {
+    if (!paths[n].empty()) {
+      candidates.push_back(Path{paths[n][0].score, n, 0});
+    }
   }
+  std::make_heap(candidates.begin(), candidates.end(), worse);
+  std::vector<Graph> out;
+  while (out.size() < numPaths && !candidates.empty()) {
+    std::pop_heap(candidates.begin(), candidates.end(), worse);
+    auto path = candidates.back();
+    candidates.pop_back();
+    auto n = path.arc;
+    if (path.rank + 1 < static_cast<int>(paths[n].size())) {
+      candidates.push_back(
+          Path{paths[n][path.rank + 1].score, n, path.rank + 1});
+      std::push_heap(candidates.begin(), candidates.end(), worse);
+    }
 
-  auto gradFunc = [arcs = std::move(arcs)](
-                      std::vector<Graph>& inputs, Graph deltas) mutable {
-    std::vector<float> grad(inputs[0].numArcs(), 0.0);
-    for (auto a = 0; a < deltas.numArcs(); ++a) {
-      grad[arcs[a]] += deltas.weight(a);
+    // Follow the arcs back to the start of the path
+    std::vector<int> arcs;
+    for (auto p = paths[n][path.rank]; p.arc >= 0;) {
+      arcs.push_back(p.arc);
+      p = paths[g.srcNode(p.arc)][p.rank];
     }
-    inputs[0].addGrad(grad);
-  };
-  out.setGradFunc(std::move(gradFunc));
+    std::reverse(arcs.begin(), arcs.end());
+    out.push_back(pathGraph(g, std::move(arcs), true));
+  }
   return out;
 }
 
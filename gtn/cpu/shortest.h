@@ -7,6 +7,8 @@
 
 #pragma once
 
+#include <vector>
+
 #include "gtn/graph.h"
 
 namespace gtn {
@@ -14,6 +16,7 @@ namespace cpu {
 
 Graph shortestDistance(const Graph& g, bool tropical = false);
 Graph shortestPath(const Graph& g);
+std::vector<Graph> shortestPaths(const Graph& g, int k);
 
 } // namespace cpu
 } // namespace gtn
@@ -27,6 +27,7 @@ Graph scalarGraph(float val, Device device = Device::CPU, bool calcGrad = true);
 /**
  * Create a linear chain graph with `M + 1` nodes and `N` edges between each node.
  * The labels of the edges between each node are the integers `[0, ..., N - 1]`.
+ * The graph is marked as linear, see `Graph::isLinear`.
  * \ingroup creations
  */
 Graph linearGraph(
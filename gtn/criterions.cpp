@@ -8,18 +8,688 @@
 #include "gtn/criterions.h"
 
 #include <algorithm>
+#include <cmath>
+#include <limits>
+#include <numeric>
 #include <queue>
 #include <set>
+#include <stdexcept>
 
 #include "gtn/functions.h"
+#include "gtn/parallel.h"
 
 namespace gtn {
 namespace criterion {
 
+namespace {
+
+constexpr float kNegInf = -std::numeric_limits<float>::infinity();
+
+// The log-sum-exp of two or three scores (if `c` is used). This takes one
+// log rather than one for each pair of scores.
+inline float logSumExp(float a, float b, float c = kNegInf) {
+  auto maxScore = std::max(a, std::max(b, c));
+  if (maxScore == kNegInf) {
+    return kNegInf;
+  }
+  return maxScore +
+      std::log(std::exp(a - maxScore) + std::exp(b - maxScore) +
+               std::exp(c - maxScore));
+}
+
+// The gradient of the emissions, one per thread. It only ever grows so its
+// pages are not faulted in again for every loss of a batch.
+std::vector<float>& gradBuffer() {
+  static thread_local std::vector<float> grad;
+  return grad;
+}
+
+// The states of the CTC graph of a target, `2L + 1` states alternating
+// between blank and the labels of the target.
+struct CtcStates {
+  // The label of each state, -1 for labels out of the emissions' range which
+  // match no arc
+  std::vector<int> labels;
+  // Whether a state can be entered by skipping the blank before it, when its
+  // label differs from the previous one
+  std::vector<bool> skip;
+};
+
+CtcStates ctcStates(const int* target, int L, int blankIdx, int C) {
+  int S = 2 * L + 1;
+  CtcStates states{std::vector<int>(S), std::vector<bool>(S, false)};
+  for (int l = 0; l < S; ++l) {
+    auto label = l % 2 ? target[(l - 1) / 2] : blankIdx;
+    states.labels[l] = (label < 0 || label >= C) ? -1 : label;
+    states.skip[l] = l % 2 && l > 1 && label != target[(l - 3) / 2];
+  }
+  return states;
+}
+
+/*
+ * The forward (alpha) recursion of CTC on the emissions of `T` frames,
+ * where `weights[t * C + c]` is the score of label `c` at frame `t` as in a
+ * graph made by `linearGraph`. Sets `alphas[t * S + l]` to the score of being
+ * in state `l` after `t` frames and returns the total score.
+ */
+float ctcAlphas(
+    const float* weights,
+    int T,
+    int C,
+    const CtcStates& states,
+    std::vector<float>& alphas) {
+  auto& labels = states.labels;
+  auto& skip = states.skip;
+  int S = labels.size();
+  alphas.assign((T + 1) * S, kNegInf);
+  alphas[0] = 0.0;
+  for (int t = 0; t < T; ++t) {
+    auto prev = alphas.data() + t * S;
+    auto curr = prev + S;
+    for (int l = 0; l < S; ++l) {
+      auto score = l == 0 ? prev[0]
+          : logSumExp(prev[l], prev[l - 1], skip[l] ? prev[l - 2] : kNegInf);
+      curr[l] = labels[l] < 0 ? kNegInf : score + weights[t * C + labels[l]];
+    }
+  }
+  auto last = alphas.data() + T * S;
+  return S > 1 ? logSumExp(last[S - 1], last[S - 2]) : last[0];
+}
+
+/*
+ * The backward (beta) recursion of CTC. Adds `delta` times the gradient of
+ * the score `output` with respect to the emissions to `grad`, laid out as
+ * `weights`.
+ */
+void ctcGrad(
+    const float* weights,
+    int T,
+    int C,
+    const CtcStates& states,
+    const std::vector<float>& alphas,
+    float output,
+    float delta,
+    float* grad) {
+  // No path has a score so nothing contributes to the output
+  if (output == kNegInf) {
+    return;
+  }
+  auto& labels = states.labels;
+  auto& skip = states.skip;
+  int S = labels.size();
+  // betas[l] is the score of reaching an accept state from state `l` after
+  // `t` frames
+  std::vector<float> betas(S, kNegInf);
+  std::vector<float> prevBetas(S);
+  betas[S - 1] = 0.0;
+  if (S > 1) {
+    betas[S - 2] = 0.0;
+  }
+  for (int t = T; t > 0; --t) {
+    // The arc for state `l` at frame `t - 1` is used by every path through
+    // state `l` after `t` frames.
+    auto alpha = alphas.data() + t * S;
+    for (int l = 0; l < S; ++l) {
+      auto posterior = alpha[l] + betas[l] - output;
+      if (labels[l] >= 0 && posterior != kNegInf) {
+        grad[(t - 1) * C + labels[l]] += std::exp(posterior) * delta;
+      }
+    }
+    for (int l = 0; l < S; ++l) {
+      // Include the emission of the state so the successors of a state can
+      // share it
+      prevBetas[l] = betas[l] == kNegInf || labels[l] < 0
+          ? kNegInf
+          : betas[l] + weights[(t - 1) * C + labels[l]];
+    }
+    for (int l = 0; l < S; ++l) {
+      betas[l] = l + 1 == S ? prevBetas[l]
+          : logSumExp(
+                prevBetas[l],
+                prevBetas[l + 1],
+                l + 2 < S && skip[l + 2] ? prevBetas[l + 2] : kNegInf);
+    }
+  }
+}
+
+/*
+ * CTC on the weights of a graph made by `linearGraph`. It gives the same
+ * result as the composition of the CTC graph of the target with `logProbs`.
+ */
+Graph linearCtcLoss(
+    const Graph& logProbs,
+    const std::vector<int>& target,
+    const int blankIdx) {
+  int T = logProbs.numNodes() - 1;
+  int C = T > 0 ? logProbs.numArcs() / T : 0;
+  auto states = ctcStates(target.data(), target.size(), blankIdx, C);
+  std::vector<float> alphas;
+  auto score = ctcAlphas(logProbs.weights(), T, C, states, alphas);
+
+  auto gradFunc = [alphas = std::move(alphas),
+                   states = std::move(states),
+                   output = score,
+                   T,
+                   C](std::vector<Graph>& inputs, Graph deltas) {
+    auto& logProbs = inputs[0];
+    auto& grad = gradBuffer();
+    grad.assign(logProbs.numArcs(), 0.0);
+    // The loss is the negative score
+    ctcGrad(
+        logProbs.weights(),
+        T,
+        C,
+        states,
+        alphas,
+        output,
+        -deltas.item(),
+        grad.data());
+    logProbs.addGrad(grad);
+  };
+
+  Graph result(gradFunc, {logProbs});
+  result.addNode(true);
+  result.addNode(false, true);
+  result.addArc(0, 1, 0, 0, -score);
+  return result;
+}
+
+// The scores of a transitions graph with a single start node, an accept node
+// for each of `C` labels, an arc from the start node to each label and an arc
+// between every pair of labels. Each arc has the label of its destination.
+struct DenseTransitions {
+  int C;
+  // The arc of each score, laid out as `start` followed by `trans`
+  std::vector<int> arcs;
+  // start[i] is the score of starting with label `i`
+  std::vector<float> start;
+  // trans[j * C + i] is the score of label `i` following label `j`
+  std::vector<float> trans;
+};
+
+// Gather the scores of `transitions` into a `DenseTransitions`. Returns
+// false if the graph does not have the dense form.
+bool denseTransitions(
+    const Graph& transitions,
+    int C,
+    DenseTransitions& dense) {
+  if (transitions.numNodes() != C + 1 ||
+      transitions.numArcs() != C + C * C || transitions.numStart() != 1) {
+    return false;
+  }
+  auto startNode = transitions.start()[0];
+  for (int n = 0; n <= C; ++n) {
+    if (n != startNode && !transitions.isAccept(n)) {
+      return false;
+    }
+  }
+  // The label of each node comes from the arc entering it from the start
+  std::vector<int> nodeLabels(C + 1, -1);
+  dense.C = C;
+  dense.arcs.assign(C + C * C, -1);
+  for (int a = 0; a < transitions.numArcs(); ++a) {
+    if (transitions.srcNode(a) != startNode) {
+      continue;
+    }
+    auto dst = transitions.dstNode(a);
+    auto label = transitions.ilabel(a);
+    if (dst == startNode || label < 0 || label >= C ||
+        transitions.olabel(a) != label || nodeLabels[dst] >= 0 ||
+        dense.arcs[label] >= 0) {
+      return false;
+    }
+    nodeLabels[dst] = label;
+    dense.arcs[label] = a;
+  }
+  for (int a = 0; a < transitions.numArcs(); ++a) {
+    auto src = transitions.srcNode(a);
+    if (src == startNode) {
+      continue;
+    }
+    auto dst = transitions.dstNode(a);
+    auto label = transitions.ilabel(a);
+    if (nodeLabels[src] < 0 || nodeLabels[dst] < 0 ||
+        label != nodeLabels[dst] || transitions.olabel(a) != label) {
+      return false;
+    }
+    auto& idx = dense.arcs[C + nodeLabels[src] * C + label];
+    if (idx >= 0) {
+      return false;
+    }
+    idx = a;
+  }
+  auto weights = transitions.weights();
+  dense.start.resize(C);
+  dense.trans.resize(C * C);
+  for (int i = 0; i < C; ++i) {
+    dense.start[i] = weights[dense.arcs[i]];
+  }
+  for (int k = 0; k < C * C; ++k) {
+    dense.trans[k] = weights[dense.arcs[C + k]];
+  }
+  return true;
+}
+
+/*
+ * The forward recursion over every label sequence of the emissions of `T`
+ * frames. Sets `alphas[t * C + i]` to the score of the sequences of `t + 1`
+ * frames ending in label `i` and returns the total score.
+ */
+float denseAlphas(
+    const float* emissions,
+    int T,
+    const DenseTransitions& tr,
+    std::vector<float>& alphas) {
+  int C = tr.C;
+  alphas.resize(T * C);
+  std::vector<float> scores(C);
+  for (int i = 0; i < C; ++i) {
+    alphas[i] = tr.start[i] + emissions[i];
+  }
+  for (int t = 1; t < T; ++t) {
+    auto prev = alphas.data() + (t - 1) * C;
+    auto curr = prev + C;
+    std::fill(curr, curr + C, kNegInf);
+    // Visit the transition matrix row by row for contiguous access
+    for (int j = 0; j < C; ++j) {
+      auto row = tr.trans.data() + j * C;
+      for (int i = 0; i < C; ++i) {
+        curr[i] = std::max(curr[i], prev[j] + row[i]);
+      }
+    }
+    std::fill(scores.begin(), scores.end(), 0.0f);
+    for (int j = 0; j < C; ++j) {
+      auto row = tr.trans.data() + j * C;
+      for (int i = 0; i < C; ++i) {
+        scores[i] += std::exp(prev[j] + row[i] - curr[i]);
+      }
+    }
+    for (int i = 0; i < C; ++i) {
+      curr[i] = curr[i] == kNegInf
+          ? kNegInf
+          : curr[i] + std::log(scores[i]) + emissions[t * C + i];
+    }
+  }
+  auto last = alphas.data() + (T - 1) * C;
+  auto maxScore = *std::max_element(last, last + C);
+  if (maxScore == kNegInf) {
+    return kNegInf;
+  }
+  float total = 0.0;
+  for (int i = 0; i < C; ++i) {
+    total += std::exp(last[i] - maxScore);
+  }
+  return maxScore + std::log(total);
+}
+
+/*
+ * The backward recursion over every label sequence. Adds `delta` times the
+ * gradient of the score `output` to `emissionsGrad` (laid out as the
+ * emissions) and, if `transGrad` is not `nullptr`, to `transGrad` (laid out
+ * as `start` followed by `trans`).
+ */
+void denseGrad(
+    const float* emissions,
+    int T,
+    const DenseTransitions& tr,
+    const std::vector<float>& alphas,
+    float output,
+    float delta,
+    float* emissionsGrad,
+    float* transGrad) {
+  if (output == kNegInf) {
+    return;
+  }
+  int C = tr.C;
+  // betas[i] is the score of the rest of the sequences after label `i` at
+  // frame `t`
+  std::vector<float> betas(C, 0.0);
+  std::vector<float> next(C);
+  std::vector<float> scores(C);
+  for (int t = T - 1; t >= 0; --t) {
+    auto alpha = alphas.data() + t * C;
+    for (int i = 0; i < C; ++i) {
+      emissionsGrad[t * C + i] +=
+          std::exp(alpha[i] + betas[i] - output) * delta;
+      // Include the emission so the predecessors of a label can share it
+      next[i] = betas[i] + emissions[t * C + i];
+    }
+    if (t == 0) {
+      if (transGrad != nullptr) {
+        for (int i = 0; i < C; ++i) {
+          transGrad[i] += std::exp(tr.start[i] + next[i] - output) * delta;
+        }
+      }
+      break;
+    }
+    auto prev = alpha - C;
+    for (int j = 0; j < C; ++j) {
+      auto row = tr.trans.data() + j * C;
+      float maxScore = kNegInf;
+      for (int i = 0; i < C; ++i) {
+        maxScore = std::max(maxScore, row[i] + next[i]);
+      }
+      if (maxScore == kNegInf) {
+        betas[j] = kNegInf;
+        continue;
+      }
+      float total = 0.0;
+      for (int i = 0; i < C; ++i) {
+        scores[i] = std::exp(row[i] + next[i] - maxScore);
+        total += scores[i];
+      }
+      betas[j] = maxScore + std::log(total);
+      if (transGrad != nullptr) {
+        // The posterior of each transition is `scores[i]` times a scale
+        // shared by the row, both at most one
+        auto scale = std::exp(prev[j] + maxScore - output) * delta;
+        auto grad = transGrad + C + j * C;
+        for (int i = 0; i < C; ++i) {
+          grad[i] += scores[i] * scale;
+        }
+      }
+    }
+  }
+}
+
+/*
+ * The forward recursion over the alignments of the labels `target` of length
+ * `L`, where each label is repeated one or more times. Sets
+ * `alphas[t * L + l]` to the score of the alignments of `t + 1` frames ending
+ * in the `l`-th label and returns the total score.
+ */
+float asgAlignAlphas(
+    const float* emissions,
+    int T,
+    const DenseTransitions& tr,
+    const std::vector<int>& target,
+    std::vector<float>& alphas) {
+  int C = tr.C;
+  int L = target.size();
+  if (L == 0 || L > T) {
+    return kNegInf;
+  }
+  for (auto label : target) {
+    if (label < 0 || label >= C) {
+      return kNegInf;
+    }
+  }
+  auto trans = [&](int l, int k) {
+    return tr.trans[target[k] * C + target[l]];
+  };
+  alphas.assign(T * L, kNegInf);
+  alphas[0] = tr.start[target[0]] + emissions[target[0]];
+  for (int t = 1; t < T; ++t) {
+    auto prev = alphas.data() + (t - 1) * L;
+    auto curr = prev + L;
+    for (int l = 0; l < L; ++l) {
+      auto score = logSumExp(
+          prev[l] + trans(l, l),
+          l > 0 ? prev[l - 1] + trans(l, l - 1) : kNegInf);
+      curr[l] = score + emissions[t * C + target[l]];
+    }
+  }
+  return alphas[T * L - 1];
+}
+
+/*
+ * The backward recursion over the alignments of `target`. Adds `delta` times
+ * the gradient of the score `output` to the gradients as in `denseGrad`.
+ */
+void asgAlignGrad(
+    const float* emissions,
+    int T,
+    const DenseTransitions& tr,
+    const std::vector<int>& target,
+    const std::vector<float>& alphas,
+    float output,
+    float delta,
+    float* emissionsGrad,
+    float* transGrad) {
+  if (output == kNegInf) {
+    return;
+  }
+  int C = tr.C;
+  int L = target.size();
+  auto trans = [&](int l, int k) {
+    return tr.trans[target[k] * C + target[l]];
+  };
+  auto addTransGrad = [&](int l, int k, float score) {
+    if (transGrad != nullptr && score != kNegInf) {
+      transGrad[C + target[k] * C + target[l]] += std::exp(score) * delta;
+    }
+  };
+  std::vector<float> betas(L, kNegInf);
+  std::vector<float> next(L);
+  betas[L - 1] = 0.0;
+  for (int t = T - 1; t >= 0; --t) {
+    auto alpha = alphas.data() + t * L;
+    for (int l = 0; l < L; ++l) {
+      auto posterior = alpha[l] + betas[l] - output;
+      if (posterior != kNegInf) {
+        emissionsGrad[t * C + target[l]] += std::exp(posterior) * delta;
+      }
+      next[l] = betas[l] + emissions[t * C + target[l]];
+    }
+    if (t == 0) {
+      if (transGrad != nullptr) {
+        transGrad[target[0]] +=
+            std::exp(tr.start[target[0]] + next[0] - output) * delta;
+      }
+      break;
+    }
+    auto prev = alpha - L;
+    for (int l = 0; l < L; ++l) {
+      addTransGrad(l, l, prev[l] + trans(l, l) + next[l] - output);
+      if (l > 0) {
+        addTransGrad(
+            l, l - 1, prev[l - 1] + trans(l, l - 1) + next[l] - output);
+      }
+      betas[l] = logSumExp(
+          trans(l, l) + next[l],
+          l + 1 < L ? trans(l + 1, l) + next[l + 1] : kNegInf);
+    }
+  }
+}
+
+// The score of the labels `target` of the emissions of `T` frames, one label
+// per frame. It is -inf if the target does not have `T` labels.
+float crfTargetScore(
+    const float* emissions,
+    int T,
+    const DenseTransitions& tr,
+    const std::vector<int>& target) {
+  int C = tr.C;
+  if (static_cast<int>(target.size()) != T) {
+    return kNegInf;
+  }
+  for (auto label : target) {
+    if (label < 0 || label >= C) {
+      return kNegInf;
+    }
+  }
+  float score = tr.start[target[0]];
+  for (int t = 0; t < T; ++t) {
+    if (t > 0) {
+      score += tr.trans[target[t - 1] * C + target[t]];
+    }
+    score += emissions[t * C + target[t]];
+  }
+  return score;
+}
+
+// Adds `delta` times the gradient of `crfTargetScore` to the gradients as
+// in `denseGrad`.
+void crfTargetGrad(
+    int T,
+    const DenseTransitions& tr,
+    const std::vector<int>& target,
+    float output,
+    float delta,
+    float* emissionsGrad,
+    float* transGrad) {
+  if (output == kNegInf) {
+    return;
+  }
+  int C = tr.C;
+  for (int t = 0; t < T; ++t) {
+    emissionsGrad[t * C + target[t]] += delta;
+    if (transGrad != nullptr) {
+      transGrad[t == 0 ? target[0] : C + target[t - 1] * C + target[t]] +=
+          delta;
+    }
+  }
+}
+
+// The highest scoring label sequence of the emissions of `T` frames.
+std::vector<int>
+denseViterbi(const float* emissions, int T, const DenseTransitions& tr) {
+  int C = tr.C;
+  std::vector<float> scores(tr.start);
+  std::vector<float> next(C);
+  // backPointers[t * C + i] is the best label before label `i` at frame `t`
+  std::vector<int> backPointers(T * C);
+  for (int i = 0; i < C; ++i) {
+    scores[i] += emissions[i];
+  }
+  for (int t = 1; t < T; ++t) {
+    std::fill(next.begin(), next.end(), kNegInf);
+    auto backPointer = backPointers.data() + t * C;
+    for (int j = 0; j < C; ++j) {
+      auto row = tr.trans.data() + j * C;
+      for (int i = 0; i < C; ++i) {
+        auto score = scores[j] + row[i];
+        if (score > next[i]) {
+          next[i] = score;
+          backPointer[i] = j;
+        }
+      }
+    }
+    for (int i = 0; i < C; ++i) {
+      scores[i] = next[i] + emissions[t * C + i];
+    }
+  }
+  auto best = std::max_element(scores.begin(), scores.end());
+  if (*best == kNegInf) {
+    return {};
+  }
+  std::vector<int> path(T);
+  path[T - 1] = best - scores.begin();
+  for (int t = T - 1; t > 0; --t) {
+    path[t - 1] = backPointers[t * C + path[t]];
+  }
+  return path;
+}
+
+/*
+ * ASG (if `asg` is true) or CRF on the weights of a graph made by
+ * `linearGraph` and dense transitions. It gives the same result as the graph
+ * operations in `asgLoss` and `crfLoss`.
+ */
+Graph denseLoss(
+    const Graph& emissions,
+    const Graph& transitions,
+    DenseTransitions tr,
+    const std::vector<int>& target,
+    bool asg) {
+  int T = emissions.numNodes() - 1;
+  std::vector<float> fullAlphas;
+  std::vector<float> alignAlphas;
+  auto fullScore = denseAlphas(emissions.weights(), T, tr, fullAlphas);
+  auto targetScore = asg
+      ? asgAlignAlphas(emissions.weights(), T, tr, target, alignAlphas)
+      : crfTargetScore(emissions.weights(), T, tr, target);
+
+  auto gradFunc = [fullAlphas = std::move(fullAlphas),
+                   alignAlphas = std::move(alignAlphas),
+                   tr = std::move(tr),
+                   target,
+                   fullScore,
+                   targetScore,
+                   T,
+                   asg](std::vector<Graph>& inputs, Graph deltas) {
+    auto& emissions = inputs[0];
+    auto& transitions = inputs[1];
+    auto delta = deltas.item();
+    auto& emissionsGrad = gradBuffer();
+    emissionsGrad.assign(emissions.numArcs(), 0.0);
+    // The transition scores are small so their gradient is not buffered
+    std::vector<float> transGrad;
+    if (transitions.calcGrad()) {
+      transGrad.assign(tr.arcs.size(), 0.0);
+    }
+    auto transGradPtr = transitions.calcGrad() ? transGrad.data() : nullptr;
+    denseGrad(
+        emissions.weights(),
+        T,
+        tr,
+        fullAlphas,
+        fullScore,
+        delta,
+        emissionsGrad.data(),
+        transGradPtr);
+    if (asg) {
+      asgAlignGrad(
+          emissions.weights(),
+          T,
+          tr,
+          target,
+          alignAlphas,
+          targetScore,
+          -delta,
+          emissionsGrad.data(),
+          transGradPtr);
+    } else {
+      crfTargetGrad(
+          T,
+          tr,
+          target,
+          targetScore,
+          -delta,
+          emissionsGrad.data(),
+          transGradPtr);
+    }
+    if (emissions.calcGrad()) {
+      emissions.addGrad(emissionsGrad);
+    }
+    if (transitions.calcGrad()) {
+      std::vector<float> grad(transitions.numArcs());
+      for (size_t k = 0; k < tr.arcs.size(); ++k) {
+        grad[tr.arcs[k]] = transGrad[k];
+      }
+      transitions.addGrad(grad);
+    }
+  };
+
+  Graph result(gradFunc, {emissions, transitions});
+  result.addNode(true);
+  result.addNode(false, true);
+  result.addArc(0, 1, 0, 0, fullScore - targetScore);
+  return result;
+}
+
+// Gather the dense transitions of `transitions` for the emissions if both can
+// use the dense implementations.
+bool denseInputs(
+    const Graph& emissions,
+    const Graph& transitions,
+    DenseTransitions& tr) {
+  if (!emissions.isLinear() || emissions.isCuda() || transitions.isCuda()) {
+    return false;
+  }
+  int T = emissions.numNodes() - 1;
+  return T > 0 && denseTransitions(transitions, emissions.numArcs() / T, tr);
+}
+
+} // namespace
+
 Graph ctcLoss(
     const Graph& logProbs,
     const std::vector<int>& target,
     const int blankIdx) {
+  if (logProbs.isLinear() && !logProbs.isCuda()) {
+    return linearCtcLoss(logProbs, target, blankIdx);
+  }
   Graph gLabel{false};
   int L = target.size();
   int S = 2 * L + 1;
@@ -38,5 +708,146 @@ Graph ctcLoss(
   gLabel = gLabel.to(logProbs.device());
   return negate(forwardScore(intersect(gLabel, logProbs)));
 }
+
+void ctcLossBatch(
+    const float* logProbs,
+    const int* targets,
+    const int* inputLengths,
+    const int* targetLengths,
+    int B,
+    int T,
+    int C,
+    int L,
+    int blankIdx,
+    float* losses,
+    float* grads /* = nullptr */) {
+  for (int b = 0; b < B; ++b) {
+    if (inputLengths[b] < 0 || inputLengths[b] > T) {
+      throw std::invalid_argument(
+          "[criterion::ctcLossBatch] Invalid input length");
+    }
+    if (targetLengths[b] < 0 || targetLengths[b] > L) {
+      throw std::invalid_argument(
+          "[criterion::ctcLossBatch] Invalid target length");
+    }
+  }
+  if (B == 0) {
+    return;
+  }
+  auto ctcLossExample = [=](int b) {
+    auto weights = logProbs + size_t(b) * T * C;
+    auto states =
+        ctcStates(targets + size_t(b) * L, targetLengths[b], blankIdx, C);
+    // The recursions only need the first `inputLengths[b]` frames
+    static thread_local std::vector<float> alphas;
+    auto score = ctcAlphas(weights, inputLengths[b], C, states, alphas);
+    losses[b] = -score;
+    if (grads != nullptr) {
+      auto grad = grads + size_t(b) * T * C;
+      std::fill(grad, grad + size_t(T) * C, 0.0f);
+      ctcGrad(
+          weights, inputLengths[b], C, states, alphas, score, -1.0, grad);
+    }
+  };
+  std::vector<int> batch(B);
+  std::iota(batch.begin(), batch.end(), 0);
+  parallelMap(ctcLossExample, batch);
+}
+
+Graph asgLoss(
+    const Graph& emissions,
+    const Graph& transitions,
+    const std::vector<int>& target) {
+  DenseTransitions tr;
+  if (denseInputs(emissions, transitions, tr)) {
+    return denseLoss(emissions, transitions, std::move(tr), target, true);
+  }
+  Graph fal{false};
+  fal.addNode(true);
+  int L = target.size();
+  for (int l = 1; l <= L; ++l) {
+    fal.addNode(false, l == L);
+    fal.addArc(l - 1, l, target[l - 1]);
+    fal.addArc(l, l, target[l - 1]);
+  }
+  fal = fal.to(emissions.device());
+  return subtract(
+      forwardScore(compose(emissions, transitions)),
+      forwardScore(compose(compose(fal, transitions), emissions)));
+}
+
+std::vector<Graph> asgLoss(
+    const std::vector<Graph>& emissions,
+    const Graph& transitions,
+    const std::vector<std::vector<int>>& targets) {
+  std::vector<Graph> transitionsVec{transitions};
+  return parallelMap(
+      [](const Graph& emissions,
+         const Graph& transitions,
+         const std::vector<int>& target) {
+        return asgLoss(emissions, transitions, target);
+      },
+      emissions,
+      transitionsVec,
+      targets);
+}
+
+Graph crfLoss(
+    const Graph& emissions,
+    const Graph& transitions,
+    const std::vector<int>& target) {
+  DenseTransitions tr;
+  if (denseInputs(emissions, transitions, tr)) {
+    return denseLoss(emissions, transitions, std::move(tr), target, false);
+  }
+  int T = target.size();
+  Graph labels{false};
+  labels.addNode(true, T == 0);
+  for (int t = 1; t <= T; ++t) {
+    labels.addNode(false, t == T);
+    labels.addArc(t - 1, t, target[t - 1]);
+  }
+  labels = labels.to(emissions.device());
+  return subtract(
+      forwardScore(compose(emissions, transitions)),
+      forwardScore(compose(emissions, intersect(labels, transitions))));
+}
+
+std::vector<Graph> crfLoss(
+    const std::vector<Graph>& emissions,
+    const Graph& transitions,
+    const std::vector<std::vector<int>>& targets) {
+  std::vector<Graph> transitionsVec{transitions};
+  return parallelMap(
+      [](const Graph& emissions,
+         const Graph& transitions,
+         const std::vector<int>& target) {
+        return crfLoss(emissions, transitions, target);
+      },
+      emissions,
+      transitionsVec,
+      targets);
+}
+
+std::vector<int> crfDecode(const Graph& emissions, const Graph& transitions) {
+  DenseTransitions tr;
+  if (denseInputs(emissions, transitions, tr)) {
+    return denseViterbi(emissions.weights(), emissions.numNodes() - 1, tr);
+  }
+  auto path = viterbiPath(compose(emissions, transitions)).cpu();
+  return path.labelsToVector(false);
+}
+
+std::vector<std::vector<int>> crfDecode(
+    const std::vector<Graph>& emissions,
+    const Graph& transitions) {
+  std::vector<Graph> transitionsVec{transitions};
+  return parallelMap(
+      [](const Graph& emissions, const Graph& transitions) {
+        return crfDecode(emissions, transitions);
+      },
+      emissions,
+      transitionsVec);
+}
 } // namespace criterion
 } // namespace gtn
@@ -24,11 +24,140 @@ namespace criterion {
  * NB: This assumes the weights on the emission graph are in log probabilities.
  * This is typically done by adding a LogSoftmax layer in the last layer of the
  * network.
+ *
+ * For CPU emissions made with `linearGraph` the loss is computed directly from
+ * the weights with the CTC forward-backward recursions, which is much faster
+ * than composing the emissions with the CTC graph of the target.
  */
 Graph ctcLoss(
     const Graph& logProbs,
     const std::vector<int>& target,
     const int blankIdx);
 
+/**
+ * Compute the CTC loss of a batch of padded emissions without building any
+ * graphs. The examples of the batch are computed in parallel. Each loss and
+ * gradient is the same as `ctcLoss` on the emissions of the example in a
+ * graph made by `linearGraph`.
+ *
+ * @param logProbs The log probabilities of the emissions, an array of shape
+ *   `[B, T, C]`.
+ * @param targets The padded targets, an array of shape `[B, L]`.
+ * @param inputLengths The number of frames of each example, at most `T`.
+ * @param targetLengths The length of the target of each example, at most `L`.
+ * @param B The batch size.
+ * @param T The number of frames.
+ * @param C The number of labels, including the blank.
+ * @param L The maximum target length.
+ * @param blankIdx The index of the blank label.
+ * @param losses An array of `B` losses to set.
+ * @param grads If not `nullptr`, an array of shape `[B, T, C]` to set to the
+ *   gradient of each loss with respect to its log probabilities. The
+ *   gradient of padding frames is zero.
+ */
+void ctcLossBatch(
+    const float* logProbs,
+    const int* targets,
+    const int* inputLengths,
+    const int* targetLengths,
+    int B,
+    int T,
+    int C,
+    int L,
+    int blankIdx,
+    float* losses,
+    float* grads = nullptr);
+
+/**
+ * Auto Segmentation (ASG) criterion of
+ * https://arxiv.org/abs/1609.03193. The loss is the score of all label
+ * sequences of the emissions under the transitions minus the score of the
+ * sequences which collapse to `target`, that is
+ * ```
+ * subtract(
+ *     forwardScore(compose(emissions, transitions)),
+ *     forwardScore(compose(compose(fal, transitions), emissions)))
+ * ```
+ * where `fal` is the force align graph of `target` (each label of the target
+ * is repeated one or more times).
+ *
+ * The `transitions` graph has a single start node and an accept node per
+ * label of the `C` labels of the emissions. There is an arc from the start
+ * node to every label node and an arc between every pair of label nodes,
+ * each with the label of its destination node. The arcs can be in any
+ * order.
+ *
+ * For CPU emissions made with `linearGraph` and transitions of this form the
+ * loss and its gradients are computed directly from the weights with dense
+ * recursions in `O(T C^2)` time, without composing any graphs. Otherwise the
+ * loss is computed with the graph operations above.
+ */
+Graph asgLoss(
+    const Graph& emissions,
+    const Graph& transitions,
+    const std::vector<int>& target);
+
+/**
+ * Compute the ASG loss of a batch of emissions with shared transitions. The
+ * examples of the batch are computed in parallel. The gradients of all of
+ * the losses are accumulated in the gradient of `transitions`.
+ */
+std::vector<Graph> asgLoss(
+    const std::vector<Graph>& emissions,
+    const Graph& transitions,
+    const std::vector<std::vector<int>>& targets);
+
+/**
+ * Linear-chain conditional random field (CRF) loss. The loss is the score of
+ * all label sequences of the emissions under the transitions minus the score
+ * of `target`, that is
+ * ```
+ * subtract(
+ *     forwardScore(compose(emissions, transitions)),
+ *     forwardScore(compose(emissions, intersect(labels, transitions))))
+ * ```
+ * where `labels` is the chain graph of `target`.
+ *
+ * The `transitions` graph has a single start node and an accept node per
+ * label of the `C` labels of the emissions. There is an arc from the start
+ * node to every label node and an arc between every pair of label nodes,
+ * each with the label of its destination node. The arcs can be in any
+ * order.
+ *
+ * For CPU emissions made with `linearGraph` and transitions of this form the
+ * loss and its gradients are computed directly from the weights with dense
+ * recursions in `O(T C^2)` time, without composing any graphs. Otherwise the
+ * loss is computed with the graph operations above.
+ */
+Graph crfLoss(
+    const Graph& emissions,
+    const Graph& transitions,
+    const std::vector<int>& target);
+
+/**
+ * Compute the CRF loss of a batch of emissions with shared transitions. The
+ * examples of the batch are computed in parallel. The gradients of all of
+ * the losses are accumulated in the gradient of `transitions`.
+ */
+std::vector<Graph> crfLoss(
+    const std::vector<Graph>& emissions,
+    const Graph& transitions,
+    const std::vector<std::vector<int>>& targets);
+
+/**
+ * Find the highest scoring label sequence of a linear-chain CRF, the labels
+ * of `viterbiPath(compose(emissions, transitions))`. The same dense
+ * implementation as `crfLoss` is used when possible.
+ */
+std::vector<int> crfDecode(const Graph& emissions, const Graph& transitions);
+
+/**
+ * Find the highest scoring label sequence of each emissions graph of a batch
+ * in parallel.
+ */
+std::vector<std::vector<int>> crfDecode(
+    const std::vector<Graph>& emissions,
+    const Graph& transitions);
+
 } // namespace criterion
 } // namespace gtn
\ No newline at end of file
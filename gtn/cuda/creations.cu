@@ -85,6 +85,7 @@ Graph linearGraph(int M, int N, bool calcGrad, Device device) {
   }
 
   gData.compiled = true;
+  gData.linear = true;
   g.getWeights().resize(numArcs, 0);
 
   g.markArcSorted();
@@ -28,10 +28,30 @@ Graph compose(const Graph& g1, const Graph& g2) {
   return cuda::detail::compose(g1, g2);
 }
 
-Graph remove(const Graph& g, int ilabel, int olabel) {
+Graph connect(const Graph& g) {
+  throw std::logic_error("[cuda::connect] GPU function not implemented.");
+}
+
+Graph remove(const Graph& g, int ilabel, int olabel, Semiring semiring) {
   throw std::logic_error("[cuda::remove] GPU function not implemented.");
 }
 
+Graph determinize(
+    const Graph& g,
+    Semiring semiring,
+    int maxStates,
+    int maxArcs) {
+  throw std::logic_error("[cuda::determinize] GPU function not implemented.");
+}
+
+Graph minimize(const Graph& g, Semiring semiring) {
+  throw std::logic_error("[cuda::minimize] GPU function not implemented.");
+}
+
+Graph prune(const Graph& g, float beam, int maxArcs, Semiring semiring) {
+  throw std::logic_error("[cuda::prune] GPU function not implemented.");
+}
+
 Graph forwardScore(const Graph& g) {
   return cuda::detail::shortestDistance(g, false);
 }
@@ -44,5 +64,14 @@ Graph viterbiPath(const Graph& g) {
   throw std::logic_error("[cuda::viterbiPath] GPU function not implemented.");
 }
 
+std::vector<Graph> nbest(const Graph& g, int k, bool unique) {
+  throw std::logic_error("[cuda::nbest] GPU function not implemented.");
+}
+
+Graph composeScore(const Graph& g1, const Graph& g2, Semiring semiring) {
+  return cuda::detail::shortestDistance(
+      cuda::detail::compose(g1, g2), semiring == Semiring::TROPICAL);
+}
+
 } // namespace cuda
 } // namespace gtn
@@ -125,10 +125,30 @@ Graph compose(const Graph& g1, const Graph& g2) {
   throw std::logic_error("[cuda::remove] CUDA not available.");
 }
 
-Graph remove(const Graph& g, int ilabel, int olabel) {
+Graph connect(const Graph& g) {
+  throw std::logic_error("[cuda::connect] CUDA not available.");
+}
+
+Graph remove(const Graph& g, int ilabel, int olabel, Semiring semiring) {
   throw std::logic_error("[cuda::remove] CUDA not available.");
 }
 
+Graph determinize(
+    const Graph& g,
+    Semiring semiring,
+    int maxStates,
+    int maxArcs) {
+  throw std::logic_error("[cuda::determinize] CUDA not available.");
+}
+
+Graph minimize(const Graph& g, Semiring semiring) {
+  throw std::logic_error("[cuda::minimize] CUDA not available.");
+}
+
+Graph prune(const Graph& g, float beam, int maxArcs, Semiring semiring) {
+  throw std::logic_error("[cuda::prune] CUDA not available.");
+}
+
 Graph forwardScore(const Graph& g) {
   throw std::logic_error("[cuda::forwardScore] CUDA not available.");
 }
@@ -141,6 +161,14 @@ Graph viterbiPath(const Graph& g) {
   throw std::logic_error("[cuda::viterbiPath] CUDA not available.");
 }
 
+std::vector<Graph> nbest(const Graph& g, int k, bool unique) {
+  throw std::logic_error("[cuda::nbest] CUDA not available.");
+}
+
+Graph composeScore(const Graph& g1, const Graph& g2, Semiring semiring) {
+  throw std::logic_error("[cuda::composeScore] CUDA not available.");
+}
+
 Graph scalarGraph(float val, bool calcGrad, Device device) {
   throw std::logic_error("[cuda::scalarGraph] CUDA not available.");
 }
@@ -113,14 +113,29 @@ Graph clone(const Graph& g, Projection projection /* = Projection::NONE */) {
   auto gradFunc = [](std::vector<Graph>& inputs, Graph& deltas) {
     inputs[0].addGrad(deltas.weights());
   };
-  Graph out = Graph::deepCopy(g);
+  // The copy shares all of its arrays with `g`, so only the projected
+  // labels need a new array
+  Graph out = Graph::lazyCopy(g);
   out.setInputs({g.withoutWeights()});
   out.setGradFunc(gradFunc);
+  auto project = [](const auto& from, auto& to) {
+    std::remove_const_t<std::remove_reference_t<decltype(from)>> labels(
+        from.device());
+    labels = from;
+    // The old array is still owned by `g`
+    swap(labels, to);
+  };
   auto& gData = out.getData();
-  if (projection == Projection::OUTPUT) {
-    gData.ilabels.copy(gData.olabels.data());
+  if (gData.compact) {
+    if (projection == Projection::OUTPUT) {
+      project(gData.olabels16, gData.ilabels16);
+    } else if (projection == Projection::INPUT) {
+      project(gData.ilabels16, gData.olabels16);
+    }
+  } else if (projection == Projection::OUTPUT) {
+    project(gData.olabels, gData.ilabels);
   } else if (projection == Projection::INPUT) {
-    gData.olabels.copy(gData.ilabels.data());
+    project(gData.ilabels, gData.olabels);
   }
   return out;
 }
@@ -143,15 +158,56 @@ DISPATCHV(union_)
 DISPATCH2(intersect)
 DISPATCH2(compose)
 
-Graph remove(const Graph& g, int label /* = epsilon */) {
-  return remove(g, label, label);
+DISPATCH1(connect)
+
+Graph remove(
+    const Graph& g,
+    int label /* = epsilon */,
+    Semiring semiring /* = Semiring::LOG */) {
+  return remove(g, label, label, semiring);
+}
+
+Graph remove(
+    const Graph& g,
+    int ilabel,
+    int olabel,
+    Semiring semiring /* = Semiring::LOG */) {
+  if (g.isCuda()) {
+    return cuda::remove(g, ilabel, olabel, semiring);
+  } else {
+    return cpu::remove(g, ilabel, olabel, semiring);
+  }
+}
+
+Graph determinize(
+    const Graph& g,
+    Semiring semiring /* = Semiring::LOG */,
+    int maxStates /* = -1 */,
+    int maxArcs /* = -1 */) {
+  if (g.isCuda()) {
+    return cuda::determinize(g, semiring, maxStates, maxArcs);
+  } else {
+    return cpu::determinize(g, semiring, maxStates, maxArcs);
+  }
 }
 
-Graph remove(const Graph& g, int ilabel, int olabel) {
+Graph minimize(const Graph& g, Semiring semiring /* = Semiring::LOG */) {
   if (g.isCuda()) {
-    return cuda::remove(g, ilabel, olabel);
+    return cuda::minimize(g, semiring);
   } else {
-    return cpu::remove(g, ilabel, olabel);
+    return cpu::minimize(g, semiring);
+  }
+}
+
+Graph prune(
+    const Graph& g,
+    float beam,
+    int maxArcs /* = -1 */,
+    Semiring semiring /* = Semiring::LOG */) {
+  if (g.isCuda()) {
+    return cuda::prune(g, beam, maxArcs, semiring);
+  } else {
+    return cpu::prune(g, beam, maxArcs, semiring);
   }
 }
 
@@ -159,4 +215,24 @@ DISPATCH1(forwardScore)
 DISPATCH1(viterbiScore)
 DISPATCH1(viterbiPath)
 
+std::vector<Graph> nbest(const Graph& g, int k, bool unique /* = true */) {
+  if (g.isCuda()) {
+    return cuda::nbest(g, k, unique);
+  } else {
+    return cpu::nbest(g, k, unique);
+  }
+}
+
+Graph composeScore(
+    const Graph& g1,
+    const Graph& g2,
+    Semiring semiring /* = Semiring::LOG */) {
+  deviceCheck(g1, g2, "composeScore");
+  if (g1.isCuda()) {
+    return cuda::composeScore(g1, g2, semiring);
+  } else {
+    return cpu::composeScore(g1, g2, semiring);
+  }
+}
+
 } // namespace gtn
@@ -34,6 +34,16 @@ enum class Projection {
   OUTPUT = 2,
 };
 
+/**
+ * Semiring used to score the paths of a graph, e.g. with `gtn::composeScore`.
+ */
+enum class Semiring {
+  /** Sum the scores of all paths with log-sum-exp as in `gtn::forwardScore`. */
+  LOG = 0,
+  /** Take the score of the best path, as in `gtn::viterbiScore`. */
+  TROPICAL = 1,
+};
+
 /**
  * Performs a deep clone of a graph with an option to project to either the
  * input or output labels. The operation is recorded in the autograd tape. For a
@@ -87,21 +97,124 @@ Graph closure(const Graph& g);
 /** Create the union of a vector of graphs. */
 Graph union_(const std::vector<Graph>& graphs);
 
+/**
+ * Remove the nodes of the graph which are not on a path from a start node to
+ * an accept node, along with their arcs. The remaining nodes and arcs keep
+ * their relative order. This is useful to shrink graphs with dead states
+ * (e.g. from `compose`) before further operations.
+ */
+Graph connect(const Graph& g);
+
 /**
  * Create the equivalent graph without epsilon transitions. If label is
  * specified then instead of removing epsilon transitions, arcs with the
  * matching label are removed. The removed arc labels are treated as if they
  * were epsilon transitions. Note this is different than simply pruning the
  * arc.
+ *
+ * The scores of the paths of removed arcs are kept: each new arc has the
+ * score of the removed paths before it summed with the log semiring (or the
+ * maximum score with `Semiring::TROPICAL`). A node which reaches an accept
+ * node through removed arcs with a score gets a copy as a new accept node
+ * when paths also continue from it. If a start node reaches an accept node
+ * this way, one arc with the removed label is kept for the empty path. A node
+ * with a final score of 0 in a graph which does not compute gradients is an
+ * accept node instead, so the result of an unweighted graph has no removed
+ * labels. The closure of each node is computed once from the closures of the
+ * nodes it reaches. If the removed arcs form a cycle, each node reachable
+ * through them is counted once with a score of 0 and the removed arcs do not
+ * get a gradient. This operation is recorded in the autograd tape.
  */
-Graph remove(const Graph& g, int label = epsilon);
+Graph remove(
+    const Graph& g,
+    int label = epsilon,
+    Semiring semiring = Semiring::LOG);
 
 /**
  * Create the equivalent graph without `ilabel:olabel` transitions. The removed
  * arc labels are treated as if they were epsilon transitions. Note this is
- * different than simply pruning the arc.
+ * different than simply pruning the arc. See `remove(const Graph&, int,
+ * Semiring)` for how the scores of the removed arcs are kept.
+ */
+Graph remove(
+    const Graph& g,
+    int ilabel,
+    int olabel,
+    Semiring semiring = Semiring::LOG);
+
+/**
+ * Determinize an acceptor or a functional transducer with the weighted subset
+ * construction. No two arcs leaving a node of the determinized graph have the
+ * same input label, so each sequence of input labels is on at most one path.
+ * The score of the path is the score of all the paths of `g` with that
+ * sequence summed with the log semiring (or the maximum score with
+ * `Semiring::TROPICAL`). The determinized graph has one start node, which is
+ * the node `0`. Epsilons are treated as regular labels, use `gtn::remove`
+ * first to remove them.
+ *
+ * The output labels of a transducer are delayed until all the paths with the
+ * same input labels agree on them. The output labels left at the end of the
+ * paths are on a chain of arcs with epsilon input labels to a new accept
+ * node, one chain for each different sequence of output labels left (so
+ * there is more than one only if `g` is not functional).
+ *
+ * Nodes are only merged when their residual scores are exactly equal, so the
+ * scores are not approximated. Some cyclic graphs do not have a finite
+ * determinized graph, and the rounding of the residual scores can add nodes
+ * for others. The number of nodes and arcs can be limited with `maxStates` and `maxArcs` (a negative
+ * value means no limit), and an exception is thrown when a limit is
+ * exceeded. The accept nodes of the determinized graph have no score of
+ * their own, so with `Semiring::LOG` an exception is also thrown if more than
+ * one start node of `g` is an accept node (the empty path would have a score
+ * other than zero).
+ *
+ * This operation is recorded in the autograd tape. The gradient of each arc
+ * is passed to the arcs of `g` it sums through the scores of the node it
+ * leaves from.
+ */
+Graph determinize(
+    const Graph& g,
+    Semiring semiring = Semiring::LOG,
+    int maxStates = -1,
+    int maxArcs = -1);
+
+/**
+ * Minimize a graph by pushing its weights and merging equivalent nodes. The
+ * weights of an acyclic graph are pushed towards the start nodes with the
+ * backward score of each node (the forward score from the node to the accept
+ * nodes, or the Viterbi score with `Semiring::TROPICAL`), except for the
+ * start and accept nodes which keep the scores of the paths through them.
+ * Nodes are then merged when they are both accept nodes or not and have the
+ * same arcs (labels and exactly equal weights) to merged nodes. Start nodes
+ * are not merged with each other. The score of every path is unchanged up to
+ * the rounding of the pushed weights, which may also keep apart nodes which
+ * are only equivalent up to rounding.
+ *
+ * The result is minimal for a deterministic graph, so `gtn::determinize`
+ * should be called first for nondeterministic graphs. This operation is
+ * recorded in the autograd tape. The gradient of each arc goes to the arc
+ * of the first merged node it is from and through the pushed scores.
+ */
+Graph minimize(const Graph& g, Semiring semiring = Semiring::LOG);
+
+/**
+ * Prune the arcs of an acyclic graph far from the best paths. The score of
+ * each arc is the score of all the paths through it summed with the log
+ * semiring (its log posterior plus the forward score of the graph), or the
+ * score of the best path through it with `Semiring::TROPICAL`. Arcs with a
+ * score more than `beam` below the highest score of an arc are removed, so
+ * with `Semiring::TROPICAL` the arcs of the best path are always kept. If
+ * `maxArcs` is not negative, at most that many arcs with the highest scores
+ * are kept. The nodes and arcs which are no longer on a path from a start
+ * node to an accept node are then removed as in `gtn::connect`. The kept arcs
+ * have the same weights and order as in `g`. This operation is recorded in
+ * the autograd tape and the gradient of each kept arc goes to its arc in `g`.
  */
-Graph remove(const Graph& g, int ilabel, int olabel);
+Graph prune(
+    const Graph& g,
+    float beam,
+    int maxArcs = -1,
+    Semiring semiring = Semiring::LOG);
 
 /**
  * Compose two transducers. This operation is recorded in the autograd tape.
@@ -151,5 +264,46 @@ Graph viterbiScore(const Graph& g);
  */
 Graph viterbiPath(const Graph& g);
 
+/**
+ * Compute the `k` best paths of a graph, from the best to the worst. Each
+ * path is returned in a single chain graph with the labels and weights of the
+ * path as with `gtn::viterbiPath`. Fewer graphs are returned if `g` has fewer
+ * than `k` paths. The `k` best paths to each node are found from those of the
+ * nodes before it, visiting the nodes in topological order.
+ *
+ * If `unique` is true every path has a different sequence of input labels
+ * (or, for a transducer which is not functional, of input and output labels).
+ * The paths are then those of `determinize(g, Semiring::TROPICAL)`, so the
+ * score of each path is the best score of its sequence in `g` but it may be
+ * distributed differently over the arcs of the path, and the output labels
+ * may be delayed. Only the nodes of the determinized graph reached by an A*
+ * search for the `k` best paths (with the Viterbi score from each node of `g`
+ * to the accept nodes) are built, so it can be used on graphs whose
+ * determinized graph would be too large. The operation is recorded in the
+ * autograd tape and the gradient of each arc goes to the arc of `g` it is
+ * from (through the determinized graph if `unique` is true).
+ * NB: This assumes the input graph is acyclic.
+ */
+std::vector<Graph> nbest(const Graph& g, int k, bool unique = true);
+
+/**
+ * Compute the forward score (or the Viterbi score with `Semiring::TROPICAL`)
+ * of the composition of two graphs. This is equivalent to
+ * `forwardScore(compose(g1, g2))` (or `viterbiScore(compose(g1, g2))`) but
+ * the composed graph is never built, so it uses much less memory. The
+ * operation is recorded in the autograd tape and the gradient is computed
+ * directly for the arcs of `g1` and `g2`.
+ *
+ * The scores are computed on the fly for CPU graphs when one graph is acyclic
+ * and the other is acyclic or has no epsilon labels to match (the output
+ * labels of `g1` or the input labels of `g2`). Otherwise the composed graph is
+ * built.
+ * NB: This assumes the composed graph is acyclic.
+ */
+Graph composeScore(
+    const Graph& g1,
+    const Graph& g2,
+    Semiring semiring = Semiring::LOG);
+
 /** @} */
 } // namespace gtn
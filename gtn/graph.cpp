@@ -8,6 +8,8 @@
 #include <algorithm>
 #include <cmath>
 #include <stdexcept>
+#include <string>
+#include <unordered_set>
 #include <utility>
 
 #include "graph.h"
@@ -19,14 +21,6 @@ namespace gtn {
 
 namespace{
 
-auto makeSharedGraph(Device device) {
-  return std::shared_ptr<Graph::SharedGraph>{
-    new Graph::SharedGraph{device},
-    [](Graph::SharedGraph* g) {
-      g->free();
-      delete g;}};
-}
-
 auto makeSharedWeights(Device device) {
   return std::shared_ptr<detail::HDSpan<float>>{
       new detail::HDSpan<float>{device},
@@ -35,6 +29,45 @@ auto makeSharedWeights(Device device) {
         delete w;}};
 }
 
+// Deleter for weights bound to an external array. Keeps the owner of the
+// array alive and only frees the weights once the graph has its own copy.
+struct BoundWeightsDeleter {
+  std::shared_ptr<void> owner;
+  const float* data;
+
+  void operator()(detail::HDSpan<float>* w) {
+    if (w->data() != data) {
+      w->clear();
+    }
+    delete w;
+  }
+};
+
+// Grow the span geometrically so repeated appends are amortized linear.
+template <typename T>
+T* extend(HDSpan<T>& span, size_t n) {
+  auto size = span.size();
+  if (size + n > span.capacity()) {
+    span.reserve(std::max(size + n, span.capacity() << 1));
+  }
+  span.resize(size + n);
+  return span.data() + size;
+}
+
+// Free the arrays of `g` which are not owned by `shared`
+void freeUnshared(Graph::SharedGraph& g, const Graph::SharedGraph* shared) {
+  if (shared == nullptr) {
+    g.free();
+    return;
+  }
+  Graph::SharedGraph::forEachArray(
+      g, *shared, [](auto& array, const auto& sharedArray) {
+        if (array.data() != sharedArray.data()) {
+          array.clear();
+        }
+      });
+}
+
 } // namespace
 
 Graph::Graph(GradFunc gradFunc, std::vector<Graph> inputs) {
@@ -55,11 +88,70 @@ Graph::Graph(GradFunc gradFunc, std::vector<Graph> inputs) {
   }
 }
 
+std::shared_ptr<Graph::SharedGraph> Graph::makeSharedGraph(
+    Device device /* = Device::CPU */) {
+  return makeSharedGraph(new SharedGraphState{device});
+}
+
+std::shared_ptr<Graph::SharedGraph> Graph::makeSharedGraph(
+    SharedGraphState* data) {
+  return std::shared_ptr<SharedGraph>{
+    data,
+    [](SharedGraph* g) {
+      auto s = static_cast<SharedGraphState*>(g);
+      freeUnshared(*s, s->shared.get());
+      delete s;}};
+}
+
+std::shared_ptr<Graph::SharedGraph> Graph::shareData() const {
+  auto& s = state();
+  std::lock_guard<std::mutex> lock(s.compileLock);
+  bool owned = s.shared != nullptr;
+  if (owned) {
+    SharedGraph::forEachArray(
+        s, *s.shared, [&owned](auto& array, const auto& sharedArray) {
+          owned &= array.data() == sharedArray.data();
+        });
+  }
+  if (!owned) {
+    // Hand the arrays over to a new owner which also keeps any arrays the
+    // graph itself shares alive
+    auto prev = s.shared;
+    s.shared = std::shared_ptr<SharedGraph>{
+      new SharedGraph(s),
+      [prev](SharedGraph* g) {
+        freeUnshared(*g, prev.get());
+        delete g;}};
+  }
+  return s.shared;
+}
+
+void Graph::beginModify(const char* fn) {
+  if (sharedGraph_->frozen) {
+    throw std::logic_error(
+        std::string("[Graph::") + fn + "] Cannot modify a frozen graph");
+  }
+  auto& s = state();
+  if (s.shared == nullptr) {
+    return;
+  }
+  SharedGraph::forEachArray(s, *s.shared, [](auto& array, const auto& sharedArray) {
+    if (array.data() != nullptr && array.data() == sharedArray.data()) {
+      std::remove_reference_t<decltype(array)> copy(array.device());
+      copy = array;
+      swap(array, copy);
+    }
+  });
+  s.shared = nullptr;
+}
+
 Graph::Graph(bool calcGrad /* = true */) {
   sharedGrad_->calcGrad = calcGrad;
 }
 
 int Graph::addNode(bool start /* = false */, bool accept /* = false */) {
+  beginModify("addNode");
+  setCompact(false);
   int idx = static_cast<int>(numNodes());
   sharedGraph_->start.push_back(start);
   sharedGraph_->accept.push_back(accept);
@@ -76,6 +168,76 @@ int Graph::addNode(bool start /* = false */, bool accept /* = false */) {
   return idx;
 }
 
+int Graph::addNodes(
+    size_t n,
+    const bool* start /* = nullptr */,
+    const bool* accept /* = nullptr */) {
+  beginModify("addNodes");
+  setCompact(false);
+  int idx = static_cast<int>(numNodes());
+  auto setNodes = [idx, n](
+      const bool* vals, HDSpan<bool>& isNode, HDSpan<int>& nodeIds) {
+    auto isNodeData = extend(isNode, n);
+    if (vals == nullptr) {
+      std::fill(isNodeData, isNodeData + n, false);
+      return;
+    }
+    std::copy(vals, vals + n, isNodeData);
+    for (size_t i = 0; i < n; ++i) {
+      if (vals[i]) {
+        nodeIds.push_back(idx + i);
+      }
+    }
+  };
+  setNodes(start, sharedGraph_->start, sharedGraph_->startIds);
+  setNodes(accept, sharedGraph_->accept, sharedGraph_->acceptIds);
+  sharedGraph_->ilabelSorted = false;
+  sharedGraph_->olabelSorted = false;
+  uncompile();
+  sharedGraph_->numNodes += n;
+  return idx;
+}
+
+size_t Graph::addArcs(
+    size_t n,
+    const int* srcNodes,
+    const int* dstNodes,
+    const int* ilabels,
+    const int* olabels /* = nullptr */,
+    const float* weights /* = nullptr */) {
+  beginModify("addArcs");
+  ownWeights();
+  for (size_t i = 0; i < n; ++i) {
+    if (srcNodes[i] < 0 || static_cast<size_t>(srcNodes[i]) >= numNodes() ||
+        dstNodes[i] < 0 || static_cast<size_t>(dstNodes[i]) >= numNodes()) {
+      throw std::invalid_argument(
+          "[Graph::addArcs] Invalid node for arc " + std::to_string(i) + ".");
+    }
+    if (ilabels[i] < epsilon || (olabels && olabels[i] < epsilon)) {
+      throw std::invalid_argument(
+          "[Graph::addArcs] Invalid label for arc " + std::to_string(i) + ".");
+    }
+  }
+  setCompact(false);
+  auto idx = numArcs();
+  std::copy(srcNodes, srcNodes + n, extend(sharedGraph_->srcNodes, n));
+  std::copy(dstNodes, dstNodes + n, extend(sharedGraph_->dstNodes, n));
+  std::copy(ilabels, ilabels + n, extend(sharedGraph_->ilabels, n));
+  olabels = olabels ? olabels : ilabels;
+  std::copy(olabels, olabels + n, extend(sharedGraph_->olabels, n));
+  auto weightsData = extend(*sharedWeights_, n);
+  if (weights) {
+    std::copy(weights, weights + n, weightsData);
+  } else {
+    std::fill(weightsData, weightsData + n, 0.0f);
+  }
+  sharedGraph_->ilabelSorted = false;
+  sharedGraph_->olabelSorted = false;
+  uncompile();
+  sharedGraph_->numArcs += n;
+  return idx;
+}
+
 size_t Graph::addArc(size_t srcNode, size_t dstNode, int label) {
   return addArc(srcNode, dstNode, label, label);
 }
@@ -87,6 +249,9 @@ size_t Graph::addArc(
     int olabel,
     float weight /* = 0 */) {
   assert(ilabel >= epsilon && olabel >= epsilon);
+  beginModify("addArc");
+  ownWeights();
+  setCompact(false);
   sharedWeights_->push_back(weight);
   sharedGraph_->ilabels.push_back(ilabel);
   sharedGraph_->olabels.push_back(olabel);
@@ -99,15 +264,453 @@ size_t Graph::addArc(
   return numArcs() - 1;
 }
 
+Graph Graph::fromArrays(
+    size_t numNodes,
+    size_t numStart,
+    const int* startIds,
+    size_t numAccept,
+    const int* acceptIds,
+    size_t numArcs,
+    const int* srcNodes,
+    const int* dstNodes,
+    const int* ilabels,
+    const int* olabels /* = nullptr */,
+    const float* weights /* = nullptr */,
+    bool calcGrad /* = true */) {
+  Graph g(calcGrad);
+  auto& gData = g.getData();
+
+  // Set start and accept
+  auto setNodes = [numNodes](
+      size_t num,
+      const int* ids,
+      detail::HDSpan<int>& nodeIds,
+      detail::HDSpan<bool>& isNode,
+      const std::string& name) {
+    nodeIds.resize(num);
+    for (size_t i = 0; i < num; ++i) {
+      auto n = ids[i];
+      if (n < 0 || static_cast<size_t>(n) >= numNodes) {
+        throw std::invalid_argument(
+            "[Graph::fromArrays] Invalid " + name + " node " +
+            std::to_string(n) + ".");
+      }
+      if (isNode[n]) {
+        throw std::invalid_argument(
+            "[Graph::fromArrays] Repeat " + name + " node " +
+            std::to_string(n) + ".");
+      }
+      isNode[n] = true;
+      nodeIds[i] = n;
+    }
+  };
+  gData.numNodes = numNodes;
+  gData.start.resize(numNodes, false);
+  gData.accept.resize(numNodes, false);
+  setNodes(numStart, startIds, gData.startIds, gData.start, "start");
+  setNodes(numAccept, acceptIds, gData.acceptIds, gData.accept, "accept");
+
+  // Set arcs
+  for (size_t i = 0; i < numArcs; ++i) {
+    if (srcNodes[i] < 0 || static_cast<size_t>(srcNodes[i]) >= numNodes ||
+        dstNodes[i] < 0 || static_cast<size_t>(dstNodes[i]) >= numNodes) {
+      throw std::invalid_argument(
+          "[Graph::fromArrays] Invalid node for arc " + std::to_string(i) +
+          ".");
+    }
+    if (ilabels[i] < epsilon || (olabels && olabels[i] < epsilon)) {
+      throw std::invalid_argument(
+          "[Graph::fromArrays] Invalid label for arc " + std::to_string(i) +
+          ".");
+    }
+  }
+  gData.numArcs = numArcs;
+  gData.srcNodes.resize(numArcs);
+  gData.srcNodes.copy(srcNodes);
+  gData.dstNodes.resize(numArcs);
+  gData.dstNodes.copy(dstNodes);
+  gData.ilabels.resize(numArcs);
+  gData.ilabels.copy(ilabels);
+  gData.olabels.resize(numArcs);
+  gData.olabels.copy(olabels ? olabels : ilabels);
+  if (weights) {
+    g.setWeights(weights);
+  } else {
+    g.getWeights().resize(numArcs, 0);
+  }
+
+  // Build the arc lists for each node in one pass
+  g.ensureCompiled();
+  return g;
+}
+
+Graph Graph::fromArrays(
+    size_t numNodes,
+    const std::vector<int>& startIds,
+    const std::vector<int>& acceptIds,
+    const std::vector<int>& srcNodes,
+    const std::vector<int>& dstNodes,
+    const std::vector<int>& ilabels,
+    const std::vector<int>& olabels /* = {} */,
+    const std::vector<float>& weights /* = {} */,
+    bool calcGrad /* = true */) {
+  auto numArcs = srcNodes.size();
+  if (dstNodes.size() != numArcs || ilabels.size() != numArcs ||
+      (!olabels.empty() && olabels.size() != numArcs) ||
+      (!weights.empty() && weights.size() != numArcs)) {
+    throw std::invalid_argument(
+        "[Graph::fromArrays] Arc arrays must have the same size.");
+  }
+  return fromArrays(
+      numNodes,
+      startIds.size(),
+      startIds.data(),
+      acceptIds.size(),
+      acceptIds.data(),
+      numArcs,
+      srcNodes.data(),
+      dstNodes.data(),
+      ilabels.data(),
+      olabels.empty() ? nullptr : olabels.data(),
+      weights.empty() ? nullptr : weights.data(),
+      calcGrad);
+}
+
+void Graph::reserve(size_t numNodes, size_t numArcs) {
+  if (isCuda()) {
+    throw std::invalid_argument(
+        "[Graph::reserve] Can only reserve storage for CPU graphs");
+  }
+  beginModify("reserve");
+  ownWeights();
+  setCompact(false);
+  auto& g = *sharedGraph_;
+  g.start.reserve(numNodes);
+  g.accept.reserve(numNodes);
+  g.ilabels.reserve(numArcs);
+  g.olabels.reserve(numArcs);
+  g.srcNodes.reserve(numArcs);
+  g.dstNodes.reserve(numArcs);
+  sharedWeights_->reserve(numArcs);
+}
+
+void Graph::shrinkToFit() {
+  beginModify("shrinkToFit");
+  ownWeights();
+  ensureCompiled(true);
+  auto& g = *sharedGraph_;
+  g.startIds.shrink_to_fit();
+  g.acceptIds.shrink_to_fit();
+  g.start.shrink_to_fit();
+  g.accept.shrink_to_fit();
+  g.ilabels.shrink_to_fit();
+  g.olabels.shrink_to_fit();
+  g.srcNodes.shrink_to_fit();
+  g.dstNodes.shrink_to_fit();
+  g.inArcOffset.shrink_to_fit();
+  g.outArcOffset.shrink_to_fit();
+  g.inArcs.shrink_to_fit();
+  g.outArcs.shrink_to_fit();
+  g.ilabels16.shrink_to_fit();
+  g.olabels16.shrink_to_fit();
+  g.startBits.shrink_to_fit();
+  g.acceptBits.shrink_to_fit();
+  if (sharedWeights_ != nullptr) {
+    sharedWeights_->shrink_to_fit();
+  }
+}
+
+Graph::MemoryUsage Graph::memoryUsage() const {
+  MemoryUsage usage;
+  std::unordered_set<const void*> seen;
+  auto bytes = [&seen](const auto& array) -> size_t {
+    if (array.data() == nullptr || !seen.insert(array.data()).second) {
+      return 0;
+    }
+    return array.capacity() * sizeof(*array.data());
+  };
+  // Visit the graph and the graphs saved by the autograd tape
+  std::vector<const Graph*> stack = {this};
+  std::unordered_set<const SharedGrad*> visited = {sharedGrad_.get()};
+  while (!stack.empty()) {
+    auto g = stack.back();
+    stack.pop_back();
+    MemoryUsage u;
+    auto& data = *g->sharedGraph_;
+    u.topology = bytes(data.startIds) + bytes(data.acceptIds) +
+        bytes(data.start) + bytes(data.accept) + bytes(data.ilabels) +
+        bytes(data.olabels) + bytes(data.srcNodes) + bytes(data.dstNodes) +
+        bytes(data.ilabels16) + bytes(data.olabels16) +
+        bytes(data.startBits) + bytes(data.acceptBits);
+    u.arcLists = bytes(data.inArcOffset) + bytes(data.outArcOffset) +
+        bytes(data.inArcs) + bytes(data.outArcs) + bytes(data.inArcCount) +
+        bytes(data.outArcCount) + bytes(data.inArcCapacity) +
+        bytes(data.outArcCapacity);
+    if (g->state().topoOrder != nullptr) {
+      u.arcLists += bytes(*g->state().topoOrder);
+    }
+    if (g->sharedWeights_ != nullptr) {
+      u.weights = bytes(*g->sharedWeights_);
+    }
+    if (g->sharedGrad_->grad != nullptr) {
+      u.grad = bytes(*g->sharedGrad_->grad->sharedWeights_);
+    }
+    if (g == this) {
+      usage = u;
+    } else {
+      usage.saved += u.total();
+    }
+    for (auto& input : g->sharedGrad_->inputs) {
+      if (visited.insert(input.sharedGrad_.get()).second) {
+        stack.push_back(&input);
+      }
+    }
+  }
+  return usage;
+}
+
+void Graph::ensureCompiled(bool pack /* = false */) const {
+  auto& s = state();
+  std::lock_guard<std::mutex> lock(s.compileLock);
+  if (!s.compiled || (pack && s.incremental)) {
+    compile(pack);
+  }
+  s.ready.store(true, std::memory_order_release);
+}
+
+void Graph::ensureSorted(const char* fn) const {
+  if (isCuda()) {
+    throw std::invalid_argument(
+        std::string("[Graph::") + fn + "] Can only sort CPU graphs");
+  }
+  auto& s = state();
+  if (s.sorted.load(std::memory_order_acquire)) {
+    return;
+  }
+  maybeCompile();
+  std::lock_guard<std::mutex> lock(s.compileLock);
+  if (s.sorted.load(std::memory_order_relaxed)) {
+    return;
+  }
+  // Kahn's algorithm, the order doubles as the queue of nodes whose
+  // incoming arcs have all been visited. Nodes on or after a cycle are
+  // never queued.
+  auto order = std::make_shared<std::vector<int>>();
+  order->reserve(numNodes());
+  std::vector<int> numInLeft(numNodes());
+  for (int n = 0; n < numNodes(); ++n) {
+    numInLeft[n] = numIn(n);
+    if (numInLeft[n] == 0) {
+      order->push_back(n);
+    }
+  }
+  for (size_t i = 0; i < order->size(); ++i) {
+    for (auto a : out((*order)[i])) {
+      auto dn = dstNode(a);
+      if (--numInLeft[dn] == 0) {
+        order->push_back(dn);
+      }
+    }
+  }
+  s.acyclic = order->size() == numNodes();
+  s.topoOrder = std::move(order);
+  s.sorted.store(true, std::memory_order_release);
+}
+
+const std::vector<int>& Graph::topologicalOrder() const {
+  ensureSorted("topologicalOrder");
+  auto& s = state();
+  if (!s.acyclic) {
+    throw std::invalid_argument(
+        "[Graph::topologicalOrder] Graph has a cycle");
+  }
+  return *s.topoOrder;
+}
+
+bool Graph::isAcyclic() const {
+  ensureSorted("isAcyclic");
+  return state().acyclic;
+}
+
+void Graph::freeze() {
+  if (isFrozen()) {
+    return;
+  }
+  if (!isCuda()) {
+    if (!olabelSorted()) {
+      arcSort();
+    }
+    ensureCompiled(true);
+    // So reading the topological order of a frozen graph never locks
+    ensureSorted("freeze");
+  }
+  sharedGraph_->frozen = true;
+}
+
+void Graph::setCompact(bool compact /* = true */) {
+  auto& g = *sharedGraph_;
+  if (g.compact == compact) {
+    return;
+  }
+  beginModify("setCompact");
+  if (isCuda()) {
+    throw std::invalid_argument(
+        "[Graph::setCompact] Only CPU graphs support the compact encoding");
+  }
+  auto numWords = (numNodes() + 63) / 64;
+  if (compact) {
+    auto toCompact = [numArcs = numArcs()](
+        const HDSpan<int>& labels, HDSpan<uint16_t>& labels16) {
+      for (int i = 0; i < numArcs; ++i) {
+        if (labels[i] > maxCompactLabel) {
+          throw std::invalid_argument(
+              "[Graph::setCompact] Label " + std::to_string(labels[i]) +
+              " is too large for the compact encoding.");
+        }
+      }
+      labels16.resize(numArcs);
+      for (int i = 0; i < numArcs; ++i) {
+        labels16[i] = static_cast<uint16_t>(labels[i] + 1);
+      }
+    };
+    toCompact(g.ilabels, g.ilabels16);
+    toCompact(g.olabels, g.olabels16);
+    auto toBits = [numNodes = numNodes(), numWords](
+        const HDSpan<bool>& flags, HDSpan<uint64_t>& bits) {
+      bits.resize(numWords);
+      std::fill(bits.begin(), bits.end(), 0);
+      for (size_t i = 0; i < numNodes; ++i) {
+        bits[i >> 6] |= static_cast<uint64_t>(flags[i]) << (i & 63);
+      }
+    };
+    toBits(g.start, g.startBits);
+    toBits(g.accept, g.acceptBits);
+    g.ilabels.clear();
+    g.olabels.clear();
+    g.start.clear();
+    g.accept.clear();
+  } else {
+    g.ilabels.resize(numArcs());
+    g.olabels.resize(numArcs());
+    for (int i = 0; i < numArcs(); ++i) {
+      g.ilabels[i] = static_cast<int>(g.ilabels16[i]) - 1;
+      g.olabels[i] = static_cast<int>(g.olabels16[i]) - 1;
+    }
+    g.start.resize(numNodes());
+    g.accept.resize(numNodes());
+    for (size_t i = 0; i < numNodes(); ++i) {
+      g.start[i] = (g.startBits[i >> 6] >> (i & 63)) & 1;
+      g.accept[i] = (g.acceptBits[i >> 6] >> (i & 63)) & 1;
+    }
+    g.ilabels16.clear();
+    g.olabels16.clear();
+    g.startBits.clear();
+    g.acceptBits.clear();
+  }
+  g.compact = compact;
+}
+
 void Graph::makeAccept(size_t i) {
+  beginModify("makeAccept");
+  setCompact(false);
+  sharedGraph_->linear = false;
   if (!sharedGraph_->accept[i]) {
     sharedGraph_->acceptIds.push_back(static_cast<int>(i));
     sharedGraph_->accept[i] = true;
   }
 };
 
-void Graph::compile() const {
-  sharedGraph_->compiled = true;
+void Graph::compile(bool pack /* = false */) const {
+  auto& g = *sharedGraph_;
+  g.compiled = true;
+
+  // Merge in the new arcs when they are few compared to the arcs already in
+  // the arc lists, otherwise rebuilding the lists is just as cheap.
+  auto numNewArcs = numArcs() - g.numCompiledArcs;
+  if (!pack && !isCuda() && g.numCompiledNodes > 0 &&
+      numNewArcs <= g.numCompiledArcs) {
+    if (!g.incremental && numNewArcs > 0) {
+      // Switch to arc lists with room to grow
+      auto toCounts = [numNodes = g.numCompiledNodes](
+          const HDSpan<int>& offsets,
+          HDSpan<int>& counts,
+          HDSpan<int>& capacities) {
+        counts.resize(numNodes);
+        capacities.resize(numNodes);
+        for (int i = 0; i < numNodes; ++i) {
+          counts[i] = offsets[i + 1] - offsets[i];
+          capacities[i] = counts[i];
+        }
+      };
+      toCounts(g.inArcOffset, g.inArcCount, g.inArcCapacity);
+      toCounts(g.outArcOffset, g.outArcCount, g.outArcCapacity);
+      g.incremental = true;
+    }
+
+    // New nodes start with no arcs
+    auto addNodes = [&g, numNodes = numNodes()](
+        HDSpan<int>& offsets, HDSpan<int>& counts, HDSpan<int>& capacities) {
+      auto end = offsets[g.numCompiledNodes];
+      offsets.resize(numNodes + 1);
+      std::fill(
+          offsets.begin() + g.numCompiledNodes + 1, offsets.end(), end);
+      if (g.incremental) {
+        counts.resize(numNodes);
+        capacities.resize(numNodes);
+        std::fill(counts.begin() + g.numCompiledNodes, counts.end(), 0);
+        std::fill(capacities.begin() + g.numCompiledNodes, capacities.end(), 0);
+      }
+    };
+    addNodes(g.inArcOffset, g.inArcCount, g.inArcCapacity);
+    addNodes(g.outArcOffset, g.outArcCount, g.outArcCapacity);
+
+    // Append each new arc to its node's list, moving the list to the end
+    // with double the room when it is full.
+    auto addArc = [](int n,
+                     int arc,
+                     HDSpan<int>& offsets,
+                     HDSpan<int>& counts,
+                     HDSpan<int>& capacities,
+                     HDSpan<int>& arcs) {
+      if (counts[n] == capacities[n]) {
+        auto capacity = std::max(capacities[n] << 1, 1);
+        auto start = static_cast<int>(arcs.size());
+        extend(arcs, capacity);
+        std::copy(
+            arcs.begin() + offsets[n],
+            arcs.begin() + offsets[n] + counts[n],
+            arcs.begin() + start);
+        offsets[n] = start;
+        capacities[n] = capacity;
+      }
+      arcs[offsets[n] + counts[n]++] = arc;
+    };
+    for (auto i = g.numCompiledArcs; i < numArcs(); ++i) {
+      addArc(
+          g.dstNodes[i],
+          i,
+          g.inArcOffset,
+          g.inArcCount,
+          g.inArcCapacity,
+          g.inArcs);
+      addArc(
+          g.srcNodes[i],
+          i,
+          g.outArcOffset,
+          g.outArcCount,
+          g.outArcCapacity,
+          g.outArcs);
+    }
+    g.numCompiledNodes = numNodes();
+    g.numCompiledArcs = numArcs();
+
+    // Repack once the unused room outgrows the arcs themselves, which keeps
+    // both the memory and the amortized cost of merging linear.
+    auto limit = 2 * numArcs() + numNodes();
+    if (g.inArcs.size() <= limit && g.outArcs.size() <= limit) {
+      return;
+    }
+  }
 
   auto computeArcsAndOffsets = [numNodes=numNodes(), numArcs=numArcs()](
       const detail::HDSpan<int>& arcNodes,
@@ -137,14 +740,15 @@ void Graph::compile() const {
     }
   };
 
-  computeArcsAndOffsets(
-      sharedGraph_->dstNodes,
-      sharedGraph_->inArcOffset,
-      sharedGraph_->inArcs);
-  computeArcsAndOffsets(
-      sharedGraph_->srcNodes,
-      sharedGraph_->outArcOffset,
-      sharedGraph_->outArcs);
+  computeArcsAndOffsets(g.dstNodes, g.inArcOffset, g.inArcs);
+  computeArcsAndOffsets(g.srcNodes, g.outArcOffset, g.outArcs);
+  g.inArcCount.clear();
+  g.outArcCount.clear();
+  g.inArcCapacity.clear();
+  g.outArcCapacity.clear();
+  g.incremental = false;
+  g.numCompiledNodes = numNodes();
+  g.numCompiledArcs = numArcs();
 }
 
 float Graph::item() const {
@@ -194,10 +798,7 @@ void Graph::addGrad(const std::vector<float>& other) {
       std::transform(
           other.begin(), other.end(), w, w, std::plus<>());
     } else {
-      sharedGrad_->grad = std::make_unique<Graph>(false);
-      sharedGrad_->grad->sharedGraph_ = sharedGraph_;
-      sharedGrad_->grad->sharedWeights_ = makeSharedWeights(device());
-      sharedGrad_->grad->setWeights(other.data());
+      initGrad(other.data());
     }
   }
 }
@@ -211,14 +812,24 @@ void Graph::addGrad(const float* other) {
           grad().getWeights(),
           grad().getWeights());
     } else {
-      sharedGrad_->grad = std::make_unique<Graph>(false);
-      sharedGrad_->grad->sharedGraph_ = sharedGraph_;
-      sharedGrad_->grad->sharedWeights_ = makeSharedWeights(device());
-      sharedGrad_->grad->setWeights(other);
+      initGrad(other);
     }
   }
 }
 
+void Graph::initGrad(const float* grad) {
+  sharedGrad_->grad = std::make_unique<Graph>(false);
+  auto& g = *sharedGrad_->grad;
+  g.sharedGraph_ = sharedGraph_;
+  if (sharedGrad_->gradBuffer != nullptr) {
+    g.bindWeights(sharedGrad_->gradBuffer, sharedGrad_->gradBufferOwner);
+    g.getWeights().copy(grad);
+  } else {
+    g.sharedWeights_ = makeSharedWeights(device());
+    g.setWeights(grad);
+  }
+}
+
 void Graph::addGrad(const Graph& other) {
   if (device() != other.device()) {
     throw std::invalid_argument("[Graph::addGrad] device mismach");
@@ -235,6 +846,7 @@ void Graph::setCalcGrad(bool calcGrad) {
     sharedGrad_->gradFunc = nullptr;
     sharedGrad_->inputs.clear();
     sharedGrad_->grad.reset();
+    setGradBuffer(nullptr);
   }
 }
 
@@ -246,6 +858,20 @@ void Graph::zeroGrad() {
   sharedGrad_->grad.reset();
 }
 
+void Graph::setGradBuffer(
+    float* grad,
+    std::shared_ptr<void> owner /* = nullptr */) {
+  if (grad != nullptr && !calcGrad()) {
+    throw std::logic_error(
+        "[Graph::setGradBuffer] Gradient calculation disabled.");
+  }
+  std::lock_guard<std::mutex> lock(sharedGrad_->grad_lock);
+  sharedGrad_->gradBuffer = grad;
+  sharedGrad_->gradBufferOwner = grad ? std::move(owner) : nullptr;
+  // The next gradient is written to the new buffer
+  sharedGrad_->grad.reset();
+}
+
 std::uintptr_t Graph::id() {
   return reinterpret_cast<std::uintptr_t>(sharedGrad_.get());
 }
@@ -255,14 +881,25 @@ Graph Graph::deepCopy(const Graph& src) {
 }
 
 Graph Graph::deepCopy(const Graph& src, Device device_) {
+  // The GPU does not support the compact encoding
+  auto& srcData = *src.sharedGraph_;
+  if (device_.isCuda() && srcData.compact) {
+    auto expanded = deepCopy(src, Device::CPU);
+    expanded.setCompact(false);
+    return deepCopy(expanded, device_);
+  }
+  // Only packed arc lists are copied, the GPU always needs them
   if (device_.isCuda()) {
+    src.ensureCompiled(true);
+  } else {
     src.maybeCompile();
   }
+  bool packed = srcData.compiled && !srcData.incremental;
   Graph out(src.calcGrad());
   out.sharedGraph_ = makeSharedGraph(device_);
   out.sharedGraph_->numNodes = src.numNodes();
   out.sharedGraph_->numArcs = src.numArcs();
-  out.sharedGraph_->compiled = src.sharedGraph_->compiled;
+  out.sharedGraph_->compiled = packed;
   out.sharedGraph_->startIds = src.sharedGraph_->startIds;
   out.sharedGraph_->acceptIds = src.sharedGraph_->acceptIds;
   out.sharedGraph_->start = src.sharedGraph_->start;
@@ -271,17 +908,48 @@ Graph Graph::deepCopy(const Graph& src, Device device_) {
   out.sharedGraph_->olabels = src.sharedGraph_->olabels;
   out.sharedGraph_->srcNodes = src.sharedGraph_->srcNodes;
   out.sharedGraph_->dstNodes = src.sharedGraph_->dstNodes;
-  out.sharedGraph_->inArcOffset = src.sharedGraph_->inArcOffset;
-  out.sharedGraph_->outArcOffset = src.sharedGraph_->outArcOffset;
-  out.sharedGraph_->inArcs = src.sharedGraph_->inArcs;
-  out.sharedGraph_->outArcs = src.sharedGraph_->outArcs;
+  if (packed) {
+    out.sharedGraph_->inArcOffset = src.sharedGraph_->inArcOffset;
+    out.sharedGraph_->outArcOffset = src.sharedGraph_->outArcOffset;
+    out.sharedGraph_->inArcs = src.sharedGraph_->inArcs;
+    out.sharedGraph_->outArcs = src.sharedGraph_->outArcs;
+    out.sharedGraph_->numCompiledNodes = srcData.numCompiledNodes;
+    out.sharedGraph_->numCompiledArcs = srcData.numCompiledArcs;
+  }
+  if (srcData.compact) {
+    out.sharedGraph_->compact = true;
+    out.sharedGraph_->ilabels16 = srcData.ilabels16;
+    out.sharedGraph_->olabels16 = srcData.olabels16;
+    out.sharedGraph_->startBits = srcData.startBits;
+    out.sharedGraph_->acceptBits = srcData.acceptBits;
+  }
   out.sharedGraph_->ilabelSorted = src.ilabelSorted();
   out.sharedGraph_->olabelSorted = src.olabelSorted();
+  out.sharedGraph_->linear = src.isLinear();
   out.sharedWeights_ = makeSharedWeights(device_);
   *(out.sharedWeights_) = *(src.sharedWeights_);
   return out;
 }
 
+Graph Graph::lazyCopy(const Graph& src) {
+  src.ensureCompiled(true);
+  auto shared = src.shareData();
+  Graph out(src.calcGrad());
+  auto data = new SharedGraphState{src.getData()};
+  data->shared = std::move(shared);
+  data->frozen = false;
+  auto& srcState = src.state();
+  if (srcState.sorted.load(std::memory_order_acquire)) {
+    data->acyclic = srcState.acyclic;
+    data->topoOrder = srcState.topoOrder;
+    data->sorted.store(true, std::memory_order_relaxed);
+  }
+  out.sharedGraph_ = makeSharedGraph(data);
+  out.sharedWeights_ = makeSharedWeights(src.device());
+  *(out.sharedWeights_) = *(src.sharedWeights_);
+  return out;
+}
+
 void Graph::arcSort(bool olabel /* = false */) {
   if (isCuda()) {
     throw std::invalid_argument("[Graph::arcSort] Can only sort CPU graphs");
@@ -290,40 +958,68 @@ void Graph::arcSort(bool olabel /* = false */) {
       (!olabel && sharedGraph_->ilabelSorted)) {
     return;
   }
+  beginModify("arcSort");
   maybeCompile();
   sharedGraph_->olabelSorted = olabel;
   sharedGraph_->ilabelSorted = !olabel;
-  auto& labels = olabel ? sharedGraph_->olabels : sharedGraph_->ilabels;
-  auto sortFn = [&labels](int a, int b) {
-    return labels[a] < labels[b];
+  auto label = [this, olabel](int a) {
+    return olabel ? this->olabel(a) : ilabel(a);
+  };
+  auto sortFn = [&label](int a, int b) {
+    return label(a) < label(b);
   };
   for (int i = 0; i < numNodes(); ++i) {
-    auto start = sharedGraph_->inArcOffset[i];
-    auto end = sharedGraph_->inArcOffset[i + 1];
-    std::sort(
-        sharedGraph_->inArcs.begin() + start,
-        sharedGraph_->inArcs.begin() + end,
-        sortFn);
-    start = sharedGraph_->outArcOffset[i];
-    end = sharedGraph_->outArcOffset[i + 1];
-    std::sort(
-        sharedGraph_->outArcs.begin() + start,
-        sharedGraph_->outArcs.begin() + end,
-        sortFn);
+    auto arcs = in(i);
+    std::sort(arcs.ptr_, arcs.ptr_ + arcs.n_, sortFn);
+    arcs = out(i);
+    std::sort(arcs.ptr_, arcs.ptr_ + arcs.n_, sortFn);
   }
+  // Arcs added later go after the sorted ones, so make sure the next
+  // compile restores the usual order by rebuilding the arc lists.
+  sharedGraph_->numCompiledNodes = 0;
 }
 
 void Graph::setWeights(const float* weights) {
+  ownWeights();
   sharedWeights_->resize(numArcs());
   sharedWeights_->copy(weights);
 }
 
+void Graph::bindWeights(
+    float* weights,
+    std::shared_ptr<void> owner /* = nullptr */) {
+  if (weights == nullptr && numArcs() > 0) {
+    throw std::invalid_argument("[Graph::bindWeights] Weights must be non-null");
+  }
+  sharedWeights_ = std::shared_ptr<detail::HDSpan<float>>(
+      new detail::HDSpan<float>(numArcs(), weights, device()),
+      BoundWeightsDeleter{std::move(owner), weights});
+}
+
+void Graph::ownWeights() {
+  auto deleter = std::get_deleter<BoundWeightsDeleter>(sharedWeights_);
+  if (deleter == nullptr || sharedWeights_->data() != deleter->data) {
+    return;
+  }
+  // Swap in a copy of the weights and release the external array.
+  HDSpan<float> weights(device());
+  weights = *sharedWeights_;
+  swap(weights, *sharedWeights_);
+  deleter->owner = nullptr;
+}
+
 std::vector<int> Graph::labelsToVector(bool ilabel) {
   if (isCuda()) {
     throw std::invalid_argument(
       "[Graph::labelsToVector] Labels can only be retrieved on CPU graphs");
   }
   std::vector<int> out(numArcs());
+  if (sharedGraph_->compact) {
+    for (int i = 0; i < numArcs(); ++i) {
+      out[i] = ilabel ? this->ilabel(i) : olabel(i);
+    }
+    return out;
+  }
   auto labels = ilabel ?
     sharedGraph_->ilabels.data() : sharedGraph_->olabels.data();
   std::copy(labels, labels + numArcs(), out.begin());
@@ -7,6 +7,7 @@
 
 #pragma once
 
+#include <atomic>
 #include <cassert>
 #include <climits>
 #include <cstdint>
@@ -22,6 +23,9 @@ namespace gtn {
 /** The index of the epsilon label. */
 constexpr int epsilon{-1};
 
+/** The largest label supported by the compact graph encoding. */
+constexpr int maxCompactLabel{UINT16_MAX - 1};
+
 /**
  * A `Graph` class to perform automatic differentiation with weighted
  * finite-state acceptors (WFSAs) and transducers (WFSTs).
@@ -104,20 +108,64 @@ class Graph {
     bool ilabelSorted{false};
     bool olabelSorted{false};
     bool compiled{device.isCuda()};
+    bool frozen{false};
+    // Set by `gtn::linearGraph`, see `Graph::isLinear`
+    bool linear{false};
+
+    // Incremental arc lists (CPU only). The arc lists of the first
+    // `numCompiledNodes` nodes are up to date for the first `numCompiledArcs`
+    // arcs, so only the remaining arcs need to be merged in when compiling.
+    // When `incremental` is set the arcs of the i-th node are in
+    // [offset[i], offset[i] + count[i]) with room for capacity[i] arcs,
+    // otherwise the arc lists are packed as described above.
+    size_t numCompiledNodes{0};
+    size_t numCompiledArcs{0};
+    bool incremental{false};
+    detail::HDSpan<int> inArcCount{device};
+    detail::HDSpan<int> outArcCount{device};
+    detail::HDSpan<int> inArcCapacity{device};
+    detail::HDSpan<int> outArcCapacity{device};
+
+    // Compact encoding (CPU only, see `Graph::setCompact`). When `compact` is
+    // set the labels are stored offset by one in `ilabels16` and `olabels16`
+    // and the start and accept flags in the bitsets `startBits` and
+    // `acceptBits`. The `ilabels`, `olabels`, `start` and `accept` arrays are
+    // then empty.
+    bool compact{false};
+    detail::HDSpan<uint16_t> ilabels16{device};
+    detail::HDSpan<uint16_t> olabels16{device};
+    detail::HDSpan<uint64_t> startBits{device};
+    detail::HDSpan<uint64_t> acceptBits{device};
+
+    // Calls `fn` on each array of `a` along with the same array of `b`
+    template <typename Fn>
+    static void forEachArray(SharedGraph& a, const SharedGraph& b, Fn fn) {
+      fn(a.startIds, b.startIds);
+      fn(a.acceptIds, b.acceptIds);
+      fn(a.start, b.start);
+      fn(a.accept, b.accept);
+      fn(a.ilabels, b.ilabels);
+      fn(a.olabels, b.olabels);
+      fn(a.srcNodes, b.srcNodes);
+      fn(a.dstNodes, b.dstNodes);
+      fn(a.inArcOffset, b.inArcOffset);
+      fn(a.outArcOffset, b.outArcOffset);
+      fn(a.inArcs, b.inArcs);
+      fn(a.outArcs, b.outArcs);
+      fn(a.inArcCount, b.inArcCount);
+      fn(a.outArcCount, b.outArcCount);
+      fn(a.inArcCapacity, b.inArcCapacity);
+      fn(a.outArcCapacity, b.outArcCapacity);
+      fn(a.ilabels16, b.ilabels16);
+      fn(a.olabels16, b.olabels16);
+      fn(a.startBits, b.startBits);
+      fn(a.acceptBits, b.acceptBits);
+    }
 
     void free() {
-      startIds.clear();
-      acceptIds.clear();
-      start.clear();
-      accept.clear();
-      ilabels.clear();
-      olabels.clear();
-      srcNodes.clear();
-      dstNodes.clear();
-      inArcOffset.clear();
-      outArcOffset.clear();
-      inArcs.clear();
-      outArcs.clear();
+      forEachArray(*this, *this, [](auto& array, const auto&) {
+        array.clear();
+      });
     };
   };
 
@@ -170,6 +218,131 @@ class Graph {
       int olabel,
       float weight = 0.0);
 
+  /**
+   * Adds `n` nodes to the graph.
+   * @param n The number of nodes to add.
+   * @param start An array of `n` values indicating if each node is a starting
+   *   node. If `nullptr` none of the nodes are starting nodes.
+   * @param accept An array of `n` values indicating if each node is an
+   *   accepting node. If `nullptr` none of the nodes are accepting nodes.
+   * @return The id of the first added node. The added nodes have consecutive
+   *   ids.
+   */
+  int addNodes(
+      size_t n, const bool* start = nullptr, const bool* accept = nullptr);
+
+  /**
+   * Add `n` arcs to the graph.
+   * @param n The number of arcs to add.
+   * @param srcNodes The ids of the source nodes.
+   * @param dstNodes The ids of the destination nodes.
+   * @param ilabels The arc input labels.
+   * @param olabels The arc output labels. If `nullptr` the output labels are
+   *   the same as the input labels.
+   * @param weights The arc weights. If `nullptr` the weights are set to `0`.
+   * @return The id of the first added arc. The added arcs have consecutive
+   *   ids.
+   */
+  size_t addArcs(
+      size_t n,
+      const int* srcNodes,
+      const int* dstNodes,
+      const int* ilabels,
+      const int* olabels = nullptr,
+      const float* weights = nullptr);
+
+  /**
+   * Construct a graph from flat arrays of nodes and arcs in a single pass.
+   * This is much faster than repeated calls to `Graph::addNode` and
+   * `Graph::addArc` for large graphs since the underlying storage is
+   * allocated once and the arc lists for each node are built directly.
+   *
+   * @param numNodes The number of nodes in the graph.
+   * @param numStart The number of start nodes.
+   * @param startIds The ids of the start nodes.
+   * @param numAccept The number of accept nodes.
+   * @param acceptIds The ids of the accept nodes.
+   * @param numArcs The number of arcs in the graph.
+   * @param srcNodes The source node of each arc.
+   * @param dstNodes The destination node of each arc.
+   * @param ilabels The input label of each arc.
+   * @param olabels The output label of each arc. If `nullptr` the graph is
+   *   an acceptor and the output labels are the same as the input labels.
+   * @param weights The weight of each arc. If `nullptr` the arc weights are
+   *   set to `0`.
+   * @param calcGrad Whether or not to compute gradients with respect to the
+   *   graph.
+   */
+  static Graph fromArrays(
+      size_t numNodes,
+      size_t numStart,
+      const int* startIds,
+      size_t numAccept,
+      const int* acceptIds,
+      size_t numArcs,
+      const int* srcNodes,
+      const int* dstNodes,
+      const int* ilabels,
+      const int* olabels = nullptr,
+      const float* weights = nullptr,
+      bool calcGrad = true);
+
+  /**
+   * Construct a graph from `std::vector`s of nodes and arcs. If `olabels` is
+   * empty the graph is an acceptor and if `weights` is empty the arc weights
+   * are set to `0`. See `Graph::fromArrays` above.
+   */
+  static Graph fromArrays(
+      size_t numNodes,
+      const std::vector<int>& startIds,
+      const std::vector<int>& acceptIds,
+      const std::vector<int>& srcNodes,
+      const std::vector<int>& dstNodes,
+      const std::vector<int>& ilabels,
+      const std::vector<int>& olabels = {},
+      const std::vector<float>& weights = {},
+      bool calcGrad = true);
+
+  /**
+   * Preallocate storage for a graph with up to `numNodes` nodes and
+   * `numArcs` arcs. Adding nodes and arcs up to these totals does not
+   * reallocate the underlying arrays. The graph is not otherwise changed.
+   */
+  void reserve(size_t numNodes, size_t numArcs);
+
+  /**
+   * Release any unused capacity in the underlying storage of the graph. This
+   * is useful for large graphs which are built once and kept around. The arc
+   * lists of each node are also compiled.
+   */
+  void shrinkToFit();
+
+  /** A breakdown of the memory held by a graph in bytes. */
+  struct MemoryUsage {
+    /// Nodes, start and accept states, arc endpoints and labels
+    size_t topology{0};
+    /// The compiled arc lists of each node and the topological order
+    size_t arcLists{0};
+    /// Arc weights
+    size_t weights{0};
+    /// Gradient weights
+    size_t grad{0};
+    /// Graphs kept by the autograd tape to compute gradients
+    size_t saved{0};
+
+    size_t total() const {
+      return topology + arcLists + weights + grad + saved;
+    }
+  };
+
+  /**
+   * Get the memory held by the graph. Arrays shared with other graphs (e.g.
+   * copies made with `Graph::lazyCopy` or the inputs of an operation) are
+   * included but only counted once. Memory captured by gradient functions
+   * other than their input graphs is not included.
+   */
+  MemoryUsage memoryUsage() const;
+
   /** The number of arcs in the graph. */
   size_t numArcs() const {
     return sharedGraph_->numArcs;
@@ -207,6 +380,14 @@ class Graph {
    */
   static Graph deepCopy(const Graph& src, Device device);
 
+  /**
+   * A copy of a graph `src` which is not recorded in the autograd tape. The
+   * copy shares the nodes, arcs and labels of `src` until either graph is
+   * modified, so this is much cheaper than `Graph::deepCopy` for large
+   * graphs. The weights are always copied.
+   */
+  static Graph lazyCopy(const Graph& src);
+
   /**
    * Sort the arcs entering and exiting a node in increasing order by arc in
    * label or out label if `olabel == true`. This function is intended
@@ -215,6 +396,50 @@ class Graph {
    */
   void arcSort(bool olabel = false);
 
+  /**
+   * Freeze the graph. A frozen graph is compiled, sorted by input label (if
+   * not already sorted by output label) and can no longer be modified.
+   * Methods which change the nodes, arcs or labels of a frozen graph throw.
+   * The arc weights can still be set. Frozen graphs are intended to be
+   * shared between threads, reading them never takes a lock. Copies of a
+   * frozen graph made with `Graph::deepCopy` are not frozen.
+   */
+  void freeze();
+
+  /** Check if the graph is frozen. */
+  bool isFrozen() const {
+    return sharedGraph_->frozen;
+  }
+
+  /**
+   * Check if the graph is marked as a linear graph made by
+   * `gtn::linearGraph`, i.e. a chain of nodes with the same number of arcs
+   * between each pair of consecutive nodes, stored in order. The labels may
+   * differ. Functions such as `gtn::forwardScore` use a faster dense
+   * implementation for these graphs. The mark is removed once the nodes or
+   * arcs of the graph are modified.
+   */
+  bool isLinear() const {
+    return sharedGraph_->linear;
+  }
+
+  /**
+   * Switch the graph to or from a compact encoding. The compact encoding
+   * stores the arc labels in 16 bits and the start and accept flags of the
+   * nodes as bitsets, which reduces the memory used by large graphs and the
+   * memory traffic when traversing them. All of the accessors work as usual.
+   *
+   * The compact encoding is only supported for CPU graphs with labels no larger
+   * than `gtn::maxCompactLabel`. The graph is switched back to the regular
+   * encoding if it is modified.
+   */
+  void setCompact(bool compact = true);
+
+  /** Check if the graph uses the compact encoding. */
+  bool isCompact() const {
+    return sharedGraph_->compact;
+  }
+
   /**
    * Mark a graph's arcs as sorted.
    * If `olabel == false` then the graph will be marked as sorted by
@@ -245,6 +470,20 @@ class Graph {
     return sharedGraph_->olabelSorted;
   }
 
+  /**
+   * Get the nodes of the graph in topological order, so that every arc goes
+   * from a node to one later in the order. The order is computed once and
+   * kept along with the compiled arc lists until the graph is modified.
+   * Throws if the graph has a cycle or is not a CPU graph.
+   */
+  const std::vector<int>& topologicalOrder() const;
+
+  /**
+   * Check if the graph has no cycles, including self-loops. This computes
+   * and caches the topological order, see `Graph::topologicalOrder`.
+   */
+  bool isAcyclic() const;
+
   const detail::HDSpan<float>& getWeights() const {
     return *sharedWeights_;
   }
@@ -275,6 +514,19 @@ class Graph {
    */
   void setWeights(const float* weights);
 
+  /**
+   * Use an external array as the arc weights of the graph without copying
+   * it. The `weights` array must have `Graph::numArcs()` elements and be on
+   * the same device as the graph. Changes to the array are visible in the
+   * graph and vice versa, until the graph makes its own copy of the weights
+   * (e.g. when arcs are added or `Graph::setWeights` is called).
+   *
+   * @param weights The array of weights to use.
+   * @param owner An optional handle which is kept alive for as long as the
+   * graph uses `weights`.
+   */
+  void bindWeights(float* weights, std::shared_ptr<void> owner = nullptr);
+
   /**
    * Extract a `std::vector` of labels from the graph.
    *
@@ -382,6 +634,20 @@ class Graph {
   /** Clear the graph's gradients. */
   void zeroGrad();
 
+  /**
+   * Store the gradient of the graph in an external array instead of
+   * allocating it. The first gradient computed after the buffer is set (or
+   * after `Graph::zeroGrad`) is written to the buffer and subsequent
+   * gradients are accumulated into it in place. The gradient graph returned
+   * by `Graph::grad` uses the buffer as its weights.
+   *
+   * @param grad An array with `Graph::numArcs()` elements on the same device
+   * as the graph. Pass `nullptr` to stop using the buffer.
+   * @param owner An optional handle which is kept alive for as long as the
+   * graph uses `grad`.
+   */
+  void setGradBuffer(float* grad, std::shared_ptr<void> owner = nullptr);
+
   /**
    * A unique identifier for a graph. Intended for use by the autograd.
    */
@@ -445,10 +711,16 @@ class Graph {
   };
   /** Check if the `i`-th node is a start node. */
   bool isStart(size_t i) const {
+    if (sharedGraph_->compact) {
+      return (sharedGraph_->startBits[i >> 6] >> (i & 63)) & 1;
+    }
     return sharedGraph_->start[i];
   };
   /** Check if the `i`-th node is an accepting node. */
   bool isAccept(size_t i) const {
+    if (sharedGraph_->compact) {
+      return (sharedGraph_->acceptBits[i >> 6] >> (i & 63)) & 1;
+    }
     return sharedGraph_->accept[i];
   };
   /** Make the the `i`-th node an accepting node. */
@@ -456,37 +728,27 @@ class Graph {
 
   /** The number of outgoing arcs from the `i`-th node. */
   size_t numOut(size_t i) const {
-    maybeCompile();
-    return sharedGraph_->outArcOffset[i+1] - sharedGraph_->outArcOffset[i];
+    return out(i).size();
   }
   /** Get the indices of outgoing arcs from the `i`-th node. */
   ArcPtr out(size_t i) const {
-    maybeCompile();
-    auto start = sharedGraph_->outArcOffset[i];
-    auto end = sharedGraph_->outArcOffset[i + 1];
-    return ArcPtr{sharedGraph_->outArcs.begin() + start, end - start};
+    return arcs(i, false);
   }
   /** Get the index of the `j`-th outgoing arc from the `i`-th node. */
   int out(size_t i, size_t j) const {
-    maybeCompile();
-    return sharedGraph_->outArcs[sharedGraph_->outArcOffset[i] + j];
+    return out(i)[j];
   }
   /** The number of incoming arcs to the `i`-th node. */
   size_t numIn(size_t i) const {
-    maybeCompile();
-    return sharedGraph_->inArcOffset[i+1] - sharedGraph_->inArcOffset[i];
+    return in(i).size();
   }
   /** Get the indices of incoming arcs to the `i`-th node. */
   ArcPtr in(size_t i) const {
-    maybeCompile();
-    auto start = sharedGraph_->inArcOffset[i];
-    auto end = sharedGraph_->inArcOffset[i + 1];
-    return ArcPtr{sharedGraph_->inArcs.begin() + start, end - start};
+    return arcs(i, true);
   }
   /** Get the index of the `j`-th incoming arc to the `i`-th node. */
   size_t in(size_t i, size_t j) const {
-    maybeCompile();
-    return sharedGraph_->inArcs[sharedGraph_->inArcOffset[i] + j];
+    return in(i)[j];
   }
 
   /** @}*/
@@ -505,14 +767,20 @@ class Graph {
   }
   /** The label of the `i`-th arc (use this for acceptors). */
   int label(size_t i) const {
-    return sharedGraph_->ilabels[i];
+    return ilabel(i);
   }
   /** The input label of the `i`-th arc. */
   int ilabel(size_t i) const {
+    if (sharedGraph_->compact) {
+      return static_cast<int>(sharedGraph_->ilabels16[i]) - 1;
+    }
     return sharedGraph_->ilabels[i];
   }
   /** The output label of the `i`-th arc. */
   int olabel(size_t i) const {
+    if (sharedGraph_->compact) {
+      return static_cast<int>(sharedGraph_->olabels16[i]) - 1;
+    }
     return sharedGraph_->olabels[i];
   }
 
@@ -533,22 +801,91 @@ class Graph {
   size_t addArc(size_t srcNode, size_t dstNode, int label, float) = delete;
   size_t addArc(size_t srcNode, size_t dstNode, int label, double) = delete;
 
-  // Semantically const
-  void compile() const;
+  // Host-only state shared along with the graph data. This is kept out of
+  // `SharedGraph` since that is passed by value to CUDA kernels.
+  struct SharedGraphState : SharedGraph {
+    explicit SharedGraphState(Device device) : SharedGraph(device) {}
+    // Shares the arrays of `data`
+    explicit SharedGraphState(const SharedGraph& data) : SharedGraph(data) {}
+    // Set once the arc lists are up to date and safe to read concurrently
+    std::atomic<bool> ready{false};
+    std::mutex compileLock;
+    // Set once `topoOrder` and `acyclic` are up to date, they are cleared
+    // along with the arc lists. The order is shared with lazy copies.
+    std::atomic<bool> sorted{false};
+    bool acyclic{false};
+    std::shared_ptr<const std::vector<int>> topoOrder;
+    // Arrays shared with other graphs. Any array with the same data as the
+    // matching array of `shared` is owned by `shared` and is copied before
+    // the graph is modified.
+    std::shared_ptr<SharedGraph> shared;
+  };
+
+  static std::shared_ptr<SharedGraph> makeSharedGraph(
+      Device device = Device::CPU);
+  static std::shared_ptr<SharedGraph> makeSharedGraph(SharedGraphState* data);
+
+  // Semantically const. Returns an object which owns the arrays of the
+  // graph so they can be shared with other graphs.
+  std::shared_ptr<SharedGraph> shareData() const;
+
+  SharedGraphState& state() const {
+    return static_cast<SharedGraphState&>(*sharedGraph_);
+  }
+
+  // Semantically const. Brings the arc lists up to date, merging in only
+  // the arcs and nodes added since the last compile when possible. If
+  // `pack` is true the arc lists are always rebuilt in packed form. Not
+  // thread-safe, see `Graph::ensureCompiled`.
+  void compile(bool pack = false) const;
+
+  // Semantically const. A thread-safe `Graph::compile` which only compiles
+  // the graph if needed.
+  void ensureCompiled(bool pack = false) const;
 
   // Semantically const
   void maybeCompile() const {
-    if (!sharedGraph_->compiled) {
-      compile();
+    if (!state().ready.load(std::memory_order_acquire)) {
+      ensureCompiled();
     }
   }
 
+  // Mark the arc lists as out of date, they are updated on the next access.
   void uncompile() {
-    sharedGraph_->inArcs.clear();
-    sharedGraph_->outArcs.clear();
-    sharedGraph_->inArcOffset.clear();
-    sharedGraph_->outArcOffset.clear();
-    sharedGraph_->compiled = false;
+    auto& s = state();
+    s.ready.store(false, std::memory_order_relaxed);
+    s.compiled = false;
+    s.linear = false;
+    if (s.sorted.load(std::memory_order_relaxed)) {
+      s.sorted.store(false, std::memory_order_relaxed);
+      s.topoOrder = nullptr;
+    }
+  }
+
+  // Semantically const. Computes the topological order of the graph if
+  // needed. Thread-safe.
+  void ensureSorted(const char* fn) const;
+
+  // Call before modifying the graph. Throws if the graph is frozen and
+  // copies any arrays shared with other graphs.
+  void beginModify(const char* fn);
+
+  // Create the gradient graph with the weights `grad`. Expects the
+  // `grad_lock` to be held.
+  void initGrad(const float* grad);
+
+  // Copy the weights into storage owned by the graph if they are bound to
+  // an external array, see `Graph::bindWeights`.
+  void ownWeights();
+
+  ArcPtr arcs(size_t i, bool in) const {
+    maybeCompile();
+    auto& g = *sharedGraph_;
+    auto& offsets = in ? g.inArcOffset : g.outArcOffset;
+    auto start = offsets[i];
+    int n = g.incremental ? (in ? g.inArcCount : g.outArcCount)[i]
+                          : offsets[i + 1] - start;
+    return ArcPtr{(in ? g.inArcs : g.outArcs).begin() + start, n};
   }
 
   struct SharedGrad {
@@ -556,16 +893,14 @@ class Graph {
     GradFunc gradFunc{nullptr};
     std::vector<Graph> inputs;
     std::unique_ptr<Graph> grad{nullptr};
+    // Optional storage for the gradient weights, see `Graph::setGradBuffer`
+    float* gradBuffer{nullptr};
+    std::shared_ptr<void> gradBufferOwner{nullptr};
     bool calcGrad;
     std::mutex grad_lock;
   };
 
-  std::shared_ptr<SharedGraph> sharedGraph_{
-    new SharedGraph{},
-    [](SharedGraph* g) {
-      g->free();
-      delete g;}
-  };
+  std::shared_ptr<SharedGraph> sharedGraph_{makeSharedGraph()};
   std::shared_ptr<detail::HDSpan<float>> sharedWeights_{
     new detail::HDSpan<float>{},
     [](detail::HDSpan<float>* w) {
@@ -14,6 +14,7 @@
 #include "gtn/device.h"
 #include "gtn/functions.h"
 #include "gtn/graph.h"
+#include "gtn/memory.h"
 #include "gtn/parallel.h"
 #include "gtn/rand.h"
 #include "gtn/utils.h"
@@ -3,6 +3,7 @@
 #include <algorithm>
 
 #include "device.h"
+#include "memory.h"
 #include "gtn/cuda/cuda.h"
 
 #if defined(_CUDA_)
@@ -57,8 +58,12 @@ class HDSpan {
     if (isCuda()) {
       data = static_cast<T*>(
           gtn::cuda::detail::allocate(sizeof(T) * capacity_, device_.index));
+      gtn::memory::detail::trackDevice(sizeof(T) * capacity_);
     } else {
-      data = new T[capacity_];
+      // The pool may round up the allocation, so use the extra space.
+      size_t bytes = sizeof(T) * capacity_;
+      data = static_cast<T*>(gtn::memory::detail::allocate(bytes));
+      capacity_ = bytes / sizeof(T);
     }
     gtn::cuda::detail::copy(
       static_cast<void*>(data),
@@ -67,15 +72,21 @@ class HDSpan {
     return data;
   };
 
-  void free() {
-    if (data() == nullptr) {
+  void freeData(T* data, size_t capacity) {
+    if (data == nullptr) {
       return;
     }
     if (isCuda()) {
-      gtn::cuda::detail::free(data());
+      gtn::cuda::detail::free(data);
+      gtn::memory::detail::trackDevice(
+          -static_cast<std::ptrdiff_t>(sizeof(T) * capacity));
     } else {
-      delete[] data();
+      gtn::memory::detail::free(data, sizeof(T) * capacity);
     }
+  }
+
+  void free() {
+    freeData(data_, capacity_);
     data_ = nullptr;
   }
 
@@ -135,11 +146,12 @@ class HDSpan {
     if (this->data_ == other.data_) {
       return *this;
     }
+    auto oldData = data_;
+    auto oldCapacity = capacity_;
     size_ = other.size();
     capacity_ = size_;
-    auto newData = allocAndCopy(other.data());
-    free();
-    data_ = newData;
+    data_ = allocAndCopy(other.data());
+    freeData(oldData, oldCapacity);
     return *this;
   };
 
@@ -147,9 +159,9 @@ class HDSpan {
     if (this->data_ == other.data_) {
       return *this;
     }
+    free();
     size_ = other.size();
     capacity_ = other.capacity();
-    free();
     data_ = other.data();
     device_ = other.device();
     other.size_ = 0;
@@ -177,21 +189,34 @@ class HDSpan {
       size_ = size;
       return;
     }
+    auto oldData = data_;
+    auto oldCapacity = capacity_;
     capacity_ = size;
-    auto newData = allocAndCopy(data_);
+    data_ = allocAndCopy(oldData);
     size_ = size;
-    free();
-    data_ = newData;
+    freeData(oldData, oldCapacity);
   };
 
   void reserve(size_t size) {
     if (size <= capacity_) {
       return;
     }
+    auto oldData = data_;
+    auto oldCapacity = capacity_;
     capacity_ = size;
-    auto newData = allocAndCopy(data_);
-    free();
-    data_ = newData;
+    data_ = allocAndCopy(oldData);
+    freeData(oldData, oldCapacity);
+  };
+
+  void shrink_to_fit() {
+    if (size_ == capacity_) {
+      return;
+    }
+    auto oldData = data_;
+    auto oldCapacity = capacity_;
+    capacity_ = size_;
+    data_ = size_ ? allocAndCopy(oldData) : nullptr;
+    freeData(oldData, oldCapacity);
   };
 
   void push_back(T val) {
@@ -0,0 +1,238 @@
+/*
+ * Copyright (c) Facebook, Inc. and its affiliates.
+ *
+ * This source code is licensed under the MIT license found in the
+ * LICENSE file in the root directory of this source tree.
+ */
+
+#include <algorithm>
+#include <atomic>
+#include <cstdint>
+#include <mutex>
+#include <new>
+#include <vector>
+
+#include "memory.h"
+
+namespace gtn {
+namespace memory {
+
+namespace {
+
+// Size classes are powers of two from 2^kMinClass to 2^kMaxClass bytes.
+// Larger allocations are not pooled.
+constexpr size_t kMinClass = 6;
+constexpr size_t kMaxClass = 26;
+constexpr size_t kNumClasses = kMaxClass - kMinClass + 1;
+
+class Counter {
+ public:
+  void add(std::ptrdiff_t bytes) {
+    auto live = live_ += bytes;
+    auto peak = peak_.load();
+    while (live > peak && !peak_.compare_exchange_weak(peak, live)) {
+    }
+  }
+
+  size_t live() const {
+    // Memory allocated before the state was shared may be freed after, so
+    // the count can be off by that much.
+    return std::max<int64_t>(live_, 0);
+  }
+
+  size_t peak() const {
+    return std::max<int64_t>(peak_, 0);
+  }
+
+  void resetPeak() {
+    peak_ = live_.load();
+  }
+
+ private:
+  std::atomic<int64_t> live_{0};
+  std::atomic<int64_t> peak_{0};
+};
+
+class Pool {
+ public:
+  void* allocate(size_t& bytes) {
+    if (!enabled || bytes > (size_t(1) << kMaxClass)) {
+      return ::operator new(bytes);
+    }
+    auto c = sizeClass(bytes);
+    bytes = size_t(1) << (c + kMinClass);
+    {
+      std::lock_guard<std::mutex> lock(classes[c].mutex);
+      auto& blocks = classes[c].blocks;
+      if (!blocks.empty()) {
+        auto ptr = blocks.back();
+        blocks.pop_back();
+        cached -= bytes;
+        return ptr;
+      }
+    }
+    return ::operator new(bytes);
+  }
+
+  void free(void* ptr, size_t bytes) {
+    // Only blocks whose size is exactly a size class can be reused,
+    // regardless of whether they were allocated from the pool.
+    if (enabled && bytes >= (size_t(1) << kMinClass) &&
+        bytes <= (size_t(1) << kMaxClass) && (bytes & (bytes - 1)) == 0 &&
+        reserve(bytes)) {
+      auto c = sizeClass(bytes);
+      std::lock_guard<std::mutex> lock(classes[c].mutex);
+      classes[c].blocks.push_back(ptr);
+      return;
+    }
+    ::operator delete(ptr);
+  }
+
+  void trim(size_t target = 0) {
+    for (auto c = kNumClasses; c > 0 && cached > target; --c) {
+      std::lock_guard<std::mutex> lock(classes[c - 1].mutex);
+      auto& blocks = classes[c - 1].blocks;
+      auto bytes = size_t(1) << (c - 1 + kMinClass);
+      while (!blocks.empty() && cached > target) {
+        ::operator delete(blocks.back());
+        blocks.pop_back();
+        cached -= bytes;
+      }
+      if (blocks.empty()) {
+        // Release the free list itself
+        std::vector<void*>().swap(blocks);
+      }
+    }
+  }
+
+  std::atomic<bool> enabled{false};
+  std::atomic<size_t> limit{size_t(1) << 30};
+  std::atomic<size_t> cached{0};
+
+ private:
+  // Add the bytes to the cache if they fit in the limit, so concurrent frees
+  // can not exceed it together
+  bool reserve(size_t bytes) {
+    auto current = cached.load();
+    do {
+      if (current + bytes > limit) {
+        return false;
+      }
+    } while (!cached.compare_exchange_weak(current, current + bytes));
+    return true;
+  }
+
+  static size_t sizeClass(size_t bytes) {
+    size_t c = 0;
+    while ((size_t(1) << (c + kMinClass)) < bytes) {
+      ++c;
+    }
+    return c;
+  }
+
+  struct SizeClass {
+    std::mutex mutex;
+    std::vector<void*> blocks;
+  };
+  SizeClass classes[kNumClasses];
+};
+
+struct State {
+  Pool pool;
+  Counter host;
+  Counter device;
+};
+
+std::atomic<State*>& statePtr() {
+  // Never destroyed so arrays freed during static destruction are safe
+  static std::atomic<State*> state{new State()};
+  return state;
+}
+
+State& state() {
+  return *statePtr().load(std::memory_order_acquire);
+}
+
+} // namespace
+
+void setPoolEnabled(bool enabled) {
+  auto& pool = state().pool;
+  pool.enabled = enabled;
+  if (!enabled) {
+    pool.trim();
+  }
+}
+
+bool isPoolEnabled() {
+  return state().pool.enabled;
+}
+
+void setPoolLimit(size_t bytes) {
+  auto& pool = state().pool;
+  pool.limit = bytes;
+  pool.trim(bytes);
+}
+
+size_t poolLimit() {
+  return state().pool.limit;
+}
+
+size_t pooledBytes() {
+  return state().pool.cached;
+}
+
+void trimPool() {
+  state().pool.trim();
+}
+
+MemoryStats stats() {
+  auto& s = state();
+  MemoryStats stats;
+  stats.liveBytes = s.host.live();
+  stats.peakBytes = s.host.peak();
+  stats.deviceLiveBytes = s.device.live();
+  stats.devicePeakBytes = s.device.peak();
+  stats.pooledBytes = s.pool.cached;
+  return stats;
+}
+
+void resetPeakStats() {
+  auto& s = state();
+  s.host.resetPeak();
+  s.device.resetPeak();
+}
+
+namespace detail {
+
+void* allocate(size_t& bytes) {
+  auto& s = state();
+  auto ptr = s.pool.allocate(bytes);
+  s.host.add(bytes);
+  return ptr;
+}
+
+void free(void* ptr, size_t bytes) {
+  if (ptr == nullptr) {
+    return;
+  }
+  auto& s = state();
+  s.host.add(-static_cast<std::ptrdiff_t>(bytes));
+  s.pool.free(ptr, bytes);
+}
+
+void trackDevice(std::ptrdiff_t bytes) {
+  state().device.add(bytes);
+}
+
+void* getState() {
+  return &state();
+}
+
+void setState(void* state) {
+  statePtr().store(static_cast<State*>(state), std::memory_order_release);
+}
+
+} // namespace detail
+
+} // namespace memory
+} // namespace gtn
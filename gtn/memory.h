@@ -0,0 +1,104 @@
+/*
+ * Copyright (c) Facebook, Inc. and its affiliates.
+ *
+ * This source code is licensed under the MIT license found in the
+ * LICENSE file in the root directory of this source tree.
+ */
+
+#pragma once
+
+#include <cstddef>
+
+namespace gtn {
+namespace memory {
+
+/** \addtogroup memory
+ *  @{
+ */
+
+/**
+ * Enable or disable the host memory pool. When enabled, the CPU arrays which
+ * store graph data are drawn from and returned to a pool of power-of-two size
+ * classes instead of being allocated and freed each time. This reduces
+ * allocator churn when many short-lived graphs are created. Disabling the
+ * pool releases any memory it holds. The pool is disabled by default.
+ */
+void setPoolEnabled(bool enabled);
+
+/** Check if the host memory pool is enabled. */
+bool isPoolEnabled();
+
+/**
+ * Set the maximum number of bytes of free memory kept in the pool. Memory
+ * returned to a full pool is freed. If the pool holds more than `bytes` it is
+ * trimmed.
+ */
+void setPoolLimit(size_t bytes);
+
+/** Get the maximum number of bytes of free memory kept in the pool. */
+size_t poolLimit();
+
+/** The number of bytes of free memory currently held by the pool. */
+size_t pooledBytes();
+
+/** Free all of the memory held by the pool. */
+void trimPool();
+
+/** Process-wide counters of the memory held by graph arrays, in bytes. */
+struct MemoryStats {
+  /// Host memory currently in use
+  size_t liveBytes{0};
+  /// The largest `liveBytes` since the last `resetPeakStats`
+  size_t peakBytes{0};
+  /// Device memory currently in use
+  size_t deviceLiveBytes{0};
+  /// The largest `deviceLiveBytes` since the last `resetPeakStats`
+  size_t devicePeakBytes{0};
+  /// Free host memory held by the pool, see `setPoolEnabled`
+  size_t pooledBytes{0};
+};
+
+/**
+ * Get the memory counters. These count the arrays used to store graph data
+ * (`gtn::detail::HDSpan`), not the `Graph` objects themselves.
+ */
+MemoryStats stats();
+
+/** Reset the peak memory counters to the memory currently in use. */
+void resetPeakStats();
+
+/** @}*/
+
+namespace detail {
+
+/**
+ * Allocate at least `bytes` bytes of host memory. The size of the allocation
+ * is rounded up when it comes from the pool, in which case `bytes` is updated
+ * to the actual size.
+ */
+void* allocate(size_t& bytes);
+
+/**
+ * Free host memory from `gtn::memory::detail::allocate`. The `bytes` must be
+ * the size of the allocation.
+ */
+void free(void* ptr, size_t bytes);
+
+/** Record an allocation (`bytes > 0`) or free (`bytes < 0`) of device memory. */
+void trackDevice(std::ptrdiff_t bytes);
+
+/**
+ * Get the state of the memory pool and counters. A program which links more
+ * than one copy of the library (e.g. several Python extension modules) can
+ * pass the state of one copy to `setState` in the others so the pool and
+ * counters are shared.
+ */
+void* getState();
+
+/** Use the state from `getState` of another copy of the library. */
+void setState(void* state);
+
+} // namespace detail
+
+} // namespace memory
+} // namespace gtn
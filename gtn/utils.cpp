@@ -54,8 +54,15 @@ bool equal(const Graph& g1, const Graph& g2) {
 
   auto& g1Data = g1.getData();
   auto& g2Data = g2.getData();
-  bool eq = g1Data.ilabels == g2Data.ilabels;
-  eq &= g1Data.olabels == g2Data.olabels;
+  bool eq = true;
+  if (g1Data.compact || g2Data.compact) {
+    for (size_t i = 0; i < g1.numArcs() && eq; ++i) {
+      eq &= g1.ilabel(i) == g2.ilabel(i) && g1.olabel(i) == g2.olabel(i);
+    }
+  } else {
+    eq &= g1Data.ilabels == g2Data.ilabels;
+    eq &= g1Data.olabels == g2Data.olabels;
+  }
   eq &= g1Data.srcNodes == g2Data.srcNodes;
   eq &= g1Data.dstNodes == g2Data.dstNodes;
   eq &= g1.getWeights() == g2.getWeights();
@@ -187,27 +194,34 @@ Graph load(std::istream& in) {
   std::vector<int> accept(numAccept);
   in.read(reinterpret_cast<char*>(accept.data()), numAccept * sizeof(int));
 
-  // create nodes
-  Graph g;
-  std::unordered_set<int> startSet{start.begin(), start.end()};
-  std::unordered_set<int> acceptSet{accept.begin(), accept.end()};
-  for (int i = 0; i < numNodes; ++i) {
-    g.addNode(startSet.count(i), acceptSet.count(i));
+  // repeated start and accept nodes are only added once, in node order
+  for (auto nodes : {&start, &accept}) {
+    std::sort(nodes->begin(), nodes->end());
+    nodes->erase(std::unique(nodes->begin(), nodes->end()), nodes->end());
   }
 
-  // create arcs
+  // load arcs
+  std::vector<int> srcNodes(numArcs);
+  std::vector<int> dstNodes(numArcs);
+  std::vector<int> ilabels(numArcs);
+  std::vector<int> olabels(numArcs);
   std::vector<int> cols(4);
   for (int i = 0; i < numArcs; ++i) {
     in.read(reinterpret_cast<char*>(cols.data()), cols.size() * sizeof(int));
-    g.addArc(cols[0], cols[1], cols[2], cols[3]);
+    srcNodes[i] = cols[0];
+    dstNodes[i] = cols[1];
+    ilabels[i] = cols[2];
+    olabels[i] = cols[3];
   }
 
   // load weights
   std::vector<float> weights(numArcs);
   in.read(
       reinterpret_cast<char*>(weights.data()), weights.size() * sizeof(float));
-  g.setWeights(weights.data());
-  return g;
+
+  // create the graph
+  return Graph::fromArrays(
+      numNodes, start, accept, srcNodes, dstNodes, ilabels, olabels, weights);
 }
 
 void saveTxtImpl(std::ostream& out, const Graph& g, bool limitOutput) {
@@ -279,7 +293,7 @@ Graph loadTxt(std::istream& in) {
     return std::stoi(s);
   });
 
-  // create nodes
+  // find the nodes
   Graph g;
   int maxNodeIdx = -1;
   for (auto s : start) {
@@ -297,36 +311,36 @@ Graph loadTxt(std::istream& in) {
   if (acceptSet.size() != accept.size()) {
     throw std::invalid_argument("Repeat accept node detected.");
   }
-  for (int i = 0; i <= maxNodeIdx; ++i) {
-    g.addNode(startSet.count(i), acceptSet.count(i));
-  }
 
-  // create arcs
+  // read the arcs
+  std::vector<int> srcNodes, dstNodes, ilabels, olabels;
+  std::vector<float> weights;
   while (std::getline(in, line)) {
-    // Add the arc in the line
     cols = split(line);
     if (cols.size() < 3 || cols.size() > 5) {
       throw std::invalid_argument("Bad line for loading arc.");
     }
-    auto src = std::stoi(cols[0]);
-    auto dst = std::stoi(cols[1]);
+    srcNodes.push_back(std::stoi(cols[0]));
+    dstNodes.push_back(std::stoi(cols[1]));
+    ilabels.push_back(std::stoi(cols[2]));
+    olabels.push_back(cols.size() > 3 ? std::stoi(cols[3]) : ilabels.back());
+    weights.push_back(cols.size() > 4 ? std::stof(cols[4]) : 0);
+    maxNodeIdx =
+        std::max(maxNodeIdx, std::max(srcNodes.back(), dstNodes.back()));
+  }
 
-    if (src > maxNodeIdx || dst > maxNodeIdx) {
-      auto newMax = std::max(src, dst);
-      for (int i = 0; i < (newMax - maxNodeIdx); ++i) {
-        g.addNode();
-      }
-      maxNodeIdx = newMax;
-    }
-    if (cols.size() == 5) {
-      g.addArc(
-          src, dst, std::stoi(cols[2]), std::stoi(cols[3]), std::stof(cols[4]));
-    } else if (cols.size() == 4) {
-      g.addArc(src, dst, std::stoi(cols[2]), std::stoi(cols[3]));
-    } else {
-      g.addArc(src, dst, std::stoi(cols[2]));
-    }
+  // create the nodes and arcs
+  g.reserve(maxNodeIdx + 1, srcNodes.size());
+  for (int i = 0; i <= maxNodeIdx; ++i) {
+    g.addNode(startSet.count(i), acceptSet.count(i));
   }
+  g.addArcs(
+      srcNodes.size(),
+      srcNodes.data(),
+      dstNodes.data(),
+      ilabels.data(),
+      olabels.data(),
+      weights.data());
   return g;
 }
 
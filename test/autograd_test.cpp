@@ -241,6 +241,43 @@ TEST_CASE("test grad available", "[autograd]") {
   }
 }
 
+TEST_CASE("test grad buffer", "[autograd]") {
+  Graph g;
+  g.addNode(true);
+  g.addNode(false, true);
+  g.addArc(0, 1, 0, 0, 1);
+  g.addArc(0, 1, 1, 1, 1);
+  auto buffer = std::make_shared<std::vector<float>>(2, 5.0f);
+  g.setGradBuffer(buffer->data(), buffer);
+
+  // The gradient is written to the buffer
+  backward(forwardScore(g));
+  CHECK(g.grad().weights() == buffer->data());
+  CHECK(*buffer == std::vector<float>{0.5f, 0.5f});
+
+  // Gradients accumulate into the buffer
+  backward(add(forwardScore(g), viterbiScore(g)));
+  CHECK(g.grad().weights() == buffer->data());
+  CHECK((*buffer)[0] + (*buffer)[1] == Approx(3.0f));
+  std::vector<float> grads(g.grad().weights(), g.grad().weights() + 2);
+  CHECK(grads == *buffer);
+
+  // The buffer is overwritten after zeroing the gradient
+  g.zeroGrad();
+  backward(forwardScore(g));
+  CHECK(*buffer == std::vector<float>{0.5f, 0.5f});
+
+  // Removing the buffer releases the owner
+  g.setGradBuffer(nullptr);
+  CHECK(buffer.use_count() == 1);
+  CHECK(!g.isGradAvailable());
+  backward(forwardScore(g));
+  CHECK(g.grad().weights() != buffer->data());
+
+  Graph noGrad(false);
+  CHECK_THROWS(noGrad.setGradBuffer(buffer->data()));
+}
+
 TEST_CASE("test forward score grad", "[autograd]") {
   {
     Graph g;
@@ -529,6 +566,16 @@ TEST_CASE("test viterbi path grad", "[autograd]") {
     backward(forwardFn(g));
 
     CHECK(numericalGradCheck(forwardFn, g, 1e-2, 1e-5));
+    g.zeroGrad();
+
+    // Each arc of the path passes its own gradient to its arc
+    auto deltas = linearGraph(4, 1);
+    for (auto a = 0; a < deltas.numArcs(); ++a) {
+      deltas.setWeight(a, a + 1);
+    }
+    backward(viterbiPath(g), deltas);
+    expected = {1.0, 0.0, 2.0, 0.0, 3.0, 0.0, 0.0, 4.0};
+    CHECK(gradsToVec(g) == expected);
   }
 }
 
@@ -662,3 +709,392 @@ TEST_CASE("test closure grad", "[autograd]") {
   };
   CHECK(numericalGradCheck(forwardFn, g1, 1e-3, 1e-3));
 }
+
+TEST_CASE("test connect grad", "[autograd]") {
+  Graph g;
+  g.addNode(true);
+  g.addNode();
+  g.addNode();
+  g.addNode(false, true);
+  g.addArc(0, 1, 0, 0, 0.5);
+  g.addArc(1, 3, 1, 1, 1.5);
+  g.addArc(1, 2, 0, 0, 2.5);
+  g.addArc(0, 3, 2, 2, 0.1);
+  g.addArc(2, 2, 1, 1, 0.7);
+
+  backward(forwardScore(connect(g)));
+  auto grad = g.grad();
+  // Arcs to the dead node have no gradient
+  CHECK(grad.weight(2) == 0.0f);
+  CHECK(grad.weight(4) == 0.0f);
+
+  auto forwardFn = [](Graph g) { return forwardScore(connect(g)); };
+  CHECK(numericalGradCheck(forwardFn, g, 1e-3, 1e-3));
+}
+
+TEST_CASE("test remove grad", "[autograd]") {
+  Graph g;
+  g.addNode(true);
+  g.addNode();
+  g.addNode();
+  g.addNode();
+  g.addNode(false, true);
+  g.addNode(false, true);
+  g.addArc(0, 1, 0, 0, 0.5);
+  g.addArc(1, 2, epsilon, epsilon, 0.2);
+  g.addArc(1, 3, epsilon, epsilon, -0.3);
+  g.addArc(2, 3, epsilon, epsilon, 0.4);
+  g.addArc(2, 4, 1, 1, 0.6);
+  g.addArc(3, 4, 2, 2, -0.1);
+  g.addArc(3, 5, epsilon, epsilon, 0.7);
+  g.addArc(4, 5, 0, 0, 0.3);
+  g.addArc(4, 5, epsilon, epsilon, -0.2);
+  g.addArc(0, 5, epsilon, epsilon, 1.1);
+
+  Graph target;
+  target.addNode(true);
+  target.addNode();
+  target.addNode(false, true);
+  target.addArc(0, 1, 0);
+  target.addArc(1, 2, 1);
+  target.addArc(1, 2, 2);
+  target.addArc(2, 2, 0);
+
+  {
+    auto forwardFn = [&target](Graph g) {
+      return forwardScore(compose(target, remove(g)));
+    };
+    backward(forwardFn(g));
+    CHECK(numericalGradCheck(forwardFn, g, 1e-3, 1e-3));
+    // The gradient matches the one without removing epsilons
+    auto grad = g.grad();
+    g.zeroGrad();
+    backward(forwardScore(compose(target, g)));
+    for (int i = 0; i < g.numArcs(); i++) {
+      CHECK(grad.weight(i) == Approx(g.grad().weight(i)).margin(1e-5));
+    }
+  }
+
+  {
+    g.zeroGrad();
+    auto forwardFn = [](Graph g) {
+      return viterbiScore(remove(g, epsilon, Semiring::TROPICAL));
+    };
+    backward(forwardFn(g));
+    CHECK(numericalGradCheck(forwardFn, g, 1e-3, 1e-3));
+  }
+}
+
+TEST_CASE("test determinize grad", "[autograd]") {
+  Graph g;
+  g.addNode(true);
+  g.addNode(true);
+  g.addNode();
+  g.addNode(false, true);
+  g.addNode();
+  g.addNode(false, true);
+  g.addArc(0, 2, 0, 0, 0.5);
+  g.addArc(0, 4, 0, 0, -0.2);
+  g.addArc(1, 4, 0, 0, 0.3);
+  g.addArc(1, 3, 1, 1, 1.2);
+  g.addArc(2, 3, 1, 1, 0.1);
+  g.addArc(4, 3, 1, 1, -0.4);
+  g.addArc(4, 5, 2, 2, 0.8);
+  g.addArc(2, 5, 2, 2, 0.6);
+  g.addArc(3, 5, 2, 2, -0.7);
+  g.addArc(3, 5, 0, 0, 0.2);
+
+  {
+    auto forwardFn = [](Graph g) { return forwardScore(determinize(g)); };
+    backward(forwardFn(g));
+    CHECK(numericalGradCheck(forwardFn, g, 1e-3, 1e-3));
+    // The gradient matches the one of the graph
+    auto grad = g.grad();
+    g.zeroGrad();
+    backward(forwardScore(g));
+    for (int i = 0; i < g.numArcs(); i++) {
+      CHECK(grad.weight(i) == Approx(g.grad().weight(i)).margin(1e-5));
+    }
+  }
+
+  {
+    g.zeroGrad();
+    auto forwardFn = [](Graph g) {
+      return viterbiScore(determinize(g, Semiring::TROPICAL));
+    };
+    backward(forwardFn(g));
+    CHECK(numericalGradCheck(forwardFn, g, 1e-3, 1e-3));
+  }
+  {
+    // The scores of the output labels left at the end of a transducer
+    Graph h;
+    h.addNode(true);
+    h.addNode();
+    h.addNode();
+    h.addNode(false, true);
+    h.addArc(0, 1, 0, 1, 0.5);
+    h.addArc(0, 2, 0, 1, 0.2);
+    h.addArc(0, 2, 0, 2, 0.1);
+    h.addArc(1, 3, 1, 0, 0.3);
+    h.addArc(2, 3, 1, 0, 0.7);
+    h.addArc(2, 3, 2, 0, -0.4);
+    for (auto semiring : {Semiring::LOG, Semiring::TROPICAL}) {
+      auto forwardFn = [semiring](Graph g) {
+        return forwardScore(determinize(g, semiring));
+      };
+      h.zeroGrad();
+      backward(forwardFn(h));
+      CHECK(numericalGradCheck(forwardFn, h, 1e-3, 1e-3));
+    }
+  }
+}
+
+TEST_CASE("test minimize grad", "[autograd]") {
+  Graph g;
+  g.addNode(true);
+  g.addNode();
+  g.addNode();
+  g.addNode(false, true);
+  g.addNode();
+  g.addNode();
+  g.addNode(false, true);
+  g.addArc(0, 1, 0, 0, 0.5);
+  g.addArc(1, 2, 1, 1, 0.2);
+  g.addArc(1, 2, 2, 2, -0.4);
+  g.addArc(2, 3, 3, 3, 0.3);
+  g.addArc(0, 4, 2, 2, -0.1);
+  g.addArc(4, 5, 1, 1, 0.7);
+  g.addArc(4, 5, 2, 2, 0.1);
+  g.addArc(5, 6, 3, 3, 0.9);
+
+  {
+    auto forwardFn = [](Graph g) { return forwardScore(minimize(g)); };
+    backward(forwardFn(g));
+    CHECK(numericalGradCheck(forwardFn, g, 1e-3, 1e-3));
+    // The pushed weights pass the gradient to the arcs of every merged node
+    auto grad = g.grad();
+    g.zeroGrad();
+    backward(forwardScore(g));
+    for (int i = 0; i < g.numArcs(); i++) {
+      CHECK(grad.weight(i) == Approx(g.grad().weight(i)).margin(1e-5));
+    }
+  }
+
+  {
+    g.zeroGrad();
+    auto forwardFn = [](Graph g) {
+      return viterbiScore(minimize(g, Semiring::TROPICAL));
+    };
+    backward(forwardFn(g));
+    CHECK(numericalGradCheck(forwardFn, g, 1e-3, 1e-3));
+  }
+}
+
+TEST_CASE("test prune grad", "[autograd]") {
+  Graph g;
+  g.addNode(true);
+  g.addNode();
+  g.addNode();
+  g.addNode(false, true);
+  g.addArc(0, 1, 0, 0, 0.5);
+  g.addArc(0, 2, 1, 1, -4.0);
+  g.addArc(0, 1, 2, 2, -0.2);
+  g.addArc(1, 3, 0, 0, 0.3);
+  g.addArc(2, 3, 1, 1, 0.1);
+  g.addArc(1, 3, 1, 1, -0.6);
+
+  auto forwardFn = [](Graph g) { return forwardScore(prune(g, 3.0)); };
+  backward(forwardFn(g));
+  CHECK(numericalGradCheck(forwardFn, g, 1e-3, 1e-3));
+  // The pruned arcs have no gradient
+  CHECK(g.grad().weight(1) == 0.0);
+  CHECK(g.grad().weight(4) == 0.0);
+}
+
+TEST_CASE("test nbest grad", "[autograd]") {
+  Graph g;
+  g.addNode(true);
+  g.addNode();
+  g.addNode();
+  g.addNode(false, true);
+  g.addArc(0, 1, 0, 0, 1.0);
+  g.addArc(0, 1, 1, 1, 0.5);
+  g.addArc(0, 2, 0, 0, 0.8);
+  g.addArc(1, 3, 2, 2, 0.0);
+  g.addArc(1, 3, 3, 3, -0.2);
+  g.addArc(2, 3, 2, 2, 0.1);
+
+  auto grad = [&g]() {
+    auto weights = g.grad().weights();
+    return std::vector<float>(weights, weights + g.numArcs());
+  };
+
+  // Each arc of a path passes its own gradient to its arc
+  Graph deltas;
+  deltas.addNode(true);
+  deltas.addNode();
+  deltas.addNode(false, true);
+  deltas.addArc(0, 1, 0, 0, 2.0);
+  deltas.addArc(1, 2, 0, 0, 3.0);
+
+  backward(nbest(g, 2, false)[1], deltas);
+  CHECK(grad() == std::vector<float>{0.0, 0.0, 2.0, 0.0, 0.0, 3.0});
+
+  g.zeroGrad();
+  backward(nbest(g, 2)[1], deltas);
+  CHECK(grad() == std::vector<float>{2.0, 0.0, 0.0, 0.0, 3.0, 0.0});
+}
+
+TEST_CASE("test linear graph score grad", "[autograd]") {
+  // Linear graphs use a dense implementation which should match the general
+  // one, including the gradients
+  auto T = 6;
+  auto N = 5;
+  auto dense = linearGraph(T, N);
+  std::vector<float> weights(T * N);
+  for (int i = 0; i < weights.size(); i++) {
+    weights[i] = static_cast<float>(std::rand() % 100) / 10.0f;
+  }
+  // Tie the best arcs of the first row to check the arg max
+  weights[3] = weights[1] = 20.0f;
+  dense.setWeights(weights.data());
+  Graph general;
+  for (int t = 0; t <= T; t++) {
+    general.addNode(t == 0, t == T);
+  }
+  for (int i = 0; i < T * N; i++) {
+    general.addArc(i / N, i / N + 1, i % N, i % N, weights[i]);
+  }
+  CHECK(dense.isLinear());
+  CHECK(!general.isLinear());
+
+  for (auto fn : {forwardScore, viterbiScore}) {
+    dense.zeroGrad();
+    general.zeroGrad();
+    auto denseScore = fn(dense);
+    auto generalScore = fn(general);
+    CHECK(denseScore.item() == Approx(generalScore.item()));
+    backward(denseScore);
+    backward(generalScore);
+    for (int i = 0; i < T * N; i++) {
+      CHECK(dense.grad().weight(i) == Approx(general.grad().weight(i)));
+    }
+  }
+
+  // No arcs, a single node and unreachable accept nodes
+  CHECK(forwardScore(linearGraph(0, 3)).item() == 0.0f);
+  const float inf = std::numeric_limits<float>::infinity();
+  CHECK(viterbiScore(linearGraph(3, 0)).item() == -inf);
+  dense.setWeights(std::vector<float>(T * N, -inf).data());
+  dense.zeroGrad();
+  backward(forwardScore(dense));
+  CHECK(dense.grad().weight(0) == 0.0f);
+}
+
+TEST_CASE("test compose score grad", "[autograd]") {
+  // The fused score and gradients should match scoring the composed graph
+  auto checkComposeScore = [](Graph g1, Graph g2) {
+    for (auto semiring : {Semiring::LOG, Semiring::TROPICAL}) {
+      auto scoreFn =
+          semiring == Semiring::LOG ? forwardScore : viterbiScore;
+      g1.zeroGrad();
+      g2.zeroGrad();
+      auto fused = composeScore(g1, g2, semiring);
+      backward(fused);
+      auto w1 = g1.grad().weights();
+      auto w2 = g2.grad().weights();
+      std::vector<float> grad1(w1, w1 + g1.numArcs());
+      std::vector<float> grad2(w2, w2 + g2.numArcs());
+
+      g1.zeroGrad();
+      g2.zeroGrad();
+      auto expected = scoreFn(compose(g1, g2));
+      backward(expected);
+      CHECK(fused.item() == Approx(expected.item()));
+      for (int i = 0; i < g1.numArcs(); i++) {
+        CHECK(grad1[i] == Approx(g1.grad().weight(i)).margin(1e-6));
+      }
+      for (int i = 0; i < g2.numArcs(); i++) {
+        CHECK(grad2[i] == Approx(g2.grad().weight(i)).margin(1e-6));
+      }
+    }
+  };
+
+  // Emissions with a CTC style target with self-loops
+  {
+    auto T = 5;
+    auto N = 3;
+    Graph emissions;
+    for (int t = 0; t <= T; t++) {
+      emissions.addNode(t == 0, t == T);
+    }
+    for (int i = 0; i < T * N; i++) {
+      auto weight = static_cast<float>(std::rand() % 100) / 10.0f;
+      emissions.addArc(i / N, i / N + 1, i % N, i % N, weight);
+    }
+    Graph target;
+    target.addNode(true);
+    target.addNode(true);
+    target.addNode();
+    target.addNode(false, true);
+    target.addNode(false, true);
+    target.addArc(0, 0, 0);
+    target.addArc(0, 1, 1);
+    target.addArc(1, 1, 1);
+    target.addArc(1, 2, 0);
+    target.addArc(1, 3, 2, 2, 0.5);
+    target.addArc(2, 2, 0);
+    target.addArc(2, 3, 2, 2, -0.5);
+    target.addArc(3, 3, 2);
+    target.addArc(3, 4, 0);
+    target.addArc(4, 4, 0);
+    checkComposeScore(emissions, target);
+    checkComposeScore(target, emissions);
+    emissions.arcSort(true);
+    target.arcSort();
+    checkComposeScore(emissions, target);
+  }
+
+  // Epsilons in both graphs
+  {
+    Graph first;
+    first.addNode(true);
+    first.addNode();
+    first.addNode();
+    first.addNode(false, true);
+    first.addArc(0, 1, 0, 0, 1.1);
+    first.addArc(0, 1, 0, epsilon, 0.4);
+    first.addArc(1, 2, 1, epsilon, -0.3);
+    first.addArc(1, 2, 1, 1, 0.7);
+    first.addArc(2, 3, 2, 2, 0.2);
+    first.addArc(1, 3, 2, epsilon, 1.5);
+
+    Graph second;
+    second.addNode(true);
+    second.addNode();
+    second.addNode(false, true);
+    second.addArc(0, 1, 0, 0, 0.3);
+    second.addArc(0, 1, epsilon, 1, -0.2);
+    second.addArc(1, 2, epsilon, 2, 0.6);
+    second.addArc(1, 2, 2, 2, 0.9);
+    second.addArc(0, 2, 1, 1, 1.2);
+    checkComposeScore(first, second);
+  }
+
+  // A cyclic graph with epsilons uses the composed graph
+  {
+    Graph first;
+    first.addNode(true);
+    first.addNode(false, true);
+    first.addNode(false, true);
+    first.addArc(0, 1, 0, 0, 0.5);
+    first.addArc(1, 2, 1, epsilon, 1.5);
+    first.addArc(2, 2, 2, 2, 0.1);
+
+    Graph second;
+    second.addNode(true);
+    second.addNode(false, true);
+    second.addArc(0, 1, 0, 0, 0.3);
+    checkComposeScore(first, second);
+  }
+}
@@ -53,4 +53,16 @@ TEST_CASE("test linear creation", "[creations]") {
   CHECK(g.isStart(0));
 
   CHECK(arr == std::vector<float>(g.weights(), g.weights() + g.numArcs()));
+
+  // Linear graphs are marked until their nodes or arcs change
+  CHECK(g.isLinear());
+  CHECK(Graph::deepCopy(g).isLinear());
+  g.arcSort(true);
+  CHECK(g.isLinear());
+  auto g2 = linearGraph(M, N);
+  g2.addArc(0, 1, 0);
+  CHECK(!g2.isLinear());
+  g2 = linearGraph(M, N);
+  g2.makeAccept(0);
+  CHECK(!g2.isLinear());
 }
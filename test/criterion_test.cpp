@@ -8,6 +8,7 @@
 #include <array>
 #include <cmath>
 #include <iostream>
+#include <limits>
 
 #include "catch.hpp"
 
@@ -186,6 +187,114 @@ TEST_CASE("Test CTC", "[criterion.ctc]") {
   }
 }
 
+TEST_CASE("Test CTC linear emissions", "[criterion.ctc]") {
+  // Emissions from `linearGraph` use a dedicated implementation which should
+  // match the loss and gradient on the equivalent general graph
+  const int T = 6, N = 5;
+  std::vector<float> weights(T * N);
+  for (auto& w : weights) {
+    w = static_cast<float>(std::rand() % 100) / 25.0f - 2.0f;
+  }
+  auto linear = linearGraph(T, N);
+  linear.setWeights(weights.data());
+  Graph general;
+  for (int t = 0; t <= T; t++) {
+    general.addNode(t == 0, t == T);
+  }
+  for (int i = 0; i < T * N; i++) {
+    general.addArc(i / N, i / N + 1, i % N, i % N, weights[i]);
+  }
+  CHECK(linear.isLinear());
+  CHECK(!general.isLinear());
+
+  std::vector<std::vector<int>> targets = {
+      {1, 2, 3}, {1, 1, 2}, {}, {2, 2, 2, 2}, {3, 3, 3, 3}, {0, 4}};
+  for (auto& target : targets) {
+    linear.zeroGrad();
+    general.zeroGrad();
+    auto linearLoss = ctcLoss(linear, target, 0);
+    auto generalLoss = ctcLoss(general, target, 0);
+    CHECK(linearLoss.item() == Approx(generalLoss.item()));
+    backward(linearLoss);
+    backward(generalLoss);
+    for (int i = 0; i < T * N; i++) {
+      CHECK(
+          linear.grad().weight(i) ==
+          Approx(general.grad().weight(i)).margin(1e-6));
+    }
+  }
+}
+
+TEST_CASE("Test CTC batch", "[criterion.ctc]") {
+  const int B = 3, T = 6, C = 5, L = 3;
+  std::vector<float> logProbs(B * T * C);
+  for (auto& w : logProbs) {
+    w = static_cast<float>(std::rand() % 100) / 25.0f - 2.0f;
+  }
+  // Padded with labels which should be ignored
+  std::vector<int> targets = {1, 2, 3, 4, 4, -1, 2, 2, 2};
+  std::vector<int> inputLengths = {6, 4, 4};
+  std::vector<int> targetLengths = {3, 2, 3};
+  std::vector<float> losses(B);
+  std::vector<float> grads(B * T * C, 1.0);
+  criterion::ctcLossBatch(
+      logProbs.data(),
+      targets.data(),
+      inputLengths.data(),
+      targetLengths.data(),
+      B,
+      T,
+      C,
+      L,
+      0,
+      losses.data(),
+      grads.data());
+
+  for (int b = 0; b < B; b++) {
+    auto emissions = linearGraph(inputLengths[b], C);
+    emissions.setWeights(logProbs.data() + b * T * C);
+    std::vector<int> target(
+        targets.begin() + b * L, targets.begin() + b * L + targetLengths[b]);
+    auto loss = ctcLoss(emissions, target, 0);
+    CHECK(losses[b] == Approx(loss.item()));
+    backward(loss);
+    for (int i = 0; i < T * C; i++) {
+      auto expected = i < inputLengths[b] * C ? emissions.grad().weight(i) : 0;
+      CHECK(grads[b * T * C + i] == Approx(expected).margin(1e-6));
+    }
+  }
+  // The target of the last example can't fit in its frames
+  CHECK(losses[2] == std::numeric_limits<float>::infinity());
+
+  // Without the gradients
+  std::vector<float> moreLosses(B);
+  criterion::ctcLossBatch(
+      logProbs.data(),
+      targets.data(),
+      inputLengths.data(),
+      targetLengths.data(),
+      B,
+      T,
+      C,
+      L,
+      0,
+      moreLosses.data());
+  CHECK(moreLosses == losses);
+
+  inputLengths[1] = T + 1;
+  CHECK_THROWS(criterion::ctcLossBatch(
+      logProbs.data(),
+      targets.data(),
+      inputLengths.data(),
+      targetLengths.data(),
+      B,
+      T,
+      C,
+      L,
+      0,
+      losses.data()));
+}
+
 TEST_CASE("test asg", "[criterion]") {
   // This test cases is taken from wav2letter: https://fburl.com/msom2e4v
   const int T = 5, N = 6;
@@ -312,6 +421,240 @@ TEST_CASE("test asg", "[criterion]") {
   CHECK(allClose);
 }
 
+TEST_CASE("test asg loss", "[criterion]") {
+  // The dense implementation of `asgLoss` should match the loss and gradients
+  // of the composition of the emissions and transitions graphs
+  const int T = 6, N = 4;
+  auto randWeights = [](int size) {
+    std::vector<float> weights(size);
+    for (auto& w : weights) {
+      w = static_cast<float>(std::rand() % 100) / 25.0f - 2.0f;
+    }
+    return weights;
+  };
+  auto emissionsWeights = randWeights(T * N);
+  auto transWeights = randWeights(N + N * N);
+
+  // Transitions with the arcs between labels in either order
+  auto makeTransitions = [&](bool swap) {
+    Graph transitions;
+    transitions.addNode(true);
+    for (int i = 1; i <= N; i++) {
+      transitions.addNode(false, true);
+      transitions.addArc(0, i, i - 1, i - 1, transWeights[i - 1]);
+    }
+    for (int k = 0; k < N * N; k++) {
+      // p(i | j)
+      int i = swap ? k % N : k / N;
+      int j = swap ? k / N : k % N;
+      transitions.addArc(j + 1, i + 1, i, i, transWeights[N + i * N + j]);
+    }
+    return transitions;
+  };
+  auto gradVector = [](Graph& g) {
+    auto grad = g.grad();
+    return std::vector<float>(grad.weights(), grad.weights() + g.numArcs());
+  };
+  auto transitions = makeTransitions(false);
+  auto swapped = makeTransitions(true);
+  const float kInf = std::numeric_limits<float>::infinity();
+
+  std::vector<std::vector<int>> targets = {
+      {2, 1, 3}, {3, 2, 2, 1}, {0}, {1, 1, 1, 1, 1, 1}, {0, 1, 2, 3, 0, 1, 2}};
+  for (auto& target : targets) {
+    auto emissions = emissions_graph(emissionsWeights, T, N, true);
+    Graph fal;
+    fal.addNode(true);
+    int L = target.size();
+    for (int l = 1; l <= L; l++) {
+      fal.addNode(false, l == L);
+      fal.addArc(l - 1, l, target[l - 1]);
+      fal.addArc(l, l, target[l - 1]);
+    }
+    auto expected = subtract(
+        forwardScore(compose(emissions, transitions)),
+        forwardScore(compose(compose(fal, transitions), emissions)));
+    backward(expected);
+    auto expectedEmissionsGrad = gradVector(emissions);
+    auto expectedTransGrad = gradVector(transitions);
+    emissions.zeroGrad();
+    transitions.zeroGrad();
+
+    auto loss = criterion::asgLoss(emissions, transitions, target);
+    CHECK(loss.item() == Approx(expected.item()));
+    backward(loss);
+    auto emissionsGrad = gradVector(emissions);
+    auto transGrad = gradVector(transitions);
+    for (int i = 0; i < T * N; i++) {
+      CHECK(emissionsGrad[i] == Approx(expectedEmissionsGrad[i]).margin(1e-5));
+    }
+    for (int i = 0; i < N + N * N; i++) {
+      CHECK(transGrad[i] == Approx(expectedTransGrad[i]).margin(1e-5));
+    }
+    transitions.zeroGrad();
+
+    // The order of the arcs of the transitions does not matter
+    auto swappedLoss = criterion::asgLoss(emissions, swapped, target);
+    CHECK(swappedLoss.item() == Approx(expected.item()));
+    backward(swappedLoss);
+    for (int i = 0; i < N; i++) {
+      CHECK(
+          swapped.grad().weight(i) ==
+          Approx(expectedTransGrad[i]).margin(1e-5));
+      for (int j = 0; j < N; j++) {
+        CHECK(
+            swapped.grad().weight(N + j * N + i) ==
+            Approx(expectedTransGrad[N + i * N + j]).margin(1e-5));
+      }
+    }
+    swapped.zeroGrad();
+  }
+
+  // Infeasible targets have an infinite loss
+  auto emissions = emissions_graph(emissionsWeights, T, N, true);
+  CHECK(criterion::asgLoss(emissions, transitions, {}).item() == kInf);
+  CHECK(
+      criterion::asgLoss(emissions, transitions, {0, 1, 2, 3, 0, 1, 2, 3})
+          .item() == kInf);
+  CHECK(criterion::asgLoss(emissions, transitions, {1, N}).item() == kInf);
+
+  // Other emissions graphs use the graph operations
+  Graph general;
+  for (int t = 0; t <= T; t++) {
+    general.addNode(t == 0, t == T);
+  }
+  for (int i = 0; i < T * N; i++) {
+    general.addArc(i / N, i / N + 1, i % N, i % N, emissionsWeights[i]);
+  }
+  CHECK(
+      criterion::asgLoss(general, transitions, targets[0]).item() ==
+      Approx(criterion::asgLoss(emissions, transitions, targets[0]).item()));
+
+  // The batched loss accumulates the gradients of the shared transitions
+  transitions.zeroGrad();
+  std::vector<Graph> batch;
+  for (size_t b = 0; b < targets.size(); b++) {
+    batch.push_back(emissions_graph(emissionsWeights, T, N, true));
+  }
+  auto losses = criterion::asgLoss(batch, transitions, targets);
+  CHECK(losses.size() == targets.size());
+  std::vector<float> expectedTransGrad(N + N * N, 0.0);
+  auto single = makeTransitions(false);
+  for (size_t b = 0; b < targets.size(); b++) {
+    auto loss = criterion::asgLoss(batch[b], single, targets[b]);
+    CHECK(losses[b].item() == Approx(loss.item()));
+    backward(losses[b]);
+    backward(loss);
+    for (int i = 0; i < N + N * N; i++) {
+      expectedTransGrad[i] += single.grad().weight(i);
+    }
+    single.zeroGrad();
+  }
+  for (int i = 0; i < N + N * N; i++) {
+    CHECK(
+        transitions.grad().weight(i) ==
+        Approx(expectedTransGrad[i]).margin(1e-4));
+  }
+}
+
+TEST_CASE("test crf", "[criterion]") {
+  const int T = 5, K = 3;
+  std::vector<float> weights(T * K);
+  for (auto& w : weights) {
+    w = static_cast<float>(std::rand() % 100) / 25.0f - 2.0f;
+  }
+  // A bigram transition graph with the start node last as in the linear CRF
+  // example
+  Graph transitions;
+  for (int i = 0; i <= K; i++) {
+    transitions.addNode(i == K, true);
+  }
+  for (int i = 0; i < K; i++) {
+    transitions.addArc(K, i, i); // s(<s>, i)
+    for (int j = 0; j < K; j++) {
+      transitions.addArc(i, j, j); // s(i, j)
+    }
+  }
+  std::vector<float> transWeights(transitions.numArcs());
+  for (auto& w : transWeights) {
+    w = static_cast<float>(std::rand() % 100) / 25.0f - 2.0f;
+  }
+  transitions.setWeights(transWeights.data());
+  auto gradVector = [](Graph& g) {
+    auto grad = g.grad();
+    return std::vector<float>(grad.weights(), grad.weights() + g.numArcs());
+  };
+
+  std::vector<std::vector<int>> targets = {
+      {0, 1, 2, 1, 0}, {2, 2, 2, 2, 2}, {1, 0, 0, 2, 1}};
+  for (auto& target : targets) {
+    auto emissions = emissions_graph(weights, T, K, true);
+    Graph labels;
+    labels.addNode(true);
+    for (int t = 1; t <= T; t++) {
+      labels.addNode(false, t == T);
+      labels.addArc(t - 1, t, target[t - 1]);
+    }
+    auto expected = subtract(
+        forwardScore(compose(emissions, transitions)),
+        forwardScore(compose(emissions, intersect(labels, transitions))));
+    backward(expected);
+    auto expectedEmissionsGrad = gradVector(emissions);
+    auto expectedTransGrad = gradVector(transitions);
+    emissions.zeroGrad();
+    transitions.zeroGrad();
+
+    auto loss = criterion::crfLoss(emissions, transitions, target);
+    CHECK(loss.item() == Approx(expected.item()));
+    backward(loss);
+    auto emissionsGrad = gradVector(emissions);
+    auto transGrad = gradVector(transitions);
+    for (int i = 0; i < T * K; i++) {
+      CHECK(emissionsGrad[i] == Approx(expectedEmissionsGrad[i]).margin(1e-5));
+    }
+    for (int i = 0; i < transitions.numArcs(); i++) {
+      CHECK(transGrad[i] == Approx(expectedTransGrad[i]).margin(1e-5));
+    }
+    transitions.zeroGrad();
+  }
+
+  // Targets which are not one label per frame have an infinite loss
+  auto emissions = emissions_graph(weights, T, K, true);
+  const float kInf = std::numeric_limits<float>::infinity();
+  CHECK(criterion::crfLoss(emissions, transitions, {0, 1}).item() == kInf);
+  CHECK(
+      criterion::crfLoss(emissions, transitions, {0, 1, 2, 3, 0}).item() ==
+      kInf);
+
+  // The decoded labels are those of the Viterbi path
+  auto path = viterbiPath(compose(emissions, transitions));
+  auto decoded = criterion::crfDecode(emissions, transitions);
+  CHECK(decoded == path.labelsToVector(false));
+  CHECK(
+      criterion::crfLoss(emissions, transitions, decoded).item() ==
+      Approx(
+          forwardScore(compose(emissions, transitions)).item() -
+          viterbiScore(compose(emissions, transitions)).item()));
+
+  // Batches
+  std::vector<Graph> batch;
+  for (size_t b = 0; b < targets.size(); b++) {
+    batch.push_back(emissions_graph(weights, T, K, true));
+  }
+  auto losses = criterion::crfLoss(batch, transitions, targets);
+  CHECK(losses.size() == targets.size());
+  for (size_t b = 0; b < targets.size(); b++) {
+    CHECK(
+        losses[b].item() ==
+        Approx(criterion::crfLoss(batch[b], transitions, targets[b]).item()));
+  }
+  auto batchDecoded = criterion::crfDecode(batch, transitions);
+  CHECK(batchDecoded.size() == batch.size());
+  for (auto& labels : batchDecoded) {
+    CHECK(labels == decoded);
+  }
+}
+
 TEST_CASE("test asg viterbi path", "[criterion]") {
   // Test adapted from wav2letter https://tinyurl.com/yc6nxex9
   constexpr int T = 4, N = 3;
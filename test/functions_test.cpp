@@ -7,6 +7,8 @@
 
 #include <cmath>
 #include <iostream>
+#include <limits>
+#include <set>
 #include <sstream>
 
 #include "catch.hpp"
@@ -363,6 +365,18 @@ TEST_CASE("test forward score", "[functions]") {
     Graph g = loadTxt(in);
     CHECK(forwardScore(g).item() == Approx(8.36931));
   }
+
+  {
+    // Cyclic graphs are not supported
+    Graph g;
+    g.addNode(true);
+    g.addNode(false, true);
+    g.addArc(0, 1, 0);
+    g.addArc(1, 0, 0);
+    CHECK_THROWS_AS(forwardScore(g), std::invalid_argument);
+    CHECK_THROWS_AS(viterbiScore(g), std::invalid_argument);
+    CHECK_THROWS_AS(viterbiPath(g), std::invalid_argument);
+  }
 }
 
 TEST_CASE("test viterbi score", "[functions]") {
@@ -1053,6 +1067,73 @@ TEST_CASE("test union", "[functions]") {
   }
 }
 
+TEST_CASE("test connect", "[functions]") {
+  {
+    Graph g;
+    g.addNode(true);
+    g.addNode();
+    g.addNode(); // not coaccessible
+    g.addNode(); // not accessible
+    g.addNode(false, true);
+    g.addArc(0, 1, 0, 0, 1.0);
+    g.addArc(1, 4, 1, 2, 2.0);
+    g.addArc(1, 2, 2, 2, 3.0);
+    g.addArc(2, 2, 3, 3, 4.0);
+    g.addArc(3, 4, 4, 4, 5.0);
+    g.addArc(0, 4, 5, 5, 6.0);
+
+    Graph expected;
+    expected.addNode(true);
+    expected.addNode();
+    expected.addNode(false, true);
+    expected.addArc(0, 1, 0, 0, 1.0);
+    expected.addArc(1, 2, 1, 2, 2.0);
+    expected.addArc(0, 2, 5, 5, 6.0);
+    CHECK(equal(connect(g), expected));
+    CHECK(equal(connect(expected), expected));
+    CHECK(randEquivalent(connect(g), g));
+  }
+
+  {
+    // No path from a start to an accept node
+    Graph g;
+    g.addNode(true);
+    g.addNode(false, true);
+    g.addArc(1, 0, 0);
+    auto connected = connect(g);
+    CHECK(connected.numNodes() == 0);
+    CHECK(connected.numArcs() == 0);
+  }
+
+  {
+    // Connecting a composition keeps its score
+    Graph g1;
+    g1.addNode(true);
+    g1.addNode();
+    g1.addNode(false, true);
+    g1.addArc(0, 1, 0, 0, 0.5);
+    g1.addArc(0, 1, 1, 1, 1.5);
+    g1.addArc(1, 2, 0, 0, 0.5);
+    g1.addArc(1, 1, 2, 2, 0.1);
+
+    Graph g2;
+    g2.addNode(true);
+    g2.addNode();
+    g2.addNode(false, true);
+    g2.addArc(0, 1, 1);
+    g2.addArc(1, 2, 0);
+    g2.addArc(1, 2, 2);
+    g2.addArc(0, 2, 2);
+
+    auto composed = compose(g1, g2);
+    auto connected = connect(composed);
+    CHECK(connected.numNodes() <= composed.numNodes());
+    CHECK(
+        forwardScore(connected).item() ==
+        Approx(forwardScore(composed).item()));
+  }
+}
+
 TEST_CASE("test remove", "[functions]") {
   {
     Graph g(false);
@@ -1191,3 +1272,624 @@ TEST_CASE("test remove", "[functions]") {
     CHECK(equal(remove(g), expected));
   }
 }
+
+TEST_CASE("test remove weighted", "[functions]") {
+  Graph g;
+  g.addNode(true);
+  g.addNode();
+  g.addNode();
+  g.addNode();
+  g.addNode(false, true);
+  g.addNode(false, true);
+  g.addArc(0, 1, 0, 0, 0.5);
+  g.addArc(1, 2, epsilon, epsilon, 0.2);
+  // Two paths of epsilons from 1 to 3
+  g.addArc(1, 3, epsilon, epsilon, -0.3);
+  g.addArc(2, 3, epsilon, epsilon, 0.4);
+  g.addArc(2, 4, 1, 1, 0.6);
+  g.addArc(3, 4, 2, 2, -0.1);
+  // Nodes which continue and also end with epsilons
+  g.addArc(3, 5, epsilon, epsilon, 0.7);
+  g.addArc(4, 5, 0, 0, 0.3);
+  g.addArc(4, 5, epsilon, epsilon, -0.2);
+  // The empty path
+  g.addArc(0, 5, epsilon, epsilon, 1.1);
+
+  auto chain = [](const std::vector<int>& labels) {
+    Graph c;
+    c.addNode(true, labels.empty());
+    for (size_t i = 0; i < labels.size(); i++) {
+      c.addNode(false, i + 1 == labels.size());
+      c.addArc(i, i + 1, labels[i]);
+    }
+    return c;
+  };
+  std::vector<std::vector<int>> strings = {
+      {}, {0}, {0, 1}, {0, 2}, {0, 0}, {0, 1, 0}, {0, 2, 0}, {1}};
+
+  for (auto semiring : {Semiring::LOG, Semiring::TROPICAL}) {
+    auto score = [semiring](const Graph& g) {
+      return semiring == Semiring::LOG ? forwardScore(g).item()
+                                       : viterbiScore(g).item();
+    };
+    auto removed = remove(g, epsilon, semiring);
+    // Only the arc of the empty path keeps an epsilon
+    auto labels = removed.labelsToVector();
+    CHECK(std::count(labels.begin(), labels.end(), epsilon) == 1);
+    CHECK(score(removed) == Approx(score(g)));
+    // Every string has the same score
+    for (auto& s : strings) {
+      auto expected = score(compose(chain(s), g));
+      auto actual = score(compose(chain(s), removed));
+      if (std::isinf(expected)) {
+        CHECK(actual == expected);
+      } else {
+        CHECK(actual == Approx(expected));
+      }
+    }
+  }
+
+  {
+    // Cycles of removed arcs are searched without their scores
+    Graph g;
+    g.addNode(true);
+    g.addNode();
+    g.addNode(false, true);
+    g.addArc(0, 1, 0);
+    g.addArc(1, 2, epsilon);
+    g.addArc(2, 1, epsilon);
+    Graph expected;
+    expected.addNode(true);
+    expected.addNode(false, true);
+    expected.addArc(0, 1, 0);
+    CHECK(equal(remove(g), expected));
+    // Cycles of arcs which are not removed are fine
+    CHECK(equal(remove(g, 1), g));
+
+    // The same with another label
+    Graph h;
+    h.addNode(true);
+    h.addNode();
+    h.addNode(false, true);
+    h.addArc(0, 1, 0);
+    h.addArc(1, 2, 3);
+    h.addArc(2, 1, 3);
+    CHECK(equal(remove(h, 3), expected));
+  }
+
+  {
+    // A cycle of epsilons
+    Graph g(false);
+    g.addNode(true);
+    g.addNode(false, true);
+    g.addArc(0, 1, epsilon);
+    g.addArc(1, 0, epsilon);
+    Graph expected;
+    expected.addNode(true, true);
+    CHECK(equal(remove(g), expected));
+  }
+
+  {
+    // The closure of a graph with an accepting start node
+    Graph h(false);
+    h.addNode(true, true);
+    h.addNode(false, true);
+    h.addArc(0, 1, 0);
+    h.addArc(1, 1, 1);
+    auto removed = remove(closure(h));
+    auto labels = removed.labelsToVector();
+    CHECK(std::count(labels.begin(), labels.end(), epsilon) == 0);
+    for (auto& s : std::vector<std::vector<int>>{{}, {0}, {0, 1}, {0, 0, 1}}) {
+      CHECK(viterbiScore(compose(chain(s), removed)).item() == 0.0);
+    }
+    CHECK(std::isinf(viterbiScore(compose(chain({1}), removed)).item()));
+  }
+
+  {
+    // Unweighted graphs without gradients have no epsilons left
+    Graph g(false);
+    g.addNode(true);
+    for (int i = 0; i < 3; i++) {
+      g.addNode(false, i == 2);
+      g.addArc(i, i + 1, epsilon);
+      g.addArc(i, i + 1, 0);
+    }
+    auto removed = remove(g);
+    CHECK(removed.numNodes() == 4);
+    CHECK(removed.numArcs() == 6);
+    auto labels = removed.labelsToVector();
+    CHECK(std::count(labels.begin(), labels.end(), epsilon) == 0);
+    for (auto& s : std::vector<std::vector<int>>{{}, {0}, {0, 0}, {0, 0, 0}}) {
+      CHECK(viterbiScore(compose(chain(s), removed)).item() == 0.0);
+    }
+  }
+
+  {
+    // A start node with an empty path is also reached from another start node
+    Graph g;
+    g.addNode(true);
+    g.addNode(true);
+    g.addNode(false, true);
+    g.addArc(0, 1, 0);
+    g.addArc(1, 2, epsilon);
+    auto removed = remove(g);
+    CHECK(forwardScore(removed).item() == Approx(std::log(2.0)));
+    CHECK(viterbiScore(removed).item() == Approx(0.0));
+    CHECK(forwardScore(compose(chain({0}), removed)).item() == Approx(0.0));
+    CHECK(forwardScore(compose(chain({}), removed)).item() == Approx(0.0));
+    // Every path has a different string
+    auto paths = nbest(removed, 3, false);
+    CHECK(paths.size() == 2);
+  }
+
+  {
+    // A start node with an empty path is reached by a cycle
+    Graph g;
+    g.addNode(true);
+    g.addNode();
+    g.addNode(false, true);
+    g.addArc(0, 1, 0, 0, -1.0);
+    g.addArc(1, 0, 1, 1, -1.0);
+    g.addArc(0, 2, epsilon);
+    for (auto semiring : {Semiring::LOG, Semiring::TROPICAL}) {
+      auto removed = remove(g, epsilon, semiring);
+      for (auto& s : std::vector<std::vector<int>>{{}, {0, 1}, {0, 1, 0, 1}}) {
+        CHECK(
+            forwardScore(compose(chain(s), removed)).item() ==
+            Approx(-1.0 * s.size()));
+      }
+      CHECK(std::isinf(forwardScore(compose(chain({0}), removed)).item()));
+    }
+  }
+}
+
+TEST_CASE("test determinize", "[functions]") {
+  auto chain = [](const std::vector<int>& labels) {
+    Graph c;
+    c.addNode(true, labels.empty());
+    for (size_t i = 0; i < labels.size(); i++) {
+      c.addNode(false, i + 1 == labels.size());
+      c.addArc(i, i + 1, labels[i]);
+    }
+    return c;
+  };
+  auto isDeterministic = [](Graph g) {
+    for (auto n = 0; n < g.numNodes(); n++) {
+      std::set<std::pair<int, int>> labels;
+      for (auto a : g.out(n)) {
+        if (!labels.emplace(g.ilabel(a), g.olabel(a)).second) {
+          return false;
+        }
+      }
+    }
+    return g.numStart() <= 1;
+  };
+
+  // Two start nodes and paths which share prefixes and suffixes, some of
+  // which end in nodes with further paths
+  Graph g;
+  g.addNode(true);
+  g.addNode(true);
+  g.addNode();
+  g.addNode(false, true);
+  g.addNode();
+  g.addNode(false, true);
+  g.addArc(0, 2, 0, 0, 0.5);
+  g.addArc(0, 4, 0, 0, -0.2);
+  g.addArc(1, 4, 0, 0, 0.3);
+  g.addArc(1, 3, 1, 1, 1.2);
+  g.addArc(2, 3, 1, 1, 0.1);
+  g.addArc(4, 3, 1, 1, -0.4);
+  g.addArc(4, 5, 2, 2, 0.8);
+  g.addArc(2, 5, 2, 2, 0.6);
+  g.addArc(3, 5, 2, 2, -0.7);
+  g.addArc(3, 5, 0, 0, 0.2);
+  g.addArc(5, 5, 1, 1, 0.4);
+  std::vector<std::vector<int>> strings = {
+      {}, {0}, {1}, {0, 1}, {0, 2}, {1, 2}, {1, 0}, {0, 1, 2},
+      {0, 1, 0, 1}, {0, 2, 1, 1}, {2}};
+
+  for (auto semiring : {Semiring::LOG, Semiring::TROPICAL}) {
+    auto score = [semiring](const Graph& g) {
+      return semiring == Semiring::LOG ? forwardScore(g).item()
+                                       : viterbiScore(g).item();
+    };
+    auto det = determinize(g, semiring);
+    CHECK(isDeterministic(det));
+    CHECK(det.isStart(0));
+    // Every string has the same score
+    for (auto& s : strings) {
+      auto expected = score(compose(chain(s), g));
+      auto actual = score(compose(chain(s), det));
+      if (std::isinf(expected)) {
+        CHECK(actual == expected);
+      } else {
+        CHECK(actual == Approx(expected));
+      }
+    }
+  }
+
+  {
+    // Transducers are determinized on their input labels, and the output
+    // labels are delayed until the paths agree on them
+    Graph g;
+    g.addNode(true);
+    for (int n = 1; n < 7; n++) {
+      g.addNode(false, n == 3 || n == 6);
+    }
+    g.addArc(0, 1, 0, 10, 0.5);
+    g.addArc(1, 2, 1, epsilon, 0.2);
+    g.addArc(2, 3, 2, epsilon, -0.1);
+    g.addArc(0, 4, 0, 11, 0.3);
+    g.addArc(4, 5, 1, epsilon, 0.4);
+    g.addArc(5, 6, 3, epsilon, 0.6);
+    auto score = [&chain](const Graph& g, std::vector<int> x, std::vector<int> y) {
+      return forwardScore(compose(compose(chain(x), g), chain(y))).item();
+    };
+    for (auto semiring : {Semiring::LOG, Semiring::TROPICAL}) {
+      auto det = determinize(g, semiring);
+      CHECK(det.numNodes() == 5);
+      CHECK(det.numArcs() == 4);
+      CHECK(det.numOut(0) == 1);
+      CHECK(score(det, {0, 1, 2}, {10}) == Approx(score(g, {0, 1, 2}, {10})));
+      CHECK(score(det, {0, 1, 3}, {11}) == Approx(score(g, {0, 1, 3}, {11})));
+      CHECK(std::isinf(score(det, {0, 1, 2}, {11})));
+    }
+
+    // Different output labels for the same input labels are ended with
+    // arcs with epsilon input labels
+    Graph h;
+    h.addNode(true);
+    h.addNode();
+    h.addNode();
+    h.addNode(false, true);
+    h.addArc(0, 1, 0, 1, 0.5);
+    h.addArc(0, 2, 0, 1, 0.2);
+    h.addArc(0, 2, 0, 2, 0.1);
+    h.addArc(1, 3, 1, 0, 0.3);
+    h.addArc(2, 3, 1, 0, 0.7);
+    auto det = determinize(h);
+    CHECK(forwardScore(det).item() == Approx(forwardScore(h).item()));
+    for (auto& y : std::vector<std::vector<int>>{{1, 0}, {2, 0}}) {
+      CHECK(score(det, {0, 1}, y) == Approx(score(h, {0, 1}, y)));
+    }
+    for (auto n = 0; n < det.numNodes(); n++) {
+      std::set<int> ilabels;
+      for (auto a : det.out(n)) {
+        CHECK((ilabels.insert(det.ilabel(a)).second || det.ilabel(a) == epsilon));
+      }
+    }
+  }
+
+  {
+    // A cyclic graph with an equivalent deterministic graph
+    Graph g;
+    g.addNode(true);
+    g.addNode(false, true);
+    g.addNode(false, true);
+    g.addArc(0, 1, 0, 0, 0.5);
+    g.addArc(0, 2, 0, 0, -0.5);
+    g.addArc(1, 1, 1, 1, 0.3);
+    g.addArc(2, 2, 1, 1, 0.3);
+    auto det = determinize(g);
+    CHECK(isDeterministic(det));
+    // The residuals are only the same up to rounding after the first loop
+    CHECK(det.numNodes() <= 3);
+    for (auto& s : std::vector<std::vector<int>>{{0}, {0, 1}, {0, 1, 1}}) {
+      CHECK(
+          forwardScore(compose(chain(s), det)).item() ==
+          Approx(forwardScore(compose(chain(s), g)).item()));
+    }
+    CHECK(determinize(g, Semiring::TROPICAL).numNodes() == 2);
+
+    // Without one the limits are exceeded
+    g.addArc(0, 1, 2, 2, 0.0);
+    g.addArc(0, 2, 2, 2, 0.0);
+    g.addArc(2, 2, 1, 1, 0.6);
+    CHECK_THROWS(determinize(g, Semiring::TROPICAL, 100));
+    CHECK_THROWS(determinize(g, Semiring::TROPICAL, -1, 100));
+  }
+
+  {
+    // Graphs without start nodes are empty
+    Graph g;
+    g.addNode(false, true);
+    CHECK(determinize(g).numNodes() == 0);
+  }
+
+  {
+    // Subsets with close residuals are not merged
+    Graph g;
+    g.addNode(true);
+    g.addNode();
+    g.addNode();
+    g.addNode(false, true);
+    g.addArc(0, 1, 0, 0, 0.0);
+    g.addArc(0, 2, 0, 0, 0.0);
+    g.addArc(0, 1, 1, 1, 0.0);
+    g.addArc(0, 2, 1, 1, 0.0003);
+    g.addArc(1, 3, 2, 2, 0.0);
+    g.addArc(2, 3, 2, 2, 5.0);
+    auto det = determinize(g);
+    CHECK(det.numNodes() == 4);
+    for (auto& s : std::vector<std::vector<int>>{{0, 2}, {1, 2}}) {
+      CHECK(
+          forwardScore(compose(chain(s), det)).item() ==
+          Approx(forwardScore(compose(chain(s), g)).item()).epsilon(1e-6));
+    }
+  }
+
+  {
+    // The empty path can only be summed over start nodes with the tropical
+    // semiring
+    Graph g;
+    g.addNode(true, true);
+    g.addNode(true, true);
+    g.addArc(0, 1, 0);
+    CHECK_THROWS_AS(determinize(g), std::invalid_argument);
+    auto det = determinize(g, Semiring::TROPICAL);
+    CHECK(det.numStart() == 1);
+    CHECK(det.isAccept(0));
+    // A single accepting start node is fine
+    Graph h;
+    h.addNode(true);
+    h.addNode(true, true);
+    h.addArc(0, 1, 0);
+    CHECK_NOTHROW(determinize(h));
+  }
+}
+
+TEST_CASE("test minimize", "[functions]") {
+  auto chain = [](const std::vector<int>& labels) {
+    Graph c;
+    c.addNode(true, labels.empty());
+    for (size_t i = 0; i < labels.size(); i++) {
+      c.addNode(false, i + 1 == labels.size());
+      c.addArc(i, i + 1, labels[i]);
+    }
+    return c;
+  };
+
+  // The paths after "a" and "c" are the same once the weights are pushed
+  Graph g;
+  g.addNode(true);
+  g.addNode();
+  g.addNode(false, true);
+  g.addNode(false, true);
+  g.addNode();
+  g.addNode(false, true);
+  g.addNode(false, true);
+  g.addArc(0, 1, 0, 0, 0.5);
+  g.addArc(1, 2, 1, 1, 0.2);
+  g.addArc(2, 3, 3, 3, 0.3);
+  g.addArc(0, 4, 2, 2, -0.1);
+  g.addArc(4, 5, 1, 1, 0.7);
+  g.addArc(5, 6, 3, 3, 0.3);
+  std::vector<std::vector<int>> strings = {
+      {0, 1}, {2, 1}, {0, 1, 3}, {2, 1, 3}, {0}, {0, 3}, {1, 3}};
+
+  for (auto semiring : {Semiring::LOG, Semiring::TROPICAL}) {
+    auto score = [semiring](const Graph& g) {
+      return semiring == Semiring::LOG ? forwardScore(g).item()
+                                       : viterbiScore(g).item();
+    };
+    auto minimized = minimize(g, semiring);
+    CHECK(minimized.numNodes() == 4);
+    CHECK(minimized.numArcs() == 4);
+    CHECK(score(minimized) == Approx(score(g)));
+    for (auto& s : strings) {
+      auto expected = score(compose(chain(s), g));
+      auto actual = score(compose(chain(s), minimized));
+      if (std::isinf(expected)) {
+        CHECK(actual == expected);
+      } else {
+        CHECK(actual == Approx(expected));
+      }
+    }
+  }
+
+  {
+    // Weights which differ on arcs from accept nodes are kept
+    auto h = Graph::deepCopy(g);
+    h.setWeight(5, 0.4);
+    CHECK(minimize(h).numNodes() == 6);
+  }
+
+  {
+    // Nodes with weights which are only close are not merged
+    Graph g;
+    g.addNode(true);
+    g.addNode();
+    g.addNode();
+    g.addNode(false, true);
+    g.addArc(0, 1, 0);
+    g.addArc(0, 2, 1);
+    g.addArc(1, 3, 2, 2, 0.0);
+    g.addArc(1, 3, 3, 3, 0.0);
+    g.addArc(2, 3, 2, 2, 0.0);
+    g.addArc(2, 3, 3, 3, 0.0004);
+    auto minimized = minimize(g, Semiring::TROPICAL);
+    CHECK(minimized.numNodes() == 4);
+    CHECK(viterbiScore(compose(chain({1, 2}), minimized)).item() == 0.0f);
+    CHECK(
+        viterbiScore(compose(chain({1, 3}), minimized)).item() ==
+        Approx(0.0004));
+  }
+
+  {
+    // Equivalent cycles are merged, equivalent start nodes are not
+    Graph g;
+    g.addNode(true);
+    g.addNode(true);
+    g.addNode(false, true);
+    g.addNode(false, true);
+    g.addArc(0, 2, 0, 0, 0.5);
+    g.addArc(1, 3, 0, 0, 0.5);
+    g.addArc(2, 2, 1, 1, 0.3);
+    g.addArc(3, 3, 1, 1, 0.3);
+    auto minimized = minimize(g);
+    CHECK(minimized.numNodes() == 3);
+    CHECK(minimized.numArcs() == 3);
+    for (auto& s : std::vector<std::vector<int>>{{0}, {0, 1}, {0, 1, 1}}) {
+      CHECK(
+          forwardScore(compose(chain(s), minimized)).item() ==
+          Approx(forwardScore(compose(chain(s), g)).item()));
+    }
+  }
+
+  {
+    // A determinized and minimized graph has the same scores
+    Graph g;
+    g.addNode(true);
+    g.addNode();
+    g.addNode();
+    g.addNode(false, true);
+    g.addNode(false, true);
+    g.addArc(0, 1, 0, 0, 0.1);
+    g.addArc(0, 2, 0, 0, 0.4);
+    g.addArc(1, 3, 1, 1, -0.3);
+    g.addArc(2, 4, 1, 1, 0.2);
+    g.addArc(0, 3, 2, 2, 0.6);
+    auto minimized = minimize(determinize(g));
+    CHECK(minimized.numNodes() == 3);
+    CHECK(minimized.numArcs() == 3);
+    CHECK(forwardScore(minimized).item() == Approx(forwardScore(g).item()));
+  }
+}
+
+TEST_CASE("test prune", "[functions]") {
+  // Paths with scores 0, -3, -6 and -8 and a dead end
+  Graph g;
+  g.addNode(true);
+  g.addNode();
+  g.addNode();
+  g.addNode();
+  g.addNode(false, true);
+  g.addNode();
+  g.addArc(0, 1, 0, 0, 0.0);
+  g.addArc(0, 2, 1, 1, -3.0);
+  g.addArc(0, 3, 2, 2, -8.0);
+  g.addArc(1, 4, 0, 0, 0.0);
+  g.addArc(2, 4, 1, 1, 0.0);
+  g.addArc(3, 4, 2, 2, 0.0);
+  g.addArc(1, 2, 3, 3, -6.0);
+  g.addArc(1, 5, 0, 0, 1.0);
+
+  for (auto semiring : {Semiring::LOG, Semiring::TROPICAL}) {
+    auto pruned = prune(g, 4.0, -1, semiring);
+    CHECK(pruned.numNodes() == 4);
+    CHECK(pruned.numArcs() == 4);
+    CHECK(pruned.labelsToVector() == std::vector<int>{0, 1, 0, 1});
+    CHECK(viterbiScore(pruned).item() == Approx(0.0));
+
+    // The best arcs are kept and the ones no longer on a path are removed
+    pruned = prune(g, 4.0, 3, semiring);
+    CHECK(pruned.numArcs() == 2);
+    CHECK(pruned.labelsToVector() == std::vector<int>{0, 0});
+
+    // Without a beam only the arcs which are not on a path are removed
+    pruned = prune(g, std::numeric_limits<float>::infinity(), -1, semiring);
+    CHECK(equal(pruned, connect(g)));
+    CHECK(forwardScore(pruned).item() == Approx(forwardScore(g).item()));
+  }
+
+  CHECK(prune(g, 0.0, 0).numNodes() == 0);
+  CHECK_THROWS(prune(g, -1.0));
+  g.addArc(4, 0, 0);
+  CHECK_THROWS(prune(g, 1.0));
+}
+
+TEST_CASE("test nbest", "[functions]") {
+  // Paths "ac" (twice), "ad", "bc" and "bd"
+  Graph g;
+  g.addNode(true);
+  g.addNode();
+  g.addNode();
+  g.addNode(false, true);
+  g.addArc(0, 1, 0, 0, 1.0);
+  g.addArc(0, 1, 1, 1, 0.5);
+  g.addArc(0, 2, 0, 0, 0.8);
+  g.addArc(1, 3, 2, 2, 0.0);
+  g.addArc(1, 3, 3, 3, -0.2);
+  g.addArc(2, 3, 2, 2, 0.1);
+
+  auto check = [](const std::vector<Graph>& paths,
+                  const std::vector<std::vector<int>>& labels,
+                  const std::vector<float>& scores) {
+    CHECK(paths.size() == labels.size());
+    for (size_t i = 0; i < paths.size() && i < labels.size(); i++) {
+      CHECK(paths[i].numStart() == 1);
+      CHECK(paths[i].numAccept() == 1);
+      CHECK(Graph(paths[i]).labelsToVector() == labels[i]);
+      CHECK(viterbiScore(paths[i]).item() == Approx(scores[i]));
+    }
+  };
+
+  auto paths = nbest(g, 10, false);
+  check(
+      paths,
+      {{0, 2}, {0, 2}, {0, 3}, {1, 2}, {1, 3}},
+      {1.0, 0.9, 0.8, 0.5, 0.3});
+  CHECK(equal(paths[0], viterbiPath(g)));
+  check(nbest(g, 2, false), {{0, 2}, {0, 2}}, {1.0, 0.9});
+  check(nbest(g, 3), {{0, 2}, {0, 3}, {1, 2}}, {1.0, 0.8, 0.5});
+  check(nbest(g, 10), {{0, 2}, {0, 3}, {1, 2}, {1, 3}}, {1.0, 0.8, 0.5, 0.3});
+  CHECK(nbest(g, 0).empty());
+
+  {
+    // The empty path of an accepting start node
+    Graph g;
+    g.addNode(true, true);
+    g.addNode(false, true);
+    g.addArc(0, 1, 0, 0, -1.0);
+    g.addArc(0, 1, 1, 1, 1.0);
+    check(nbest(g, 3), {{1}, {}, {0}}, {1.0, 0.0, -1.0});
+  }
+
+  {
+    // Graphs without paths have no best paths
+    Graph g;
+    g.addNode(true);
+    g.addNode(false, true);
+    CHECK(nbest(g, 2).empty());
+  }
+
+  {
+    // Label 0 at position `L - M`, the determinized graph would have about
+    // 2^M nodes for each position so only the subsets on the best paths
+    // should be built
+    const int L = 32;
+    const int M = 16;
+    Graph g;
+    auto node = [M](int i, int j) { return i * (M + 1) + j; };
+    for (int i = 0; i <= L; ++i) {
+      for (int j = 0; j <= M; ++j) {
+        g.addNode(i == 0 && j == 0, i == L && j == M);
+      }
+    }
+    for (int i = 0; i < L; ++i) {
+      g.addArc(node(i, 0), node(i + 1, 0), 0, 0, 0.0);
+      g.addArc(node(i, 0), node(i + 1, 0), 1, 1, 0.1);
+      g.addArc(node(i, 0), node(i + 1, 1), 0, 0, 0.0);
+      for (int j = 1; j < M; ++j) {
+        g.addArc(node(i, j), node(i + 1, j + 1), 0, 0, 0.0);
+        g.addArc(node(i, j), node(i + 1, j + 1), 1, 1, 0.1);
+      }
+    }
+    CHECK_THROWS(determinize(g, Semiring::TROPICAL, 10000));
+    auto paths = nbest(g, 3);
+    std::vector<int> best(L, 1);
+    best[L - M] = 0;
+    CHECK(paths.size() == 3);
+    CHECK(Graph(paths[0]).labelsToVector() == best);
+    CHECK(viterbiScore(paths[0]).item() == Approx(0.1 * (L - 1)));
+    CHECK(viterbiScore(paths[1]).item() == Approx(0.1 * (L - 2)));
+    CHECK(viterbiScore(paths[2]).item() == Approx(0.1 * (L - 2)));
+    CHECK(
+        Graph(paths[1]).labelsToVector() != Graph(paths[2]).labelsToVector());
+  }
+
+  CHECK_THROWS(nbest(g, -1));
+  g.addArc(3, 0, 0);
+  CHECK_THROWS(nbest(g, 1));
+}
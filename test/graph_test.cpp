@@ -13,6 +13,8 @@
 #include "catch.hpp"
 
 #include "common.h"
+#include "gtn/autograd.h"
+#include "gtn/functions.h"
 #include "gtn/graph.h"
 #include "gtn/utils.h"
 
@@ -147,6 +149,319 @@ TEST_CASE("test id", "[graph]") {
   CHECK(g4.id() != g.id());
 }
 
+TEST_CASE("test add nodes and arcs", "[graph]") {
+  Graph expected;
+  expected.addNode(true);
+  expected.addNode();
+  expected.addNode(true, true);
+  expected.addNode(false, true);
+  expected.addArc(0, 1, 0, 1, 1.5);
+  expected.addArc(0, 2, 1, 2, 2.5);
+  expected.addArc(1, 3, 2, epsilon, -1.0);
+  expected.addArc(2, 3, 3);
+
+  Graph g;
+  bool start[] = {true, false};
+  CHECK(g.addNodes(2, start) == 0);
+  bool start2[] = {true, false};
+  bool accept2[] = {true, true};
+  CHECK(g.addNodes(2, start2, accept2) == 2);
+  CHECK(g.numNodes() == 4);
+  CHECK(g.start() == std::vector<int>({0, 2}));
+  CHECK(g.accept() == std::vector<int>({2, 3}));
+
+  int src[] = {0, 0, 1};
+  int dst[] = {1, 2, 3};
+  int ilabels[] = {0, 1, 2};
+  int olabels[] = {1, 2, epsilon};
+  float weights[] = {1.5, 2.5, -1.0};
+  CHECK(g.addArcs(3, src, dst, ilabels, olabels, weights) == 0);
+  CHECK(g.numOut(0) == 2);
+  int src2[] = {2};
+  int dst2[] = {3};
+  int ilabels2[] = {3};
+  CHECK(g.addArcs(1, src2, dst2, ilabels2) == 3);
+  CHECK(equal(g, expected));
+  CHECK(g.numIn(3) == 2);
+
+  // Nothing to add
+  CHECK(g.addNodes(0) == 4);
+  CHECK(g.addArcs(0, src, dst, ilabels) == 4);
+  CHECK(equal(g, expected));
+
+  // Invalid arcs leave the graph unchanged
+  int badDst[] = {1, 4};
+  CHECK_THROWS(g.addArcs(2, src, badDst, ilabels));
+  int badLabels[] = {0, -2};
+  CHECK_THROWS(g.addArcs(2, src, dst, badLabels));
+  CHECK(equal(g, expected));
+}
+
+TEST_CASE("test from arrays", "[graph]") {
+  Graph expected;
+  expected.addNode(true);
+  expected.addNode();
+  expected.addNode(false, true);
+  expected.addArc(0, 1, 0, 1, 1.5);
+  expected.addArc(0, 2, 1, 2, 2.5);
+  expected.addArc(1, 2, 2, epsilon, -1.0);
+  expected.addArc(1, 1, 0, 0, 0.5);
+
+  auto g = Graph::fromArrays(
+      3, {0}, {2}, {0, 0, 1, 1}, {1, 2, 2, 1}, {0, 1, 2, 0},
+      {1, 2, epsilon, 0}, {1.5, 2.5, -1.0, 0.5});
+  CHECK(equal(g, expected));
+  CHECK(isomorphic(g, expected));
+  CHECK(g.calcGrad());
+  CHECK(g.numOut(1) == 2);
+  CHECK(g.numIn(2) == 2);
+  for (int n = 0; n < g.numNodes(); ++n) {
+    CHECK(g.isStart(n) == expected.isStart(n));
+    CHECK(g.isAccept(n) == expected.isAccept(n));
+    CHECK(g.numIn(n) == expected.numIn(n));
+    CHECK(g.numOut(n) == expected.numOut(n));
+    for (int i = 0; i < g.numOut(n); ++i) {
+      CHECK(g.out(n, i) == expected.out(n, i));
+    }
+    for (int i = 0; i < g.numIn(n); ++i) {
+      CHECK(g.in(n, i) == expected.in(n, i));
+    }
+  }
+
+  // Acceptor with default weights
+  g = Graph::fromArrays(2, {0}, {1}, {0, 0}, {1, 1}, {3, 4}, {}, {}, false);
+  CHECK(!g.calcGrad());
+  CHECK(g.olabel(0) == 3);
+  CHECK(g.olabel(1) == 4);
+  CHECK(g.weight(0) == 0);
+  CHECK(g.weight(1) == 0);
+
+  // Graph can still be modified
+  g.addNode(false, true);
+  g.addArc(1, 2, 5);
+  CHECK(g.numArcs() == 3);
+  CHECK(g.numOut(1) == 1);
+  CHECK(g.numAccept() == 2);
+
+  // Empty graph
+  g = Graph::fromArrays(0, {}, {}, {}, {}, {});
+  CHECK(equal(g, Graph{}));
+
+  // Invalid inputs
+  CHECK_THROWS(Graph::fromArrays(2, {2}, {1}, {0}, {1}, {0}));
+  CHECK_THROWS(Graph::fromArrays(2, {0, 0}, {1}, {0}, {1}, {0}));
+  CHECK_THROWS(Graph::fromArrays(2, {0}, {1}, {0}, {2}, {0}));
+  CHECK_THROWS(Graph::fromArrays(2, {0}, {1}, {0}, {1}, {-2}));
+  CHECK_THROWS(Graph::fromArrays(2, {0}, {1}, {0}, {1, 0}, {0}));
+  CHECK_THROWS(Graph::fromArrays(2, {0}, {1}, {0}, {1}, {0}, {0, 1}));
+}
+
+TEST_CASE("test incremental compile", "[graph]") {
+  // Checks the arc lists of g match those of the same graph built at once
+  auto checkArcs = [](const Graph& g) {
+    std::vector<int> srcNodes, dstNodes, labels;
+    for (int i = 0; i < g.numArcs(); ++i) {
+      srcNodes.push_back(g.srcNode(i));
+      dstNodes.push_back(g.dstNode(i));
+      labels.push_back(g.label(i));
+    }
+    auto expected =
+        Graph::fromArrays(g.numNodes(), {}, {}, srcNodes, dstNodes, labels);
+    bool same = true;
+    for (int n = 0; n < g.numNodes(); ++n) {
+      same &= std::equal(
+          g.in(n).begin(), g.in(n).end(),
+          expected.in(n).begin(), expected.in(n).end());
+      same &= std::equal(
+          g.out(n).begin(), g.out(n).end(),
+          expected.out(n).begin(), expected.out(n).end());
+    }
+    return same;
+  };
+
+  // Interleave adding nodes and arcs with queries
+  Graph g;
+  g.addNode(true);
+  g.addNode();
+  g.addArc(0, 1, 0);
+  CHECK(g.numOut(0) == 1);
+  bool same = true;
+  for (int i = 0; i < 500; ++i) {
+    if (i % 7 == 0) {
+      g.addNode();
+    }
+    g.addArc(rand() % g.numNodes(), rand() % g.numNodes(), i);
+    if (i % 3 == 0) {
+      g.addArcs(2, std::vector<int>{0, 1}.data(),
+          std::vector<int>{1, 0}.data(), std::vector<int>{i, i}.data());
+    }
+    same &= checkArcs(g);
+  }
+  CHECK(same);
+  CHECK(g.numIn(1) == g.in(1).size());
+  CHECK(g.out(0, 0) == 0);
+
+  // Copies, sorting and adding arcs to a sorted graph
+  auto copy = Graph::deepCopy(g);
+  CHECK(equal(copy, g));
+  CHECK(checkArcs(copy));
+  g.addArc(0, 0, 3);
+  copy.addArc(0, 0, 3);
+  CHECK(equal(copy, g));
+  g.arcSort();
+  CHECK(g.ilabelSorted());
+  g.addArc(1, 0, 2);
+  CHECK(checkArcs(g));
+}
+
+TEST_CASE("test reserve and shrink to fit", "[graph]") {
+  Graph g;
+  g.reserve(3, 4);
+  auto& data = g.getData();
+  CHECK(g.numNodes() == 0);
+  CHECK(g.numArcs() == 0);
+  CHECK(data.start.capacity() == 3);
+  CHECK(data.srcNodes.capacity() == 4);
+  CHECK(g.getWeights().capacity() == 4);
+
+  // Adding up to the reserved size does not reallocate
+  auto ilabels = data.ilabels.data();
+  g.addNode(true);
+  g.addNode();
+  g.addNode(false, true);
+  g.addArc(0, 1, 0);
+  g.addArc(0, 1, 1);
+  g.addArc(1, 2, 2);
+  g.addArc(1, 2, 3);
+  CHECK(data.ilabels.data() == ilabels);
+  CHECK(data.start.capacity() == 3);
+  CHECK(data.olabels.capacity() == 4);
+
+  g.addArc(0, 2, 4);
+  CHECK(data.olabels.capacity() > 5);
+  g.shrinkToFit();
+  CHECK(data.start.capacity() == 3);
+  CHECK(data.olabels.capacity() == 5);
+  CHECK(data.outArcs.capacity() == 5);
+  CHECK(g.getWeights().capacity() == 5);
+  CHECK(g.numOut(0) == 3);
+  CHECK(g.numIn(2) == 3);
+  CHECK(g.label(4) == 4);
+
+  // Builders preallocate exactly
+  auto c = concat(g, closure(g));
+  CHECK(c.getData().srcNodes.capacity() == c.numArcs());
+  CHECK(c.getData().start.capacity() == c.numNodes());
+  auto u = union_({g, c});
+  CHECK(u.getData().dstNodes.capacity() == u.numArcs());
+  std::stringstream in("0\n2\n0 1 0\n1 2 1 2 0.5\n2 3 2 3\n");
+  auto l = loadTxt(in);
+  CHECK(l.numNodes() == 4);
+  CHECK(l.getData().ilabels.capacity() == 3);
+  CHECK(l.getWeights().capacity() == 3);
+  CHECK(l.olabel(1) == 2);
+  CHECK(l.weight(1) == 0.5);
+}
+
+TEST_CASE("test memory usage", "[graph]") {
+  Graph g;
+  g.addNode(true);
+  g.addNode();
+  g.addNode(false, true);
+  g.addArc(0, 1, 0, 0, 1.0);
+  g.addArc(1, 2, 1, 1, 2.0);
+  g.addArc(0, 2, 2, 2, 3.0);
+  g.shrinkToFit();
+  auto usage = g.memoryUsage();
+  // start/accept flags, start/accept ids, labels and arc endpoints
+  CHECK(usage.topology == 2 * 3 * sizeof(bool) + 2 * sizeof(int) +
+        4 * 3 * sizeof(int));
+  // offsets and in/out arcs
+  CHECK(usage.arcLists == 2 * 4 * sizeof(int) + 2 * 3 * sizeof(int));
+  CHECK(usage.weights == 3 * sizeof(float));
+  CHECK(usage.grad == 0);
+  CHECK(usage.saved == 0);
+  CHECK(usage.total() == usage.topology + usage.arcLists + usage.weights);
+
+  // Shared arrays are counted once
+  auto copy = Graph::lazyCopy(g);
+  CHECK(copy.memoryUsage().total() == usage.total());
+
+  // Inputs are saved by the autograd tape and gradients are counted
+  auto out = forwardScore(g);
+  auto outUsage = out.memoryUsage();
+  // including the topological order cached by the input
+  CHECK(g.memoryUsage().arcLists == usage.arcLists + 3 * sizeof(int));
+  CHECK(outUsage.saved == g.memoryUsage().total());
+  backward(out, true);
+  usage = g.memoryUsage();
+  CHECK(usage.grad == 3 * sizeof(float));
+  CHECK(out.memoryUsage().saved == usage.total());
+}
+
+TEST_CASE("test compact encoding", "[graph]") {
+  Graph g;
+  for (int n = 0; n < 100; ++n) {
+    g.addNode(n % 7 == 0, n % 5 == 0);
+  }
+  for (int i = 0; i < 300; ++i) {
+    g.addArc(
+        rand() % 100,
+        rand() % 100,
+        i % 11 - 1,
+        i == 0 ? maxCompactLabel : i % 13 - 1,
+        i);
+  }
+  auto expected = Graph::deepCopy(g);
+  CHECK(!g.isCompact());
+  g.setCompact();
+  CHECK(g.isCompact());
+  CHECK(g.getData().ilabels.size() == 0);
+  CHECK(g.getData().startBits.size() == 2);
+  CHECK(equal(g, expected));
+  CHECK(equal(expected, g));
+  bool same = true;
+  for (int n = 0; n < g.numNodes(); ++n) {
+    same &= g.isStart(n) == expected.isStart(n);
+    same &= g.isAccept(n) == expected.isAccept(n);
+    same &= g.numOut(n) == expected.numOut(n);
+  }
+  for (int i = 0; i < g.numArcs(); ++i) {
+    same &= g.label(i) == expected.label(i);
+    same &= g.ilabel(i) == expected.ilabel(i);
+    same &= g.olabel(i) == expected.olabel(i);
+  }
+  CHECK(same);
+  CHECK(g.olabel(0) == maxCompactLabel);
+  CHECK(g.labelsToVector(false) == expected.labelsToVector(false));
+
+  // Copies and functions work on compact graphs
+  auto copy = Graph::deepCopy(g);
+  CHECK(copy.isCompact());
+  CHECK(equal(copy, g));
+  CHECK(equal(projectOutput(g), projectOutput(expected)));
+  CHECK(equal(projectInput(g), projectInput(expected)));
+  g.arcSort(true);
+  expected.arcSort(true);
+  CHECK(equal(compose(g, g), compose(expected, expected)));
+
+  // Modifying the graph switches back to the regular encoding
+  copy.addArc(0, 1, 2);
+  CHECK(!copy.isCompact());
+  CHECK(copy.ilabel(copy.numArcs() - 1) == 2);
+  copy.setCompact(true);
+  copy.setCompact(false);
+  CHECK(!copy.isCompact());
+  CHECK(copy.getData().start.size() == copy.numNodes());
+  CHECK(copy.isAccept(0));
+
+  g = Graph();
+  g.addNode(true, true);
+  g.addArc(0, 0, maxCompactLabel + 1);
+  CHECK_THROWS(g.setCompact());
+  CHECK(!g.isCompact());
+}
+
 TEST_CASE("test copy", "[graph]") {
   Graph graph =
       loadTxt(std::stringstream("0 1\n"
@@ -174,6 +489,66 @@ TEST_CASE("test copy", "[graph]") {
   CHECK(copied.olabelSorted());
 }
 
+TEST_CASE("test lazy copy", "[graph]") {
+  auto makeGraph = []() {
+    Graph g;
+    g.addNode(true);
+    g.addNode();
+    g.addNode(false, true);
+    g.addArc(0, 1, 0, 1, 0.5);
+    g.addArc(1, 2, 1, 2, 1.5);
+    g.addArc(0, 2, 2, 0);
+    return g;
+  };
+  auto g = makeGraph();
+  auto copy = Graph::lazyCopy(g);
+  CHECK(equal(copy, g));
+  CHECK(copy.getData().srcNodes.data() == g.getData().srcNodes.data());
+  CHECK(copy.getData().outArcs.data() == g.getData().outArcs.data());
+  CHECK(copy.weights() != g.weights());
+  CHECK(copy.numOut(0) == 2);
+
+  // Modifying either graph copies the shared arrays first
+  copy.addArc(2, 0, 3);
+  CHECK(copy.getData().srcNodes.data() != g.getData().srcNodes.data());
+  CHECK(g.numArcs() == 3);
+  CHECK(g.numIn(0) == 0);
+  CHECK(copy.numIn(0) == 1);
+  auto copy2 = Graph::lazyCopy(g);
+  g.makeAccept(0);
+  CHECK(g.isAccept(0));
+  CHECK(!copy2.isAccept(0));
+  CHECK(equal(copy2, makeGraph()));
+
+  // Projections only copy the projected labels
+  g = makeGraph();
+  auto projected = projectOutput(g);
+  CHECK(projected.getData().olabels.data() == g.getData().olabels.data());
+  CHECK(projected.getData().ilabels.data() != g.getData().ilabels.data());
+  CHECK(projected.labelsToVector() == std::vector<int>{1, 2, 0});
+  CHECK(g.labelsToVector() == std::vector<int>{0, 1, 2});
+  projected = projectInput(projected);
+  CHECK(projected.labelsToVector(false) == std::vector<int>{1, 2, 0});
+
+  // Shared arrays are freed once with the last graph that uses them
+  allocations = 0;
+  deallocations = 0;
+  {
+    auto g = makeGraph();
+    auto c1 = projectInput(g);
+    auto c2 = clone(c1);
+    {
+      auto c3 = projectOutput(c2);
+      g = Graph();
+      c1.addArc(0, 0, 0);
+      c2.arcSort(true);
+      CHECK(equal(projectInput(c3), c3));
+    }
+    c2.addNode();
+  }
+  CHECK(allocations == deallocations);
+}
+
 TEST_CASE("test arc weight get and set", "[graph]") {
   std::vector<float> l = {1.1f, 2.2f, 3.3f, 4.4f};
 
@@ -192,6 +567,68 @@ TEST_CASE("test arc weight get and set", "[graph]") {
   CHECK(l == std::vector<float>(g.weights(), g.weights() + g.numArcs()));
 }
 
+TEST_CASE("test bind weights", "[graph]") {
+  auto l = std::make_shared<std::vector<float>>(
+      std::vector<float>{1.1f, 2.2f, 3.3f});
+
+  Graph g;
+  g.addNode(true);
+  g.addNode();
+  g.addNode(false, true);
+  g.addArc(0, 1, 0);
+  g.addArc(1, 2, 1);
+  g.addArc(0, 2, 2);
+  g.bindWeights(l->data(), l);
+  CHECK(g.weights() == l->data());
+  CHECK(l.use_count() == 2);
+
+  // The graph and the array share storage
+  (*l)[1] = 5.0f;
+  CHECK(g.weight(1) == 5.0f);
+  g.setWeight(2, 4.0f);
+  CHECK((*l)[2] == 4.0f);
+
+  // Copies of the graph share the bound weights
+  auto other = g;
+  CHECK(other.weights() == l->data());
+  auto copied = Graph::deepCopy(g);
+  CHECK(copied.weights() != l->data());
+  CHECK(equal(copied, g));
+
+  // Modifying the graph copies the weights and releases the owner
+  g.addArc(2, 0, 3, 3, 2.0f);
+  CHECK(g.weights() != l->data());
+  CHECK(other.weights() == g.weights());
+  CHECK(l.use_count() == 1);
+  CHECK(
+      std::vector<float>(g.weights(), g.weights() + g.numArcs()) ==
+      std::vector<float>{1.1f, 5.0f, 4.0f, 2.0f});
+  CHECK((*l) == std::vector<float>{1.1f, 5.0f, 4.0f});
+
+  // Setting the weights does not write to the bound array
+  std::vector<float> w = {1.0f, 2.0f, 3.0f, 4.0f};
+  std::vector<float> bound = {0.0f, 0.0f, 0.0f, 0.0f};
+  g.bindWeights(bound.data());
+  g.setWeights(w.data());
+  CHECK(bound == std::vector<float>{0.0f, 0.0f, 0.0f, 0.0f});
+  CHECK(std::vector<float>(g.weights(), g.weights() + g.numArcs()) == w);
+
+  // The owner is released with the graph
+  allocations = 0;
+  deallocations = 0;
+  {
+    Graph g2;
+    g2.addNode(true, true);
+    g2.addArc(0, 0, 0);
+    g2.bindWeights(l->data(), l);
+    CHECK(l.use_count() == 2);
+  }
+  CHECK(l.use_count() == 1);
+  CHECK(allocations == deallocations);
+
+  CHECK_THROWS(g.bindWeights(nullptr));
+}
+
 TEST_CASE("test arc label getters", "[graph]") {
   std::vector<int> l = {0, 1, 2, 3};
 
@@ -399,3 +836,152 @@ TEST_CASE("test threaded grad", "[graph]") {
       g.grad().weights() + g.numArcs(),
       [num_threads](float v) { return v == num_threads; })));
 }
+
+TEST_CASE("test threaded compile", "[graph]") {
+  // Many threads reading an uncompiled graph should compile it once
+  for (int t = 0; t < 10; t++) {
+    Graph g;
+    for (int n = 0; n < 100; n++) {
+      g.addNode(n == 0, n == 99);
+    }
+    for (int i = 0; i < 10000; i++) {
+      g.addArc(i % 100, (i * 7) % 100, i % 13);
+    }
+    if (t % 2 == 1) {
+      // Incrementally merge a few more arcs
+      g.numOut(0);
+      g.addArc(0, 1, 0);
+    }
+
+    int num_threads = 8;
+    std::vector<int> counts(num_threads, 0);
+    std::vector<std::thread> threads;
+    for (int i = 0; i < num_threads; i++) {
+      threads.push_back(std::thread([&g, &counts, i]() {
+        for (int n = 0; n < g.numNodes(); n++) {
+          counts[i] += g.numOut(n) + g.numIn(n);
+        }
+      }));
+    }
+    for (auto& th : threads) {
+      th.join();
+    }
+    CHECK(std::all_of(counts.begin(), counts.end(), [&g](int c) {
+      return c == 2 * g.numArcs();
+    }));
+  }
+}
+
+TEST_CASE("test freeze", "[graph]") {
+  Graph g;
+  g.addNode(true);
+  g.addNode(false, true);
+  g.addArc(0, 1, 2);
+  g.addArc(0, 1, 1, 3, 0.5);
+  g.addArc(1, 1, 0);
+  CHECK(!g.isFrozen());
+  g.freeze();
+  CHECK(g.isFrozen());
+  CHECK(g.ilabelSorted());
+  CHECK(g.out(0, 0) == 1);
+  CHECK(g.in(1, 0) == 2);
+
+  // Structural changes are not allowed
+  CHECK_THROWS_AS(g.addNode(), std::logic_error);
+  CHECK_THROWS_AS(g.addArc(0, 1, 0), std::logic_error);
+  CHECK_THROWS_AS(g.makeAccept(0), std::logic_error);
+  CHECK_THROWS_AS(g.arcSort(true), std::logic_error);
+  CHECK_THROWS_AS(g.setCompact(), std::logic_error);
+  CHECK(g.numArcs() == 3);
+  CHECK(!g.isAccept(0));
+
+  // Weights can still be changed and copies are not frozen
+  g.setWeight(0, 1.0);
+  CHECK(g.weight(0) == 1.0);
+  g.arcSort();
+  g.freeze();
+  auto copy = Graph::deepCopy(g);
+  CHECK(!copy.isFrozen());
+  copy.addArc(1, 0, 0);
+  CHECK(copy.numArcs() == 4);
+
+  // Graphs sorted by output label stay that way
+  copy.arcSort(true);
+  copy.freeze();
+  CHECK(copy.olabelSorted());
+}
+
+TEST_CASE("test topological order", "[graph]") {
+  auto isSorted = [](const Graph& g, const std::vector<int>& order) {
+    std::vector<int> position(g.numNodes(), -1);
+    for (int i = 0; i < order.size(); ++i) {
+      position[order[i]] = i;
+    }
+    bool sorted = order.size() == g.numNodes();
+    for (int a = 0; a < g.numArcs(); ++a) {
+      sorted &= position[g.srcNode(a)] < position[g.dstNode(a)];
+    }
+    return sorted;
+  };
+
+  Graph g;
+  g.addNode(true);
+  g.addNode();
+  g.addNode();
+  g.addNode(false, true);
+  g.addArc(2, 3, 0);
+  g.addArc(0, 2, 0);
+  g.addArc(1, 2, 0);
+  g.addArc(0, 1, 0);
+  CHECK(g.isAcyclic());
+  CHECK(g.topologicalOrder() == std::vector<int>{0, 1, 2, 3});
+
+  // The order is cached until the graph is modified
+  auto order = &g.topologicalOrder();
+  CHECK(&g.topologicalOrder() == order);
+  g.addNode();
+  g.addArc(4, 0, 0);
+  CHECK(isSorted(g, g.topologicalOrder()));
+  CHECK(g.topologicalOrder().front() == 4);
+
+  // Lazy copies share the order
+  auto copy = Graph::lazyCopy(g);
+  CHECK(&copy.topologicalOrder() == &g.topologicalOrder());
+
+  // Cycles and self-loops
+  g.addArc(3, 0, 0);
+  CHECK(!g.isAcyclic());
+  CHECK_THROWS_AS(g.topologicalOrder(), std::invalid_argument);
+  CHECK(copy.isAcyclic());
+  copy.addArc(1, 1, 0);
+  CHECK(!copy.isAcyclic());
+
+  {
+    // Every order of a random DAG is valid, also after merging new arcs
+    // into the compiled arc lists
+    Graph dag;
+    for (int n = 0; n < 100; n++) {
+      dag.addNode(n == 0, n == 99);
+    }
+    for (int i = 0; i < 1000; i++) {
+      auto u = (i * 7) % 100;
+      auto v = (i * 13) % 100;
+      if (u != v) {
+        dag.addArc(std::min(u, v), std::max(u, v), 0);
+      }
+    }
+    CHECK(isSorted(dag, dag.topologicalOrder()));
+    dag.addArc(98, 99, 0);
+    dag.addArc(3, 1, 0);
+    CHECK(isSorted(dag, dag.topologicalOrder()));
+    dag.freeze();
+    CHECK(isSorted(dag, dag.topologicalOrder()));
+  }
+
+  {
+    // Graphs with no nodes are acyclic
+    Graph empty;
+    CHECK(empty.isAcyclic());
+    CHECK(empty.topologicalOrder().empty());
+  }
+}
@@ -51,6 +51,11 @@ TEST_CASE("test hd_span", "[hd_span]") {
     CHECK(s.capacity() >= 8);
     s.reserve(2);
     CHECK(s.capacity() >= s.size());
+    s.shrink_to_fit();
+    CHECK(s.capacity() == 3);
+    CHECK(s[0] == 1);
+    CHECK(s[1] == 2);
+    CHECK(s[2] == 3);
   }
 
   // Check resizing works
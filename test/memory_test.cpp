@@ -0,0 +1,140 @@
+#include <thread>
+#include <vector>
+
+#include "catch.hpp"
+
+#include "gtn/graph.h"
+#include "gtn/hd_span.h"
+#include "gtn/memory.h"
+
+using namespace gtn;
+using namespace gtn::detail;
+
+TEST_CASE("test memory pool", "[memory]") {
+  CHECK_FALSE(memory::isPoolEnabled());
+  CHECK(memory::pooledBytes() == 0);
+
+  memory::setPoolEnabled(true);
+  CHECK(memory::isPoolEnabled());
+
+  {
+    // Allocations are rounded up to a size class
+    HDSpan<int> h(10, 1);
+    CHECK(h.size() == 10);
+    CHECK(h.capacity() == 16);
+    CHECK(std::all_of(h.begin(), h.end(), [](int v) { return v == 1; }));
+    auto data = h.data();
+    h.clear();
+    CHECK(memory::pooledBytes() == 64);
+
+    // Freed memory is reused
+    HDSpan<float> f(12, 0.0f);
+    CHECK(static_cast<void*>(f.data()) == static_cast<void*>(data));
+    CHECK(memory::pooledBytes() == 0);
+
+    // Growing returns the old buffer to the pool
+    f.resize(100);
+    CHECK(f.capacity() == 128);
+    CHECK(memory::pooledBytes() == 64);
+    f.clear();
+    CHECK(memory::pooledBytes() == 64 + 512);
+  }
+
+  {
+    // Graph data comes from the pool
+    Graph g;
+    g.addNode(true);
+    g.addNode(false, true);
+    g.addArc(0, 1, 0);
+    g.addArc(0, 1, 1);
+    CHECK(g.numArcs() == 2);
+  }
+  CHECK(memory::pooledBytes() > 0);
+
+  memory::trimPool();
+  CHECK(memory::pooledBytes() == 0);
+
+  // Memory beyond the limit is freed
+  memory::setPoolLimit(256);
+  CHECK(memory::poolLimit() == 256);
+  {
+    HDSpan<int> a(64);
+    HDSpan<int> b(64);
+    a.clear();
+    CHECK(memory::pooledBytes() == 256);
+    b.clear();
+    CHECK(memory::pooledBytes() == 256);
+  }
+  {
+    // Concurrent frees do not exceed the limit together
+    memory::setPoolLimit(4096);
+    std::vector<std::thread> threads;
+    for (int t = 0; t < 8; ++t) {
+      threads.emplace_back([]() {
+        std::vector<void*> blocks;
+        for (int i = 0; i < 64; ++i) {
+          size_t bytes = 256;
+          blocks.push_back(memory::detail::allocate(bytes));
+        }
+        for (auto ptr : blocks) {
+          memory::detail::free(ptr, 256);
+        }
+      });
+    }
+    for (auto& thread : threads) {
+      thread.join();
+    }
+    CHECK(memory::pooledBytes() <= 4096);
+  }
+  memory::setPoolLimit(0);
+  CHECK(memory::pooledBytes() == 0);
+  memory::setPoolLimit(size_t(1) << 30);
+
+  // Disabling the pool frees its memory
+  {
+    HDSpan<int> a(64);
+    a.clear();
+  }
+  CHECK(memory::pooledBytes() == 256);
+  memory::setPoolEnabled(false);
+  CHECK_FALSE(memory::isPoolEnabled());
+  CHECK(memory::pooledBytes() == 0);
+  {
+    HDSpan<int> a(10);
+    CHECK(a.capacity() == 10);
+    a.clear();
+  }
+  CHECK(memory::pooledBytes() == 0);
+}
+
+TEST_CASE("test memory stats", "[memory]") {
+  memory::resetPeakStats();
+  auto start = memory::stats();
+  CHECK(start.peakBytes == start.liveBytes);
+  {
+    HDSpan<float> a(100);
+    auto stats = memory::stats();
+    CHECK(stats.liveBytes == start.liveBytes + 400);
+    CHECK(stats.peakBytes == start.liveBytes + 400);
+    a.resize(200);
+    a.clear();
+    stats = memory::stats();
+    CHECK(stats.liveBytes == start.liveBytes);
+    // Resizing holds both arrays at once
+    CHECK(stats.peakBytes == start.liveBytes + 1200);
+  }
+  memory::resetPeakStats();
+  CHECK(memory::stats().peakBytes == start.liveBytes);
+
+  // Pooled memory is not live
+  memory::setPoolEnabled(true);
+  {
+    HDSpan<int> a(16);
+    a.clear();
+  }
+  auto stats = memory::stats();
+  CHECK(stats.liveBytes == start.liveBytes);
+  CHECK(stats.pooledBytes == 64);
+  memory::setPoolEnabled(false);
+  CHECK(memory::stats().pooledBytes == 0);
+}
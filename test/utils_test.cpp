@@ -549,4 +549,23 @@ TEST_CASE("test load and save", "[utils]") {
     CHECK(equal(g, g3));
     CHECK(isomorphic(g, g3));
   }
+  {
+    // Repeated start and accept nodes are loaded once
+    std::vector<int> nums = {3, 1, 3, 2};
+    std::vector<int> start = {1, 0, 1};
+    std::vector<int> accept = {2, 2};
+    std::vector<int> arc = {0, 2, 1, 1};
+    float weight = 0.5;
+    std::stringstream stream;
+    stream.write(reinterpret_cast<const char*>(nums.data()), 4 * sizeof(int));
+    stream.write(reinterpret_cast<const char*>(start.data()), 3 * sizeof(int));
+    stream.write(reinterpret_cast<const char*>(accept.data()), 2 * sizeof(int));
+    stream.write(reinterpret_cast<const char*>(arc.data()), 4 * sizeof(int));
+    stream.write(reinterpret_cast<const char*>(&weight), sizeof(float));
+    Graph g = load(stream);
+    CHECK(g.start() == std::vector<int>{0, 1});
+    CHECK(g.accept() == std::vector<int>{2});
+    CHECK(g.numArcs() == 1);
+    CHECK(g.weight(0) == 0.5);
+  }
 }